@@ -0,0 +1,307 @@
+"""
+Benchmarks of the client against the in-process stand-in server of
+`benchmarks.server`. Every scenario measures the throughput and the
+latency percentiles of its operations and the results are written as JSON,
+so that runs can be compared to spot regressions.
+
+python -m benchmarks.run --sizes 100,10000 --concurrency 1,8,32 --output results.json
+python -m benchmarks.run --baseline results.json
+"""
+import argparse
+import asyncio
+import functools
+import json
+import platform
+import sys
+import threading
+import time
+from concurrent.futures import wait, FIRST_COMPLETED
+
+from firebase.firebase import FirebaseApplication
+
+from .server import FirebaseServer, GZIP_MIN_SIZE
+
+try:
+    import aiohttp
+    from firebase.aio import AsyncConnectionPool, AsyncFirebaseApplication
+except ImportError:
+    aiohttp = None
+
+SCENARIOS = ['sync_get', 'sync_put', 'sync_put_silent', 'executor_get', 'executor_put',
+             'aio_get', 'aio_put', 'batch_write', 'stream_events', 'get_iter']
+
+
+def payload(size):
+    return {'name': 'benchmark', 'data': 'x' * max(0, size - 30)}
+
+
+def percentile(latencies, fraction):
+    ordered = sorted(latencies)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def result(name, size, concurrency, seconds, latencies, operations=None):
+    operations = operations if operations is not None else len(latencies)
+    return {
+        'name': name,
+        'payload_bytes': size,
+        'concurrency': concurrency,
+        'operations': operations,
+        'seconds': seconds,
+        'throughput': operations / seconds if seconds else None,
+        'latency': {
+            'mean': sum(latencies) / len(latencies),
+            'p50': percentile(latencies, 0.5),
+            'p99': percentile(latencies, 0.99),
+            'max': max(latencies),
+        },
+    }
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+class Benchmark(object):
+    def __init__(self, server, operations, gzip_threshold=None):
+        self.server = server
+        self.operations = operations
+        self.gzip_threshold = gzip_threshold
+
+    def application(self, concurrency=1):
+        pool = self.server.connection_pool(pool_maxsize=max(10, concurrency))
+        return FirebaseApplication(self.server.dsn, None, pool,
+                                   max_workers=concurrency,
+                                   gzip_threshold=self.gzip_threshold)
+
+    def sync_get(self, size, concurrency):
+        with self.application() as firebase:
+            firebase.put('/bench', 'get', payload(size))
+            firebase.get('/bench', 'get')
+            start = time.perf_counter()
+            latencies = [timed(firebase.get, '/bench', 'get')
+                         for _ in range(self.operations)]
+            return result('sync_get', size, 1, time.perf_counter() - start, latencies)
+
+    def sync_put(self, size, concurrency):
+        data = payload(size)
+        with self.application() as firebase:
+            start = time.perf_counter()
+            latencies = [timed(firebase.put, '/bench/put', str(index), data)
+                         for index in range(self.operations)]
+            return result('sync_put', size, 1, time.perf_counter() - start, latencies)
+
+    def sync_put_silent(self, size, concurrency):
+        data = payload(size)
+        with self.application() as firebase:
+            put = functools.partial(firebase.put, response_mode='silent')
+            start = time.perf_counter()
+            latencies = [timed(put, '/bench/put', str(index), data)
+                         for index in range(self.operations)]
+            return result('sync_put_silent', size, 1, time.perf_counter() - start,
+                          latencies)
+
+    def _executor(self, name, size, concurrency, submit):
+        # Keeps ``concurrency`` requests in flight.
+        latencies = []
+        pending = {}
+        start = time.perf_counter()
+        submitted = 0
+        while submitted < self.operations or pending:
+            while submitted < self.operations and len(pending) < concurrency:
+                pending[submit(submitted)] = time.perf_counter()
+                submitted += 1
+            for future in wait(pending, return_when=FIRST_COMPLETED).done:
+                future.result()
+                latencies.append(time.perf_counter() - pending.pop(future))
+        return result(name, size, concurrency, time.perf_counter() - start, latencies)
+
+    def executor_get(self, size, concurrency):
+        with self.application(concurrency) as firebase:
+            firebase.put('/bench', 'get', payload(size))
+            return self._executor('executor_get', size, concurrency,
+                                  lambda index: firebase.get_async('/bench', 'get'))
+
+    def executor_put(self, size, concurrency):
+        data = payload(size)
+        with self.application(concurrency) as firebase:
+            return self._executor('executor_put', size, concurrency,
+                                  lambda index: firebase.put_async('/bench/put', str(index),
+                                                                   data))
+
+    def _aio(self, name, size, concurrency, prepare, operation):
+        context = self.server.ssl_context()
+
+        class ServerConnectionPool(AsyncConnectionPool):
+            def _create_session(self):
+                connector = aiohttp.TCPConnector(limit=self.limit, ssl=context)
+                return aiohttp.ClientSession(connector=connector,
+                                             headers={'Content-type': 'application/json'})
+
+        async def run():
+            async with AsyncFirebaseApplication(
+                    self.server.dsn, None, ServerConnectionPool(),
+                    gzip_threshold=self.gzip_threshold) as firebase:
+                await prepare(firebase)
+                semaphore = asyncio.Semaphore(concurrency)
+                latencies = []
+
+                async def measure(index):
+                    async with semaphore:
+                        started = time.perf_counter()
+                        await operation(firebase, index)
+                        latencies.append(time.perf_counter() - started)
+                start = time.perf_counter()
+                await asyncio.gather(*[measure(index) for index in range(self.operations)])
+                return result(name, size, concurrency, time.perf_counter() - start,
+                              latencies)
+        return asyncio.run(run())
+
+    def aio_get(self, size, concurrency):
+        async def prepare(firebase):
+            await firebase.put('/bench', 'get', payload(size))
+        return self._aio('aio_get', size, concurrency, prepare,
+                         lambda firebase, index: firebase.get('/bench', 'get'))
+
+    def aio_put(self, size, concurrency):
+        data = payload(size)
+
+        async def prepare(firebase):
+            pass
+        return self._aio('aio_put', size, concurrency, prepare,
+                         lambda firebase, index: firebase.put('/bench/put', str(index),
+                                                              data))
+
+    def batch_write(self, size, concurrency):
+        data = payload(size)
+        with self.application() as firebase:
+            latencies = []
+            start = time.perf_counter()
+            for offset in range(0, self.operations, 100):
+                batch = firebase.batch()
+                for index in range(offset, min(self.operations, offset + 100)):
+                    batch.set('/bench/batch/%d' % index, data)
+                latencies.append(timed(batch.commit))
+            return result('batch_write', size, 1, time.perf_counter() - start,
+                          latencies, self.operations)
+
+    def stream_events(self, size, concurrency):
+        # Latency between a write and the delivery of its event.
+        data = payload(size)
+        received = {}
+        condition = threading.Condition()
+
+        def callback(event):
+            if event.path != '/':
+                with condition:
+                    received[event.path] = time.perf_counter()
+                    condition.notify_all()
+
+        with self.application() as firebase:
+            firebase.delete('/bench', 'stream')
+            stream = firebase.stream('/bench/stream', callback=callback)
+            time.sleep(0.2)
+            sent = {}
+            start = time.perf_counter()
+            for index in range(self.operations):
+                sent['/%d' % index] = time.perf_counter()
+                firebase.put('/bench/stream', str(index), data)
+            with condition:
+                condition.wait_for(lambda: len(received) == len(sent), timeout=30)
+            seconds = time.perf_counter() - start
+            stream.close()
+            latencies = [received[path] - sent[path] for path in received]
+            return result('stream_events', size, 1, seconds, latencies)
+
+    def get_iter(self, size, concurrency):
+        # Reads a collection of ``operations`` children as it is downloaded.
+        data = payload(size)
+        with self.application() as firebase:
+            firebase.put('/bench', 'collection',
+                         dict(('%06d' % index, data) for index in range(self.operations)))
+            latencies = []
+            start = time.perf_counter()
+            last = start
+            for key, value in firebase.get_iter('/bench', 'collection'):
+                now = time.perf_counter()
+                latencies.append(now - last)
+                last = now
+            return result('get_iter', size, 1, time.perf_counter() - start, latencies)
+
+
+def compare(results, baseline):
+    """
+    Prints the throughput change of each result from the baseline run.
+    """
+    previous = dict(((item['name'], item['payload_bytes'], item['concurrency']), item)
+                    for item in baseline['results'])
+    for item in results['results']:
+        key = (item['name'], item['payload_bytes'], item['concurrency'])
+        if key in previous and previous[key]['throughput']:
+            change = item['throughput'] / previous[key]['throughput'] - 1
+            sys.stderr.write('%-14s %8d bytes x%-3d %+7.1f%% throughput\n'
+                             % (key + (change * 100,)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n\n')[0])
+    parser.add_argument('--sizes', default='100,10000',
+                        help='comma separated payload sizes in bytes')
+    parser.add_argument('--concurrency', default='1,8,32',
+                        help='comma separated concurrency levels')
+    parser.add_argument('--operations', type=int, default=200,
+                        help='operations per scenario')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help='comma separated scenarios to run')
+    parser.add_argument('--gzip', action='store_true',
+                        help='gzip the request and response bodies of 1KB or more')
+    parser.add_argument('--output', help='file the JSON results are written to')
+    parser.add_argument('--baseline', help='JSON results of a previous run')
+    options = parser.parse_args(argv)
+
+    sizes = [int(size) for size in options.sizes.split(',')]
+    levels = [int(level) for level in options.concurrency.split(',')]
+    scenarios = options.scenarios.split(',')
+    results = {
+        'metadata': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'aiohttp': aiohttp is not None,
+            'gzip': options.gzip,
+            'operations': options.operations,
+            'timestamp': time.time(),
+        },
+        'results': [],
+    }
+    with FirebaseServer(gzip_responses=options.gzip) as server:
+        benchmark = Benchmark(server, options.operations,
+                              GZIP_MIN_SIZE if options.gzip else None)
+        for scenario in scenarios:
+            if scenario.startswith('aio_') and aiohttp is None:
+                sys.stderr.write('Skipping %s, aiohttp is not installed\n' % scenario)
+                continue
+            concurrent = scenario.startswith(('executor_', 'aio_'))
+            for size in sizes:
+                for concurrency in (levels if concurrent else [1]):
+                    item = getattr(benchmark, scenario)(size, concurrency)
+                    results['results'].append(item)
+                    sys.stderr.write('%-14s %8d bytes x%-3d %9.1f ops/s  p50 %.2fms  '
+                                     'p99 %.2fms\n' % (
+                                         scenario, size, concurrency, item['throughput'],
+                                         item['latency']['p50'] * 1000,
+                                         item['latency']['p99'] * 1000))
+    output = json.dumps(results, indent=2)
+    if options.output:
+        with open(options.output, 'w') as output_file:
+            output_file.write(output)
+    else:
+        sys.stdout.write(output + '\n')
+    if options.baseline:
+        with open(options.baseline) as baseline_file:
+            compare(results, json.load(baseline_file))
+
+
+if __name__ == '__main__':
+    main()
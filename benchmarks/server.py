@@ -0,0 +1,431 @@
+"""
+In-process stand-in for the Firebase REST API, used by the benchmarks.
+
+It keeps a JSON tree in memory and implements the parts of the REST
+protocol the client relies on: GET, PUT, POST, PATCH and DELETE on
+``<path>.json`` endpoints, ``shallow``, ``print=silent``, the
+``orderBy``/``startAt``/``endAt``/``equalTo``/``limitToFirst``/
+``limitToLast`` queries, ETags with ``if-none-match`` and ``if-match``, and
+``text/event-stream`` listeners. It is served over HTTPS with a self-signed
+certificate created with the ``openssl`` command.
+
+with FirebaseServer() as server:
+    pool = server.connection_pool()
+    firebase = FirebaseApplication(server.dsn, None, pool)
+"""
+import copy
+import gzip
+import hashlib
+import json
+import os
+import queue
+import shutil
+import ssl
+import subprocess
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import urlparse
+except ImportError:
+    #py3k
+    from urllib import parse as urlparse
+
+from firebase.connection import ConnectionPool
+from firebase.mirror import split_path
+from firebase.query import key_order
+from firebase.writer import generate_push_id
+
+__all__ = ['FirebaseServer', 'Database']
+
+GZIP_MIN_SIZE = 1024
+
+
+def _type_order(value):
+    # Order of the values of different types with orderBy on a child.
+    if value is None:
+        return 0, 0
+    if value is False or value is True:
+        return 1, value
+    if isinstance(value, (int, float)):
+        return 2, value
+    if isinstance(value, str):
+        return 3, value
+    return 4, 0
+
+
+def _encode(value):
+    return json.dumps(value, separators=(',', ':')).encode('utf-8')
+
+
+class Database(object):
+    """
+    Class that holds the JSON tree and the listeners of its locations.
+    """
+    def __init__(self):
+        self.root = None
+        self.lock = threading.Lock()
+        self.listeners = []
+
+    def _get(self, segments):
+        node = self.root
+        for segment in segments:
+            if not isinstance(node, dict) or segment not in node:
+                return None
+            node = node[segment]
+        return node
+
+    def get(self, segments):
+        with self.lock:
+            return copy.deepcopy(self._get(segments))
+
+    def get_encoded(self, segments):
+        # Encoded under the lock instead of copied, large values are common.
+        with self.lock:
+            return _encode(self._get(segments))
+
+    def _set(self, segments, value):
+        if value == {} or value == []:
+            value = None
+        if not segments:
+            self.root = value
+            return
+        if not isinstance(self.root, dict):
+            if value is None:
+                return
+            self.root = {}
+        node = self.root
+        parents = []
+        for segment in segments[:-1]:
+            child = node.get(segment)
+            if not isinstance(child, dict):
+                if value is None:
+                    return
+                child = node[segment] = {}
+            parents.append((node, segment))
+            node = child
+        if value is None:
+            node.pop(segments[-1], None)
+            # Empty parents disappear like in Firebase.
+            while not node and parents:
+                parent, segment = parents.pop()
+                del parent[segment]
+                node = parent
+            if not self.root:
+                self.root = None
+        else:
+            node[segments[-1]] = value
+
+    def write(self, segments, value, etag=None):
+        """
+        Replaces the value at the given path. Returns False without writing
+        if ``etag`` does not match the current value.
+        """
+        with self.lock:
+            if etag is not None and etag != self.etag(segments):
+                return False
+            self._set(segments, copy.deepcopy(value))
+        self.notify('put', segments, value)
+        return True
+
+    def update(self, segments, values):
+        with self.lock:
+            for key, value in values.items():
+                self._set(segments + split_path(key), copy.deepcopy(value))
+        self.notify('patch', segments, values)
+
+    def etag(self, segments):
+        return hashlib.md5(_encode(self._get(segments))).hexdigest()
+
+    def listen(self, segments):
+        events = queue.Queue()
+        with self.lock:
+            self.listeners.append((segments, events))
+            data = copy.deepcopy(self._get(segments))
+        events.put(('put', '/', data))
+        return events
+
+    def unlisten(self, events):
+        with self.lock:
+            self.listeners = [(segments, queue_) for segments, queue_ in self.listeners
+                              if queue_ is not events]
+
+    def notify(self, event, segments, data):
+        with self.lock:
+            listeners = list(self.listeners)
+        for listened, events in listeners:
+            if segments[:len(listened)] == listened:
+                events.put((event, '/' + '/'.join(segments[len(listened):]), data))
+            elif listened[:len(segments)] == segments:
+                # A write above the listened location replaces it.
+                events.put(('put', '/', self.get(listened)))
+
+
+def _query(value, params):
+    order_by = params.get('orderBy')
+    if order_by is None or not isinstance(value, dict):
+        return value
+    order_by = json.loads(order_by)
+    if order_by == '$key':
+        sort_key = lambda item: key_order(item[0])
+        compared = lambda item: item[0]
+    else:
+        if order_by == '$value':
+            compared = lambda item: item[1]
+        else:
+            path = split_path(order_by)
+
+            def compared(item):
+                node = item[1]
+                for segment in path:
+                    node = node.get(segment) if isinstance(node, dict) else None
+                return node
+        sort_key = lambda item: (_type_order(compared(item)), key_order(item[0]))
+    items = sorted(value.items(), key=sort_key)
+    bound = lambda name: json.loads(params[name])
+    if order_by == '$key':
+        order = key_order
+    else:
+        order = _type_order
+    if 'equalTo' in params:
+        items = [item for item in items if compared(item) == bound('equalTo')]
+    if 'startAt' in params:
+        items = [item for item in items
+                 if order(compared(item)) >= order(bound('startAt'))]
+    if 'endAt' in params:
+        items = [item for item in items
+                 if order(compared(item)) <= order(bound('endAt'))]
+    if 'limitToFirst' in params:
+        items = items[:bound('limitToFirst')]
+    if 'limitToLast' in params:
+        items = items[len(items) - bound('limitToLast'):]
+    return dict(items)
+
+
+class FirebaseRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and bodies are written separately.
+    disable_nagle_algorithm = True
+    KEEP_ALIVE_INTERVAL = 30
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def database(self):
+        return self.server.database
+
+    def _parse(self):
+        url = urlparse.urlparse(self.path)
+        path = url.path
+        if not path.endswith('.json'):
+            self._respond(400, {'error': 'Paths must end with .json'})
+            return None, None
+        params = dict(urlparse.parse_qsl(url.query))
+        return split_path(path[:-len('.json')]), params
+
+    def _body(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        if self.headers.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        return json.loads(body.decode('utf-8')) if body else None
+
+    def _respond(self, status, value=None, body=None, headers=None):
+        if body is None and status not in (204, 304):
+            body = _encode(value)
+        self.send_response(status)
+        for name, header in (headers or {}).items():
+            self.send_header(name, header)
+        if body is not None:
+            if (self.server.gzip_responses and len(body) >= GZIP_MIN_SIZE and
+                    'gzip' in self.headers.get('Accept-Encoding', '')):
+                body = gzip.compress(body)
+                self.send_header('Content-Encoding', 'gzip')
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+        else:
+            self.send_header('Content-Length', '0')
+        self.end_headers()
+        if body is not None:
+            self.wfile.write(body)
+
+    def _reply(self, segments, params, value):
+        headers = {}
+        if self.headers.get('X-Firebase-ETag') == 'true':
+            with self.database.lock:
+                headers['ETag'] = self.database.etag(segments)
+        if params.get('print') == 'silent':
+            self._respond(204, headers=headers)
+        else:
+            self._respond(200, value, headers=headers)
+
+    def do_GET(self):
+        segments, params = self._parse()
+        if segments is None:
+            return
+        if 'text/event-stream' in self.headers.get('Accept', ''):
+            return self._stream(segments)
+        headers = {}
+        if self.headers.get('X-Firebase-ETag') == 'true':
+            with self.database.lock:
+                headers['ETag'] = self.database.etag(segments)
+            if self.headers.get('if-none-match') == headers['ETag']:
+                return self._respond(304, headers=headers)
+        if params.get('shallow') == 'true':
+            value = self.database.get(segments)
+            if isinstance(value, dict):
+                value = dict.fromkeys(value, True)
+            return self._respond(200, value, headers=headers)
+        if 'orderBy' in params:
+            value = _query(self.database.get(segments), params)
+            return self._respond(200, value, headers=headers)
+        self._respond(200, body=self.database.get_encoded(segments), headers=headers)
+
+    def do_PUT(self):
+        segments, params = self._parse()
+        if segments is None:
+            return
+        value = self._body()
+        if not self.database.write(segments, value, self.headers.get('if-match')):
+            with self.database.lock:
+                etag = self.database.etag(segments)
+            return self._respond(412, self.database.get(segments), headers={'ETag': etag})
+        self._reply(segments, params, value)
+
+    def do_POST(self):
+        segments, params = self._parse()
+        if segments is None:
+            return
+        name = generate_push_id()
+        self.database.write(segments + (name,), self._body())
+        self._reply(segments + (name,), params, {'name': name})
+
+    def do_PATCH(self):
+        segments, params = self._parse()
+        if segments is None:
+            return
+        values = self._body()
+        if not isinstance(values, dict):
+            return self._respond(400, {'error': 'Invalid data; couldn\'t parse JSON object.'})
+        self.database.update(segments, values)
+        self._reply(segments, params, values)
+
+    def do_DELETE(self):
+        segments, params = self._parse()
+        if segments is None:
+            return
+        self.database.write(segments, None)
+        self._reply(segments, params, None)
+
+    def _stream(self, segments):
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        events = self.database.listen(segments)
+        try:
+            while not self.server.stopping.is_set():
+                try:
+                    event, path, data = events.get(timeout=self.KEEP_ALIVE_INTERVAL)
+                    if event is None:
+                        break
+                    message = 'event: %s\ndata: %s\n\n' % (
+                        event, json.dumps({'path': path, 'data': data}))
+                except queue.Empty:
+                    message = 'event: keep-alive\ndata: null\n\n'
+                self.wfile.write(message.encode('utf-8'))
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError, ssl.SSLError):
+            pass
+        finally:
+            self.database.unlisten(events)
+
+
+class FirebaseHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Clients open their pooled connections all at once.
+    request_queue_size = 128
+
+
+class FirebaseServer(object):
+    """
+    Class that runs the stand-in server in a background thread on a free
+    local port. `dsn` is the URL to give to the applications and `cafile`
+    the certificate they have to trust. With ``gzip_responses`` the bodies
+    of at least `GZIP_MIN_SIZE` bytes are gzipped for the clients that
+    accept it. Gzipped request bodies are always accepted.
+    """
+    def __init__(self, host='127.0.0.1', port=0, gzip_responses=False):
+        self.database = Database()
+        self._directory = tempfile.mkdtemp(prefix='firebase-benchmark-')
+        self.cafile, keyfile = self._create_certificate(host)
+        self._server = FirebaseHTTPServer((host, port), FirebaseRequestHandler)
+        self._server.database = self.database
+        self._server.stopping = threading.Event()
+        self._server.gzip_responses = gzip_responses
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(self.cafile, keyfile)
+        self._server.socket = context.wrap_socket(self._server.socket, server_side=True)
+        self.dsn = 'https://%s:%d' % (host, self._server.server_address[1])
+        self._thread = None
+
+    def _create_certificate(self, host):
+        if shutil.which('openssl') is None:
+            raise RuntimeError('The openssl command is required to create the '
+                               'certificate of the benchmark server')
+        certfile = os.path.join(self._directory, 'cert.pem')
+        keyfile = os.path.join(self._directory, 'key.pem')
+        subprocess.check_call(
+            ['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+             '-subj', '/CN=%s' % host, '-addext', 'subjectAltName=IP:%s' % host,
+             '-keyout', keyfile, '-out', certfile],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        return certfile, keyfile
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        name='firebase-benchmark-server')
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.stopping.set()
+        with self.database.lock:
+            listeners = list(self.database.listeners)
+        for _, events in listeners:
+            events.put((None, None, None))
+        self._server.shutdown()
+        self._server.server_close()
+        shutil.rmtree(self._directory, ignore_errors=True)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def connection_pool(self, **kwargs):
+        """
+        Returns a `ConnectionPool` whose sessions trust the certificate of
+        the server. Proxies and CA bundles from the environment are ignored.
+        """
+        cafile = self.cafile
+
+        class ServerConnectionPool(ConnectionPool):
+            def _create_session(self):
+                session = super(ServerConnectionPool, self)._create_session()
+                session.trust_env = False
+                session.verify = cafile
+                return session
+        return ServerConnectionPool(**kwargs)
+
+    def ssl_context(self):
+        """
+        Returns an SSL context that trusts the certificate of the server,
+        for the asyncio client.
+        """
+        return ssl.create_default_context(cafile=self.cafile)
@@ -1,15 +1,35 @@
 import atexit
+import sys
 
-from .multiprocess_pool import process_pool
 from firebase import *
 
 
+def __getattr__(name):
+    # The process pool module is only imported when it is asked for.
+    if name == 'process_pool':
+        from .multiprocess_pool import process_pool
+        return process_pool
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
+
+
 @atexit.register
 def close_process_pool():
     """
     Clean up function that closes and terminates the process pool
-    defined in the ``async`` file.
+    defined in the ``multiprocess_pool`` file, if it was ever created.
+    """
+    multiprocess_pool = sys.modules.get(__name__ + '.multiprocess_pool')
+    if multiprocess_pool is not None:
+        multiprocess_pool.close_process_pool()
+
+
+@atexit.register
+def close_buffered_writers():
+    """
+    Clean up function that flushes the pending writes of the open
+    ``BufferedWriter`` instances, if the ``writer`` file was ever imported.
     """
-    process_pool.close()
-    process_pool.join()
-    process_pool.terminate()
+    writer_module = sys.modules.get(__name__ + '.writer')
+    if writer_module is not None:
+        for writer in list(writer_module.buffered_writers):
+            writer.close()
@@ -0,0 +1,272 @@
+import asyncio
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from .cache import endpoint_segments
+from .coalesce import AsyncSingleFlight, request_key
+from .firebase import BaseFirebaseApplication, apply_response_mode
+from .jsonutil import default_codec
+from .metrics import RequestInfo
+
+__all__ = ['AsyncConnectionPool', 'AsyncFirebaseApplication', 'make_request']
+
+
+class AsyncConnectionPool(object):
+    """
+    Class that owns a keep-alive ``aiohttp.ClientSession`` shared by all the
+    requests of an `AsyncFirebaseApplication`. The session is created lazily
+    inside the running event loop on first use.
+
+    `timeout`: Total timeout of each request in seconds.
+    `limit`: Maximum number of simultaneously open connections.
+    `limit_per_host`: Maximum number of open connections per host, 0 means
+    no per-host limit.
+    `keepalive_timeout`: Seconds an idle connection is kept open.
+    """
+    def __init__(self, timeout=60, limit=1000, limit_per_host=0,
+                 keepalive_timeout=15):
+        self.timeout = timeout
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self._session = None
+
+    def _create_session(self):
+        if aiohttp is None:
+            raise ImportError('aiohttp is required to use AsyncFirebaseApplication. '
+                              'Install it with `pip install aiohttp`.')
+        connector = aiohttp.TCPConnector(limit=self.limit,
+                                         limit_per_host=self.limit_per_host,
+                                         keepalive_timeout=self.keepalive_timeout)
+        session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            headers={'Content-type': 'application/json'})
+        return session
+
+    def get_connection(self):
+        """
+        Method that returns the shared session, creating it on first use.
+        """
+        if self._session is None or self._session.closed:
+            self._session = self._create_session()
+        return self._session
+
+    async def close(self):
+        """
+        Closes the open connections.
+        """
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+async def make_request(method, url, params, headers, connection, data=None,
+                       retry_policy=None, codec=None, hooks=None, rate_limiter=None,
+                       response_mode='full'):
+    """
+    Coroutine that makes an HTTP request to the given firebase endpoint.
+    `method`: HTTP method name, one of get, put, post, patch and delete.
+    `url`: The full URL of the firebase endpoint (DSN appended.)
+    `params`: Python dict that is appended to the URL like a querystring.
+    `headers`: Python dict. HTTP request headers.
+    `connection`: An ``aiohttp.ClientSession`` instance.
+    `data`: JSON encoded request body, if any.
+    `retry_policy`: Optional `RetryPolicy` applied to failed attempts.
+    `codec`: Codec of the response body, `default_codec` if not given.
+    `hooks`: Optional `metrics.RequestHook` told about the request.
+    `rate_limiter`: Optional `RateLimiter` pacing the request.
+    `response_mode`: ``'full'``, ``'silent'`` or ``'etag'`` for a write, see
+    `firebase.apply_response_mode`.
+
+    The returning value is a Python dict deserialized by the JSON decoder. However,
+    if the status code is not 2x or 403, an aiohttp.ClientResponseError is raised.
+
+    response = await make_request('get', 'https://firebase.localhost/users.json',
+                                  {}, {}, session)
+    response => {'1': 'John Doe', '2': 'Jane Doe'}
+    """
+    params, headers = apply_response_mode(response_mode, params, headers)
+    kwargs = {'params': params, 'headers': headers}
+    if data is not None:
+        kwargs['data'] = data
+    state = retry_policy.start(method, url) if retry_policy is not None else None
+    info = None
+    if hooks is not None:
+        info = RequestInfo(method, url, params, headers, data)
+        hooks.before_request(info)
+    try:
+        response, content = await _send_attempts(method, url, connection, kwargs, state,
+                                                 rate_limiter, hooks)
+    except Exception as exception:
+        if info is not None:
+            hooks.after_request(info.finish(retry_state=state, exception=exception))
+        raise
+    if info is not None:
+        hooks.after_request(info.finish(response.status, len(content), state))
+    ok = 200 <= response.status < 300
+    if ok and response_mode != 'full':
+        return response.headers.get('ETag') if response_mode == 'etag' else None
+    if ok or response.status == 403:
+        return (codec or default_codec).loads(content) if content else None
+    response.raise_for_status()
+
+
+async def _send_attempts(method, url, connection, kwargs, state, rate_limiter=None,
+                         hooks=None):
+    while True:
+        if state is not None:
+            state.before_attempt()
+        permit = None
+        if rate_limiter is not None:
+            permit = await rate_limiter.acquire_async(url, len(kwargs.get('data') or b''))
+            if hooks is not None:
+                hooks.on_rate_limit_wait(permit.waited)
+        try:
+            async with connection.request(method.upper(), url, **kwargs) as response:
+                content = await response.read()
+                if state is None:
+                    return response, content
+                delay = state.on_response(response.status,
+                                          response.headers.get('Retry-After'))
+                if delay is None:
+                    return response, content
+        except Exception as exception:
+            delay = state.on_exception(exception) if state is not None else None
+            if delay is None:
+                raise
+        finally:
+            if permit is not None:
+                permit.release()
+        await asyncio.sleep(delay)
+
+
+class AsyncFirebaseApplication(BaseFirebaseApplication):
+    """
+    Asyncio version of `FirebaseApplication`. Every HTTP method is a
+    coroutine and all of them share the keep-alive connections of a single
+    `AsyncConnectionPool`, so thousands of requests can be in flight at the
+    same time within one event loop. Requires the ``aiohttp`` package.
+
+    async with AsyncFirebaseApplication('https://firebase.localhost', auth) as firebase:
+        users = await asyncio.gather(*[firebase.get('/users', uid) for uid in uids])
+
+    See `FirebaseApplication` for ``rate_limiter``, ``coalesce`` and the
+    ``response_mode`` of the writes.
+    """
+    def __init__(self, dsn, authentication=None, connection_pool=None,
+                 retry_policy=None, codec=None, hooks=None, gzip_threshold=None,
+                 gzip_level=6, rate_limiter=None, coalesce=False):
+        super(AsyncFirebaseApplication, self).__init__(dsn, authentication, codec,
+                                                       hooks, gzip_threshold, gzip_level)
+        self.connection_pool = connection_pool or AsyncConnectionPool()
+        self.retry_policy = retry_policy
+        self.rate_limiter = rate_limiter
+        self.flights = AsyncSingleFlight() if coalesce else None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        """
+        Closes the pooled connections owned by the application.
+        """
+        await self.connection_pool.close()
+
+    def _get_connection(self, connection=None):
+        return connection or self.connection_pool.get_connection()
+
+    def _forget(self, endpoint):
+        # Later reads of a written path must not join a request sent before.
+        if self.flights is not None:
+            self.flights.forget(endpoint_segments(endpoint))
+
+    async def get(self, url, name, params=None, headers=None, connection=None):
+        """
+        Asynchronous GET request. With ``coalesce``, identical requests made
+        at the same time share a single one.
+        """
+        endpoint, params, headers = self._prepare_request(url, name, params, headers)
+        if self.flights is not None:
+            return await self.flights.do(request_key(endpoint, params, headers),
+                                         make_request, 'get', endpoint, params, headers,
+                                         self._get_connection(connection),
+                                         retry_policy=self.retry_policy, codec=self.codec,
+                                         hooks=self.hooks, rate_limiter=self.rate_limiter)
+        return await make_request('get', endpoint, params, headers,
+                                  self._get_connection(connection),
+                                  retry_policy=self.retry_policy, codec=self.codec,
+                                  hooks=self.hooks, rate_limiter=self.rate_limiter)
+
+    async def put(self, url, name, data, params=None, headers=None, connection=None,
+                  response_mode='full'):
+        """
+        Asynchronous PUT request. ``data`` must be a JSONable value.
+        """
+        assert name, 'Snapshot name must be specified'
+        endpoint, params, headers = self._prepare_request(url, name, params, headers)
+        data, headers = self._encode_body(data, headers)
+        try:
+            return await make_request('put', endpoint, params, headers,
+                                      self._get_connection(connection),
+                                      data=data,
+                                      retry_policy=self.retry_policy, codec=self.codec,
+                                      hooks=self.hooks, rate_limiter=self.rate_limiter,
+                                      response_mode=response_mode)
+        finally:
+            self._forget(endpoint)
+
+    async def post(self, url, data, params=None, headers=None, connection=None,
+                   response_mode='full'):
+        """
+        Asynchronous POST request. ``data`` must be a JSONable value.
+        """
+        endpoint, params, headers = self._prepare_request(url, None, params, headers)
+        data, headers = self._encode_body(data, headers)
+        try:
+            return await make_request('post', endpoint, params, headers,
+                                      self._get_connection(connection),
+                                      data=data,
+                                      retry_policy=self.retry_policy, codec=self.codec,
+                                      hooks=self.hooks, rate_limiter=self.rate_limiter,
+                                      response_mode=response_mode)
+        finally:
+            self._forget(endpoint)
+
+    async def patch(self, url, data, params=None, headers=None, connection=None,
+                    response_mode='full'):
+        """
+        Asynchronous PATCH request. ``data`` must be a JSONable value.
+        """
+        endpoint, params, headers = self._prepare_request(url, None, params, headers)
+        data, headers = self._encode_body(data, headers)
+        try:
+            return await make_request('patch', endpoint, params, headers,
+                                      self._get_connection(connection),
+                                      data=data,
+                                      retry_policy=self.retry_policy, codec=self.codec,
+                                      hooks=self.hooks, rate_limiter=self.rate_limiter,
+                                      response_mode=response_mode)
+        finally:
+            self._forget(endpoint)
+
+    async def delete(self, url, name, params=None, headers=None, connection=None,
+                     response_mode='full'):
+        """
+        Asynchronous DELETE request.
+        """
+        endpoint, params, headers = self._prepare_request(url, name, params, headers)
+        try:
+            return await make_request('delete', endpoint, params, headers,
+                                      self._get_connection(connection),
+                                      retry_policy=self.retry_policy, codec=self.codec,
+                                      hooks=self.hooks, rate_limiter=self.rate_limiter,
+                                      response_mode=response_mode)
+        finally:
+            self._forget(endpoint)
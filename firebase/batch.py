@@ -0,0 +1,175 @@
+import copy
+
+from .mirror import split_path
+
+__all__ = ['WriteBatch', 'WriteRejected', 'raise_for_denied']
+
+
+class WriteRejected(Exception):
+    """
+    Raised when the backend rejects a write with 403 Permission Denied, e.g.
+    because of the security rules. ``error`` is the decoded error body.
+    """
+    status_code = 403
+
+    def __init__(self, error):
+        super(WriteRejected, self).__init__(error)
+        self.error = error
+
+
+def raise_for_denied(value):
+    """
+    Raises `WriteRejected` when ``value`` is the ``{'error': ...}`` body
+    that the request helpers return instead of the data of a read denied
+    with 403 Permission Denied. Returns ``value`` otherwise.
+
+    users = raise_for_denied(firebase.get('/users', None))
+    """
+    if (isinstance(value, dict) and len(value) == 1 and 'error' in value and
+            not isinstance(value['error'], (dict, list, bool))):
+        raise WriteRejected(value)
+    return value
+
+
+class WriteBatch(object):
+    """
+    Class that accumulates writes to arbitrary paths and flushes them as
+    multi-location PATCH requests on the root of the database, so that N
+    writes cost a handful of requests instead of N.
+
+    Writes are coalesced while they are queued: a later write to a path
+    overrides the earlier writes to that path and to its descendants, and a
+    write below an already queued path is merged into the queued value.
+    Deletes are sent as ``None``. Updates are split into several requests
+    whenever their encoded size would exceed ``max_bytes``.
+
+    with firebase.batch() as batch:
+        batch.set('/users/1/name', 'John Doe')
+        batch.update('/users/2', {'name': 'Jane Doe', 'age': 30})
+        batch.delete('/users/3')
+    """
+    def __init__(self, application, max_bytes=1024 * 1024, params=None,
+                 headers=None):
+        self.application = application
+        self.max_bytes = max_bytes
+        self.params = params
+        self.headers = headers
+        self._updates = {}
+        # Number of queued paths strictly below each prefix.
+        self._descendants = {}
+
+    def __len__(self):
+        return len(self._updates)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+
+    def _track(self, segments, delta):
+        for length in range(len(segments)):
+            prefix = segments[:length]
+            count = self._descendants.get(prefix, 0) + delta
+            if count:
+                self._descendants[prefix] = count
+            else:
+                del self._descendants[prefix]
+
+    def _remove(self, segments):
+        del self._updates[segments]
+        self._track(segments, -1)
+
+    def _add(self, segments, value):
+        assert segments, 'The root cannot be written in a batch'
+        for length in range(1, len(segments)):
+            ancestor = segments[:length]
+            if ancestor in self._updates:
+                self._updates[ancestor] = self._merge(
+                    self._updates[ancestor], segments[length:], value)
+                return
+        if segments in self._descendants:
+            for queued in [queued for queued in self._updates
+                           if queued[:len(segments)] == segments]:
+                self._remove(queued)
+        if segments not in self._updates:
+            self._track(segments, 1)
+        self._updates[segments] = copy.deepcopy(value)
+
+    @staticmethod
+    def _merge(target, segments, value):
+        if value is None and not isinstance(target, dict):
+            return target
+        root = target if isinstance(target, dict) else {}
+        node = root
+        for segment in segments[:-1]:
+            child = node.get(segment)
+            if not isinstance(child, dict):
+                child = node[segment] = {}
+            node = child
+        if value is None:
+            node.pop(segments[-1], None)
+        else:
+            node[segments[-1]] = copy.deepcopy(value)
+        return root
+
+    def set(self, path, value):
+        """
+        Queues the replacement of the value at the given path.
+        """
+        self._add(split_path(path), value)
+        return self
+
+    def update(self, path, values):
+        """
+        Queues the update of the given children of the path, like a PATCH.
+        """
+        segments = split_path(path)
+        for key, value in values.items():
+            self._add(segments + split_path(key), value)
+        return self
+
+    def delete(self, path):
+        """
+        Queues the removal of the given path.
+        """
+        self._add(split_path(path), None)
+        return self
+
+    def chunks(self):
+        """
+        Returns the queued writes as a list of multi-location update dicts,
+        each of which encodes to at most ``max_bytes`` unless it holds a
+        single oversized write.
+        """
+        chunks = []
+        chunk, size = {}, 2
+        for segments, value in self._updates.items():
+            key = '/'.join(segments)
+            entry_size = len(key) + len(self.application._encode_data(value)) + 6
+            if chunk and size + entry_size > self.max_bytes:
+                chunks.append(chunk)
+                chunk, size = {}, 2
+            chunk[key] = value
+            size += entry_size
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+
+    def commit(self):
+        """
+        Sends the queued writes and empties the batch. The written values
+        are not echoed back. If a request fails, or is rejected and
+        `WriteRejected` is raised, the writes that were not sent yet stay
+        queued, those of the failed request included.
+        """
+        for chunk in self.chunks():
+            error = self.application.patch('/', chunk, params=dict(self.params or {}),
+                                           headers=dict(self.headers or {}),
+                                           response_mode='silent')
+            if error is not None:
+                # Only the 403 error bodies are decoded in silent mode.
+                raise WriteRejected(error)
+            for key in chunk:
+                self._remove(split_path(key))
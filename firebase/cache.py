@@ -0,0 +1,236 @@
+import copy
+import threading
+import time
+from collections import OrderedDict, deque
+
+try:
+    import urlparse
+except ImportError:
+    #py3k
+    from urllib import parse as urlparse
+
+from .mirror import split_path
+
+__all__ = ['ResponseCache', 'endpoint_segments']
+
+
+def endpoint_segments(endpoint):
+    """
+    Returns the path segments of a firebase endpoint URL.
+
+    endpoint_segments('https://firebase.localhost/users/1.json') => ('users', '1')
+    """
+    path = urlparse.urlparse(endpoint).path
+    if path.endswith('.json'):
+        path = path[:-len('.json')]
+    return split_path(path)
+
+
+class CacheEntry(object):
+    __slots__ = ['segments', 'value', 'etag', 'size', 'expires_at']
+
+    def __init__(self, segments, value, etag, size, expires_at):
+        self.segments = segments
+        self.value = value
+        self.etag = etag
+        self.size = size
+        self.expires_at = expires_at
+
+
+class PathNode(object):
+    # Node of the index of the cached entries by path. ``keys`` holds the
+    # keys of the entries of the node's own path.
+    __slots__ = ['keys', 'children']
+
+    def __init__(self):
+        self.keys = set()
+        self.children = {}
+
+
+def _overlap(first, second):
+    """
+    Returns True if one of the given segment tuples is a prefix of the other.
+    """
+    length = min(len(first), len(second))
+    return first[:length] == second[:length]
+
+
+class ResponseCache(object):
+    """
+    Class that caches the responses of `FirebaseApplication.get` in memory.
+    Entries are keyed on the endpoint URL and the querystring, evicted in
+    least recently used order once their total size exceeds ``max_bytes``
+    and considered fresh for a TTL. ``ttls`` maps path prefixes to TTLs in
+    seconds, the longest matching prefix wins over ``default_ttl``.
+
+    Stale entries that carry an ETag are revalidated with an ``if-none-match``
+    request instead of being downloaded again. Writes made by the same
+    application invalidate the entries of the written path, its ancestors
+    and its descendants, which are found through an index of the entries by
+    path. A response is not stored if the path was invalidated while it was
+    being fetched: pass the ``generation`` read before the request to
+    `store`.
+
+    cache = ResponseCache(max_bytes=64 * 1024 * 1024, default_ttl=5,
+                          ttls={'/config': 300})
+    firebase = FirebaseApplication('https://firebase.localhost', auth, cache=cache)
+    """
+    # Invalidations remembered to check the responses of the requests that
+    # were in flight, older requests are not stored.
+    MAX_INVALIDATIONS = 1024
+
+    def __init__(self, max_bytes=16 * 1024 * 1024, default_ttl=60, ttls=None):
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.ttls = sorted(((split_path(prefix), ttl)
+                            for prefix, ttl in (ttls or {}).items()),
+                           key=lambda item: len(item[0]), reverse=True)
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.generation = 0
+        self._entries = OrderedDict()
+        self._index = PathNode()
+        self._invalidations = deque(maxlen=self.MAX_INVALIDATIONS)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(endpoint, params):
+        return (endpoint, tuple(sorted((str(key), str(value))
+                                       for key, value in (params or {}).items())))
+
+    def ttl_for(self, segments):
+        for prefix, ttl in self.ttls:
+            if segments[:len(prefix)] == prefix:
+                return ttl
+        return self.default_ttl
+
+    def lookup(self, key):
+        """
+        Returns a ``(entry, fresh)`` tuple for the given key. ``entry`` is
+        None when nothing is cached.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None, False
+            self._entries.move_to_end(key)
+            fresh = time.time() < entry.expires_at
+            if fresh:
+                self.hits += 1
+            else:
+                self.misses += 1
+            return entry, fresh
+
+    def read(self, entry):
+        """
+        Returns a copy of the cached value so that callers cannot alter the
+        cache by mutating the result.
+        """
+        return copy.deepcopy(entry.value)
+
+    def _add(self, key, entry):
+        self._entries[key] = entry
+        self.size += entry.size
+        node = self._index
+        for segment in entry.segments:
+            child = node.children.get(segment)
+            if child is None:
+                child = node.children[segment] = PathNode()
+            node = child
+        node.keys.add(key)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self.size -= entry.size
+        parents = []
+        node = self._index
+        for segment in entry.segments:
+            parents.append((node, segment))
+            node = node.children[segment]
+        node.keys.discard(key)
+        # Prune the index nodes left empty.
+        while parents and not node.keys and not node.children:
+            parent, segment = parents.pop()
+            del parent.children[segment]
+            node = parent
+
+    def _invalidated_since(self, generation, segments):
+        if generation == self.generation:
+            return False
+        invalidations = self._invalidations
+        if not invalidations or invalidations[0][0] > generation + 1:
+            # The invalidations made since then are not all remembered.
+            return True
+        for invalidated, prefix in reversed(invalidations):
+            if invalidated <= generation:
+                return False
+            if _overlap(prefix, segments):
+                return True
+        return False
+
+    def store(self, key, segments, value, etag=None, size=0, generation=None):
+        """
+        Caches a value. If ``generation`` is given, the value is dropped when
+        an invalidation of an overlapping path happened since the
+        `generation` attribute had that value.
+        """
+        expires_at = time.time() + self.ttl_for(segments)
+        with self._lock:
+            if generation is not None and self._invalidated_since(generation, segments):
+                return
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_bytes:
+                return
+            self._add(key, CacheEntry(segments, value, etag, size, expires_at))
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def revalidated(self, key, entry):
+        """
+        Marks an entry as fresh again after the server answered a
+        conditional request with 304 Not Modified. The stale lookup that
+        preceded the request is then counted as a hit.
+        """
+        with self._lock:
+            entry.expires_at = time.time() + self.ttl_for(entry.segments)
+            self.revalidations += 1
+            self.misses -= 1
+            self.hits += 1
+
+    def invalidate(self, segments):
+        """
+        Drops the entries of the given path, its ancestors and its
+        descendants.
+        """
+        with self._lock:
+            self.generation += 1
+            self._invalidations.append((self.generation, segments))
+            keys = []
+            node = self._index
+            keys.extend(node.keys)
+            for segment in segments:
+                node = node.children.get(segment)
+                if node is None:
+                    break
+                keys.extend(node.keys)
+            else:
+                stack = list(node.children.values())
+                while stack:
+                    node = stack.pop()
+                    keys.extend(node.keys)
+                    stack.extend(node.children.values())
+            for key in keys:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._index = PathNode()
+            self.size = 0
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,297 @@
+"""
+Command line tool that exports a subtree of a Firebase database to NDJSON
+or JSON and imports NDJSON files into it. Each NDJSON line holds a child of
+the exported location as ``{"key": ..., "value": ...}``.
+
+python -m firebase export https://app.firebaseio.com /users --output users.ndjson --checkpoint users.ckpt
+python -m firebase import https://app.firebaseio.com /users users.ndjson --concurrency 8 --rate 50
+"""
+import argparse
+import bisect
+import collections
+import itertools
+import os
+import sys
+import time
+from concurrent.futures import wait, FIRST_COMPLETED
+
+from .batch import raise_for_denied
+from .firebase import FirebaseApplication, FirebaseAuthentication, WriteRejected
+from .query import key_order
+from .ratelimit import RateLimiter
+from .retry import RetryPolicy
+
+__all__ = ['export_tree', 'import_tree', 'main']
+
+
+def read_checkpoint(path):
+    """
+    Returns the content of a checkpoint file, None if there is none.
+    """
+    if path is None or not os.path.exists(path):
+        return None
+    with open(path) as checkpoint_file:
+        return checkpoint_file.read().rstrip('\n')
+
+
+def write_checkpoint(path, value):
+    """
+    Replaces the content of a checkpoint file atomically.
+    """
+    temporary = path + '.tmp'
+    with open(temporary, 'w') as checkpoint_file:
+        checkpoint_file.write('%s\n' % value)
+    os.replace(temporary, path)
+
+
+def _encode(codec, value):
+    encoded = codec.dumps(value)
+    return encoded if isinstance(encoded, bytes) else encoded.encode('utf-8')
+
+
+def fetch_pages(application, path, pages, concurrency):
+    """
+    Fetches the children of ``path`` listed in each of the ``pages`` of
+    keys with a key range query, ``concurrency`` pages at a time, and
+    yields the pages with their children in order. A page denied by the
+    security rules raises `WriteRejected`.
+    """
+    pages = iter(pages)
+    # Requests in the order they were sent.
+    pending = collections.deque()
+    try:
+        while True:
+            for page in itertools.islice(pages, concurrency - len(pending)):
+                query = application.query(path).order_by_key().start_at(page[0])
+                pending.append((page, query.end_at(page[-1]).get_async()))
+            if not pending:
+                return
+            page, future = pending.popleft()
+            yield page, raise_for_denied(future.result()) or {}
+    finally:
+        for _, future in pending:
+            future.cancel()
+
+
+def export_tree(application, path, output, format='ndjson', concurrency=8,
+                page_size=500, checkpoint=None, progress=None):
+    """
+    Writes the children of ``path`` to the binary file ``output`` in key
+    order. The keys are listed with a shallow request and the children are
+    fetched in pages of ``page_size`` keys by ``concurrency`` parallel
+    requests, so a large subtree is never held in memory as a whole.
+
+    With ``checkpoint``, the last written key is saved to that file after
+    each page; an interrupted NDJSON export appended to the same output
+    resumes after it. ``progress`` is called with the number of children
+    written. Returns that number. A location denied by the security rules
+    raises `WriteRejected`.
+    """
+    codec = application.codec
+    keys = application.keys(path)
+    done = read_checkpoint(checkpoint)
+    if done is not None:
+        if format != 'ndjson':
+            raise ValueError('Only NDJSON exports can be resumed')
+        orders = [key_order(key) for key in keys]
+        keys = keys[bisect.bisect_right(orders, key_order(done)):]
+    pages = [keys[start:start + page_size] for start in range(0, len(keys), page_size)]
+    if format == 'json':
+        output.write(b'{')
+    count = 0
+    for page, children in fetch_pages(application, path, pages, concurrency):
+        for key in page:
+            value = children.get(key)
+            if value is None:
+                # Removed since the keys were listed.
+                continue
+            if format == 'json':
+                output.write(b'%s%s:%s' % (b',' if count else b'', _encode(codec, key),
+                                           _encode(codec, value)))
+            else:
+                output.write(_encode(codec, {'key': key, 'value': value}) + b'\n')
+            count += 1
+        if checkpoint is not None:
+            output.flush()
+            write_checkpoint(checkpoint, page[-1])
+        if progress is not None:
+            progress(count)
+    if format == 'json':
+        output.write(b'}\n')
+    output.flush()
+    return count
+
+
+def import_tree(application, path, lines, chunk_size=500, max_bytes=1024 * 1024,
+                concurrency=4, checkpoint=None, progress=None):
+    """
+    Writes the children read from the NDJSON ``lines`` under ``path``. The
+    children are grouped in multi-path PATCH requests of at most
+    ``chunk_size`` children and about ``max_bytes`` of data, and up to
+    ``concurrency`` of them are in flight, so the file is streamed instead
+    of being loaded.
+
+    With ``checkpoint``, the number of lines whose children were written
+    is saved to that file after each request; an interrupted import of the
+    same file resumes after them. ``progress`` is called with that number.
+    Returns the number of children written. A request rejected by the
+    backend raises `WriteRejected` and the checkpoint stays before it.
+    """
+    codec = application.codec
+    start = int(read_checkpoint(checkpoint) or 0)
+    # Requests in the order they were sent, with the last line they hold.
+    pending = collections.deque()
+    written = [0]
+
+    def settle(block):
+        if block and pending:
+            wait([future for future, _, _ in pending], return_when=FIRST_COMPLETED)
+        while pending and pending[0][0].done():
+            future, line_number, children = pending.popleft()
+            error = future.result()
+            if error is not None:
+                # Only the 403 error bodies are decoded in silent mode.
+                raise WriteRejected(error)
+            written[0] += children
+            if checkpoint is not None:
+                write_checkpoint(checkpoint, line_number)
+            if progress is not None:
+                progress(line_number)
+
+    def send(chunk, line_number):
+        while len(pending) >= concurrency:
+            settle(True)
+        future = application.patch_async(path, chunk, response_mode='silent')
+        pending.append((future, line_number, len(chunk)))
+        settle(False)
+
+    chunk, size = {}, 0
+    line_number = 0
+    try:
+        for line_number, line in enumerate(lines, 1):
+            if line_number <= start or not line.strip():
+                continue
+            record = codec.loads(line)
+            chunk[record['key']] = record['value']
+            size += len(line)
+            if len(chunk) >= chunk_size or size >= max_bytes:
+                send(chunk, line_number)
+                chunk, size = {}, 0
+        if chunk:
+            send(chunk, line_number)
+        while pending:
+            settle(True)
+    finally:
+        for future, _, _ in pending:
+            future.cancel()
+    return written[0]
+
+
+def create_application(options):
+    authentication = None
+    secret = options.secret or os.environ.get('FIREBASE_SECRET')
+    if secret:
+        authentication = FirebaseAuthentication(secret, options.email)
+    rate_limiter = None
+    if options.rate or options.bandwidth:
+        rate_limiter = RateLimiter(requests_per_second=options.rate,
+                                   bytes_per_second=options.bandwidth)
+    return FirebaseApplication(options.dsn, authentication,
+                               max_workers=options.concurrency,
+                               retry_policy=RetryPolicy(max_retries=options.retries),
+                               gzip_threshold=1024 if options.gzip else None,
+                               rate_limiter=rate_limiter)
+
+
+class Progress(object):
+    """
+    Reports the progress of a command to stderr at most once a second.
+    """
+    def __init__(self, label, stream=sys.stderr):
+        self.label = label
+        self.stream = stream
+        self.started = time.time()
+        self.reported = self.started
+
+    def __call__(self, count):
+        now = time.time()
+        if now - self.reported >= 1:
+            self.reported = now
+            self.stream.write('%s %d (%.1f/s)\n' % (
+                self.label, count, count / max(now - self.started, 1e-6)))
+
+
+def main(argv=None):
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('dsn')
+    common.add_argument('path')
+    common.add_argument('--secret', help='Firebase secret, defaults to $FIREBASE_SECRET')
+    common.add_argument('--email', default='python-firebase@firebase.com',
+                        help='email the authentication tokens are minted for')
+    common.add_argument('--concurrency', type=int, default=8,
+                        help='requests in flight at the same time')
+    common.add_argument('--rate', type=float, help='maximum requests per second')
+    common.add_argument('--bandwidth', type=int,
+                        help='maximum request body bytes per second')
+    common.add_argument('--retries', type=int, default=5,
+                        help='retries of a failed request')
+    common.add_argument('--gzip', action='store_true',
+                        help='gzip the request bodies of 1KB or more')
+    common.add_argument('--quiet', action='store_true', help='do not report progress')
+
+    parser = argparse.ArgumentParser(prog='python -m firebase',
+                                     description=__doc__.strip().split('\n\n')[0])
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    export_parser = commands.add_parser('export', parents=[common],
+                                        help='export a subtree')
+    export_parser.add_argument('--output', default='-',
+                               help='output file, - for stdout')
+    export_parser.add_argument('--format', choices=['ndjson', 'json'], default='ndjson')
+    export_parser.add_argument('--page-size', type=int, default=500,
+                               help='children fetched per request')
+    export_parser.add_argument('--checkpoint', help='file the last exported key is saved to')
+
+    import_parser = commands.add_parser('import', parents=[common],
+                                        help='import an NDJSON file')
+    import_parser.add_argument('input', help='NDJSON file, - for stdin')
+    import_parser.add_argument('--chunk-size', type=int, default=500,
+                               help='children written per request')
+    import_parser.add_argument('--max-bytes', type=int, default=1024 * 1024,
+                               help='approximate bytes written per request')
+    import_parser.add_argument('--checkpoint',
+                               help='file the number of imported lines is saved to')
+    options = parser.parse_args(argv)
+
+    progress = None if options.quiet else Progress(
+        'exported' if options.command == 'export' else 'imported lines')
+    with create_application(options) as application:
+        if options.command == 'export':
+            if options.output == '-':
+                output = sys.stdout.buffer
+            else:
+                resume = read_checkpoint(options.checkpoint) is not None
+                output = open(options.output, 'ab' if resume else 'wb')
+            try:
+                count = export_tree(application, options.path, output, options.format,
+                                    options.concurrency, options.page_size,
+                                    options.checkpoint, progress)
+            finally:
+                if output is not sys.stdout.buffer:
+                    output.close()
+        else:
+            if options.input == '-':
+                lines = sys.stdin.buffer
+            else:
+                lines = open(options.input, 'rb')
+            try:
+                count = import_tree(application, options.path, lines,
+                                    options.chunk_size, options.max_bytes,
+                                    options.concurrency, options.checkpoint, progress)
+            finally:
+                if lines is not sys.stdin.buffer:
+                    lines.close()
+    if progress is not None:
+        sys.stderr.write('%s %d children\n' % (options.command + 'ed', count))
+    return 0
@@ -0,0 +1,183 @@
+import copy
+import threading
+from concurrent.futures import CancelledError, Future, InvalidStateError
+
+from .cache import endpoint_segments
+
+__all__ = ['SingleFlight', 'AsyncSingleFlight', 'request_key']
+
+
+def request_key(endpoint, params, headers):
+    """
+    Returns the key under which identical GET requests are coalesced.
+    """
+    return (endpoint,
+            tuple(sorted((str(key), str(value)) for key, value in params.items())),
+            tuple(sorted((str(key), str(value)) for key, value in headers.items())))
+
+
+def _overlaps(key, segments):
+    key_segments = endpoint_segments(key[0])
+    length = min(len(segments), len(key_segments))
+    return key_segments[:length] == segments[:length]
+
+
+def _resolve(future, value=None, exception=None):
+    # The callers may have cancelled their futures in the meantime.
+    try:
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(value)
+    except InvalidStateError:
+        pass
+
+
+class Flight(object):
+    __slots__ = ['subscribers']
+
+    def __init__(self):
+        self.subscribers = []
+
+
+class SingleFlight(object):
+    """
+    Class that lets concurrent identical requests share a single one. The
+    first call with a key makes the request, the calls made with the same
+    key while it is in flight wait for its outcome. Each of them receives
+    its own copy of the result, so that they can mutate it freely. The
+    outcome is not kept once the request is done.
+
+    ``shared`` counts the calls that were answered by another call's request.
+    """
+    def __init__(self):
+        self.shared = 0
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def _join(self, key):
+        # Returns the future of a flight in progress or starts a new one.
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = Flight()
+                return flight, None
+            future = Future()
+            flight.subscribers.append(future)
+            self.shared += 1
+            return flight, future
+
+    def _land(self, key, flight, value=None, exception=None):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        for future in flight.subscribers:
+            if exception is not None:
+                _resolve(future, exception=exception)
+            elif not future.cancelled():
+                _resolve(future, copy.deepcopy(value))
+
+    def do(self, key, function, *args, **kwargs):
+        """
+        Calls ``function`` unless an identical call is in flight and returns
+        its result.
+        """
+        flight, future = self._join(key)
+        if future is not None:
+            return future.result()
+        try:
+            value = function(*args, **kwargs)
+        except BaseException as exception:
+            # KeyboardInterrupt and the like must not leave the waiting
+            # calls blocked.
+            self._land(key, flight, exception=exception)
+            raise
+        self._land(key, flight, value)
+        return value
+
+    def submit(self, key, submit):
+        """
+        Version of `do` for executors: ``submit`` starts the request and
+        returns its future. Returns a future of the result.
+        """
+        flight, future = self._join(key)
+        if future is not None:
+            return future
+        result = Future()
+
+        def done(inner):
+            if inner.cancelled():
+                self._land(key, flight, exception=CancelledError())
+                result.cancel()
+                return
+            exception = inner.exception()
+            value = inner.result() if exception is None else None
+            self._land(key, flight, value, exception)
+            _resolve(result, value, exception)
+        try:
+            inner = submit()
+        except BaseException as exception:
+            self._land(key, flight, exception=exception)
+            raise
+        inner.add_done_callback(done)
+        return result
+
+    def forget(self, segments):
+        """
+        Detaches the requests in flight to the given path, its ancestors and
+        its descendants, so that the calls made after a write to it send a
+        new request.
+        """
+        with self._lock:
+            for key in [key for key in self._flights if _overlaps(key, segments)]:
+                del self._flights[key]
+
+
+class AsyncSingleFlight(object):
+    """
+    Asyncio version of `SingleFlight`. The shared request runs in its own
+    task: it is only cancelled when all of the calls waiting for it are.
+    """
+    def __init__(self):
+        self.shared = 0
+        self._flights = {}
+
+    async def do(self, key, function, *args, **kwargs):
+        """
+        Awaits ``function(*args, **kwargs)`` unless an identical call is in
+        flight and returns its result.
+        """
+        import asyncio
+        entry = self._flights.get(key)
+        if entry is None:
+            task = asyncio.ensure_future(function(*args, **kwargs))
+            entry = self._flights[key] = [task, 0]
+            task.add_done_callback(lambda task: self._remove(key, entry))
+        else:
+            self.shared += 1
+        task = entry[0]
+        entry[1] += 1
+        try:
+            await asyncio.shield(task)
+        except asyncio.CancelledError:
+            entry[1] -= 1
+            if not entry[1] and not task.done():
+                task.cancel()
+            raise
+        except Exception:
+            entry[1] -= 1
+            raise
+        entry[1] -= 1
+        # The last waiter to resume gets the original value.
+        return task.result() if not entry[1] else copy.deepcopy(task.result())
+
+    def _remove(self, key, entry):
+        if self._flights.get(key) is entry:
+            del self._flights[key]
+
+    def forget(self, segments):
+        """
+        See `SingleFlight.forget`.
+        """
+        for key in [key for key in self._flights if _overlaps(key, segments)]:
+            del self._flights[key]
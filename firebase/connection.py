@@ -0,0 +1,140 @@
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+__all__ = ['ConnectionPool', 'PoolAdapter', 'default_connection_pool']
+
+
+class PoolMixin(object):
+    """
+    Mixin of the urllib3 connection pools. The time spent taking a
+    connection out of the pool, waiting for a free one included when the
+    pool blocks, is passed to the ``wait_listeners``. If ``idle_timeout`` is
+    set, a pooled connection that has been idle for longer than that many
+    seconds is closed when it is taken out, and urllib3 reconnects it on its
+    next request. The connections in use are never touched.
+    """
+    idle_timeout = None
+    wait_listeners = ()
+
+    def _get_conn(self, timeout=None):
+        start = time.time()
+        conn = super(PoolMixin, self)._get_conn(timeout)
+        if self.wait_listeners:
+            waited = time.time() - start
+            for listener in list(self.wait_listeners):
+                listener(waited)
+        idle_since = getattr(conn, 'idle_since', None)
+        if (self.idle_timeout is not None and idle_since is not None and
+                time.time() - idle_since > self.idle_timeout):
+            conn.close()
+        return conn
+
+    def _put_conn(self, conn):
+        if conn is not None:
+            conn.idle_since = time.time()
+        super(PoolMixin, self)._put_conn(conn)
+
+
+class PoolAdapter(HTTPAdapter):
+    """
+    ``HTTPAdapter`` whose urllib3 pools report their waits for a connection
+    to the ``wait_listeners`` and close the connections idle for more than
+    ``idle_timeout`` seconds, see `PoolMixin`. ``wait_listeners`` is a list
+    that may be changed afterwards.
+    """
+    __attrs__ = HTTPAdapter.__attrs__ + ['idle_timeout', 'wait_listeners']
+
+    def __init__(self, idle_timeout=None, wait_listeners=None, **kwargs):
+        self.idle_timeout = idle_timeout
+        self.wait_listeners = wait_listeners if wait_listeners is not None else []
+        super(PoolAdapter, self).__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super(PoolAdapter, self).init_poolmanager(*args, **kwargs)
+        manager = self.poolmanager
+        manager.pool_classes_by_scheme = dict(
+            (scheme, type(pool_class.__name__, (PoolMixin, pool_class),
+                          {'idle_timeout': self.idle_timeout,
+                           'wait_listeners': self.wait_listeners}))
+            for scheme, pool_class in manager.pool_classes_by_scheme.items())
+
+
+class ConnectionPool(object):
+    """
+    Class that owns a keep-alive ``requests.Session`` and hands it out to
+    the callers. The session is mounted with an ``HTTPAdapter`` so that the
+    underlying TCP/TLS connections are kept open and reused between the
+    requests made to the same host.
+
+    `timeout`: Timeout of each request in seconds.
+    `pool_connections`: Number of per-host connection pools to cache.
+    `pool_maxsize`: Maximum number of connections kept open per host.
+    `pool_block`: If True, callers wait for a free connection once
+    ``pool_maxsize`` connections are in use instead of opening extra ones.
+    `idle_timeout`: If set, a pooled connection that has not been used for
+    that many seconds is closed and reopened on its next request, see
+    `PoolAdapter`.
+
+    The callables given to `add_wait_listener` are called with the seconds
+    each request spent waiting for a pooled connection.
+
+    pool = ConnectionPool(pool_maxsize=20, idle_timeout=300)
+    connection = pool.get_connection()
+    connection.get('https://firebase.localhost/users.json')
+    pool.close()
+    """
+    def __init__(self, timeout=60, pool_connections=10, pool_maxsize=10,
+                 pool_block=False, idle_timeout=None):
+        self.timeout = timeout
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.idle_timeout = idle_timeout
+        self.wait_listeners = []
+        self._session = None
+        self._lock = threading.Lock()
+
+    def _create_session(self):
+        session = requests.Session()
+        options = {'pool_connections': self.pool_connections,
+                   'pool_maxsize': self.pool_maxsize, 'pool_block': self.pool_block}
+        adapter = PoolAdapter(self.idle_timeout, self.wait_listeners, **options)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.timeout = self.timeout
+        session.headers.update({'Content-type': 'application/json'})
+        return session
+
+    def get_connection(self):
+        """
+        Method that returns the shared session, creating it on first use.
+        """
+        with self._lock:
+            if self._session is None:
+                self._session = self._create_session()
+            return self._session
+
+    def add_wait_listener(self, listener):
+        self.wait_listeners.append(listener)
+
+    def close(self):
+        """
+        Closes the open connections. The pool can still be used afterwards,
+        in which case a brand-new session is created.
+        """
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+default_connection_pool = ConnectionPool()
@@ -1,16 +1,19 @@
-import requests
 from functools import wraps
 
+from .connection import default_connection_pool
+
 
 def http_connection(timeout):
     """
     Decorator function that injects a requests.Session instance into
-    the decorated function's actual parameters if not given.
+    the decorated function's actual parameters if not given. The injected
+    session is taken from the shared keep-alive ``default_connection_pool``
+    so that consecutive calls reuse the already open connections.
     """
     def wrapper(f):
         def wrapped(*args, **kwargs):
             if not ('connection' in kwargs) or not kwargs['connection']:
-                connection = requests.Session()
+                connection = default_connection_pool.get_connection()
                 kwargs['connection'] = connection
             else:
                 connection = kwargs['connection']
@@ -0,0 +1,56 @@
+import sys
+
+import concurrent.futures
+
+__all__ = ['create_executor', 'add_callbacks', 'is_process_executor']
+
+# Names of the ``concurrent.futures`` executor classes. They are looked up on
+# use, so that ``multiprocessing`` is only imported for process pools.
+EXECUTOR_BACKENDS = {
+    'thread': 'ThreadPoolExecutor',
+    'process': 'ProcessPoolExecutor',
+}
+
+
+def create_executor(backend='thread', max_workers=5):
+    """
+    Function that creates the executor the ``*_async`` methods of
+    `FirebaseApplication` run on. The requests are I/O bound so a thread
+    pool is the default; a process pool can still be chosen with
+    ``backend='process'``.
+    """
+    try:
+        executor_class = getattr(concurrent.futures, EXECUTOR_BACKENDS[backend])
+    except KeyError:
+        raise ValueError('Unknown executor backend: %s' % backend)
+    return executor_class(max_workers=max_workers)
+
+
+def is_process_executor(executor):
+    """
+    Returns True if the tasks submitted to the executor run in other
+    processes, in which case their arguments must be picklable.
+    """
+    process = sys.modules.get('concurrent.futures.process')
+    return process is not None and isinstance(executor, process.ProcessPoolExecutor)
+
+
+def add_callbacks(future, callback=None, error_callback=None):
+    """
+    Function that attaches a success and an error callback to the given
+    future. ``callback`` is fed with the result, ``error_callback`` with the
+    exception raised by the task. The future itself is returned so that the
+    caller can still wait on it, e.g. with ``concurrent.futures.as_completed``.
+    """
+    def done(future):
+        if future.cancelled():
+            return
+        exception = future.exception()
+        if exception is None:
+            if callback is not None:
+                callback(future.result())
+        elif error_callback is not None:
+            error_callback(exception)
+    if callback is not None or error_callback is not None:
+        future.add_done_callback(done)
+    return future
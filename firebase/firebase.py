@@ -4,19 +4,190 @@ except ImportError:
     #py3k
     from urllib import parse as urlparse
 
-import json
+import collections
+import copy
+import itertools
+import threading
+import time
+import warnings
+import zlib
+from concurrent.futures import wait, FIRST_COMPLETED
 
 from .firebase_token_generator import FirebaseTokenGenerator
 from .decorators import http_connection
+from .connection import ConnectionPool
 
-from .multiprocess_pool import process_pool
-from .jsonutil import JSONEncoder
+from .executors import create_executor, add_callbacks, is_process_executor
+from .stream import EventStream, iter_chunks
+from .mirror import LocalMirror
+from .cache import endpoint_segments
+from .batch import WriteBatch, WriteRejected, raise_for_denied
+from .writer import BufferedWriter
+from .spool import WriteSpool
+from .query import Query, key_order
+from .reference import Reference
+from .metrics import RequestInfo, create_hooks
+from .ratelimit import RateLimiter
+from .coalesce import SingleFlight, request_key
+from .jsonutil import JSONItemsDecoder, create_codec, default_codec
 
-__all__ = ['FirebaseAuthentication', 'FirebaseApplication']
+__all__ = ['FirebaseAuthentication', 'BaseFirebaseApplication',
+           'FirebaseApplication', 'ConnectionPool',
+           'Query', 'Reference', 'RateLimiter', 'TransactionConflict',
+           'WriteRejected']
+
+
+def send_request(method, url, params, headers, connection, data=None,
+                 retry_policy=None, stream=False, hooks=None, rate_limiter=None,
+                 timeout=None):
+    """
+    Helper function that sends an HTTP request with the given connection and
+    returns the response. If a `RetryPolicy` is given, failed attempts are
+    retried according to it. With ``stream`` the body is not downloaded
+    before the response is returned. ``hooks`` are told about the request
+    before it is sent and about its outcome, retries included. Each attempt
+    waits for a permit of the `RateLimiter` if one is given; the permit of a
+    streamed response is held until the response is closed. ``timeout``
+    overrides the timeout of the connection.
+    """
+    if timeout is None:
+        timeout = getattr(connection, 'timeout')
+    kwargs = {'params': params, 'headers': headers, 'timeout': timeout}
+    if data is not None:
+        kwargs['data'] = data
+    if stream:
+        kwargs['stream'] = True
+    state = retry_policy.start(method, url) if retry_policy is not None else None
+    if hooks is None:
+        return _send_attempts(method, url, connection, kwargs, state, rate_limiter)
+    # The hooks may add tracing headers to the request. The given dicts may
+    # be shared with other requests, e.g. by a `Reference`, so copies are sent.
+    kwargs['params'] = params = dict(params)
+    kwargs['headers'] = headers = dict(headers)
+    info = RequestInfo(method, url, params, headers, data)
+    hooks.before_request(info)
+    try:
+        response = _send_attempts(method, url, connection, kwargs, state,
+                                  rate_limiter, hooks)
+    except Exception as exception:
+        hooks.after_request(info.finish(retry_state=state, exception=exception))
+        raise
+    if stream:
+        # The body is counted by `iter_chunks` while it is read.
+        response.bytes_received = 0
+        on_close(response, lambda: hooks.after_request(
+            info.finish(response.status_code, response.bytes_received, state)))
+    else:
+        hooks.after_request(info.finish(response.status_code,
+                                        len(response.content or b''), state))
+    return response
+
+
+def on_close(response, callback):
+    """
+    Helper function that makes a streamed response call ``callback`` once,
+    after it is closed.
+    """
+    close = response.close
+    called = []
+
+    def closed():
+        try:
+            close()
+        finally:
+            if not called:
+                called.append(True)
+                callback()
+    response.close = closed
+
+
+def _send_attempts(method, url, connection, kwargs, state, rate_limiter=None,
+                   hooks=None):
+    while True:
+        if state is not None:
+            state.before_attempt()
+        permit = None
+        if rate_limiter is not None:
+            permit = rate_limiter.acquire(url, len(kwargs.get('data') or b''))
+            if hooks is not None:
+                hooks.on_rate_limit_wait(permit.waited)
+        try:
+            response = getattr(connection, method)(url, **kwargs)
+        except Exception as exception:
+            delay = state.on_exception(exception) if state is not None else None
+            if delay is None:
+                raise
+        else:
+            delay = None
+            if state is not None:
+                delay = state.on_response(response.status_code,
+                                          response.headers.get('Retry-After'))
+            if delay is None:
+                if permit is not None and kwargs.get('stream'):
+                    # The body is downloaded after the response is returned,
+                    # the in-flight slot is held until it is closed.
+                    on_close(response, permit.release)
+                    permit = None
+                return response
+            if kwargs.get('stream'):
+                response.close()
+        finally:
+            if permit is not None:
+                permit.release()
+        time.sleep(delay)
+
+
+def decode_response(response, codec=None):
+    """
+    Helper function that decodes the JSON body of the response with the
+    given codec, `default_codec` if not given. An empty body gives None.
+    """
+    if not response.content:
+        return None
+    return (codec or default_codec).loads(response.content)
+
+
+RESPONSE_MODES = ('full', 'silent', 'etag')
+
+
+def apply_response_mode(response_mode, params, headers):
+    """
+    Helper function that returns the querystring and the headers of a write
+    request made in the given response mode:
+    ``'full'``: The backend echoes the written value, which is decoded.
+    ``'silent'``: ``print=silent`` is added so that the backend answers with
+    an empty body, and the write returns None.
+    ``'etag'``: The body is skipped as well and the write returns the ETag
+    of the written value.
+
+    The given dicts are not modified.
+    """
+    if response_mode == 'full':
+        return params, headers
+    if response_mode not in RESPONSE_MODES:
+        raise ValueError('Unknown response mode: %s' % response_mode)
+    params = dict(params, print='silent')
+    if response_mode == 'etag':
+        headers = dict(headers, **{'X-Firebase-ETag': 'true'})
+    return params, headers
+
+
+def decode_write_response(response, codec=None, response_mode='full'):
+    """
+    Helper function that returns the result of a write request made in the
+    given response mode, see `apply_response_mode`. The error bodies of the
+    403 responses are always decoded.
+    """
+    if response_mode == 'full' or response.status_code == 403:
+        return decode_response(response, codec)
+    if response_mode == 'etag':
+        return response.headers.get('ETag')
+    return None
 
 
 @http_connection(60)
-def make_get_request(url, params, headers, connection):
+def make_get_request(url, params, headers, connection,
+                     retry_policy=None, codec=None, hooks=None, rate_limiter=None):
     """
     Helper function that makes an HTTP GET request to the given firebase
     endpoint. Timeout is 60 seconds.
@@ -25,6 +196,10 @@ def make_get_request(url, params, headers, connection):
     `headers`: Python dict. HTTP request headers.
     `connection`: Predefined HTTP connection instance. If not given, it
     is supplied by the `decorators.http_connection` function.
+    `retry_policy`: Optional `RetryPolicy` applied to failed attempts.
+    `codec`: Codec of the response body, `default_codec` if not given.
+    `hooks`: Optional `metrics.RequestHook` told about the request.
+    `rate_limiter`: Optional `RateLimiter` pacing the request.
 
     The returning value is a Python dict deserialized by the JSON decoder. However,
     if the status code is not 2x or 403, an requests.HTTPError is raised.
@@ -34,16 +209,91 @@ def make_get_request(url, params, headers, connection):
                                 {'X_FIREBASE_SOMETHING': 'Hi'}, connection)
     response => {'1': 'John Doe', '2': 'Jane Doe'}
     """
-    timeout = getattr(connection, 'timeout')
-    response = connection.get(url, params=params, headers=headers, timeout=timeout)
+    response = send_request('get', url, params, headers, connection,
+                            retry_policy=retry_policy, hooks=hooks,
+                            rate_limiter=rate_limiter)
+    if response.ok or response.status_code == 403:
+        return decode_response(response, codec)
+    else:
+        response.raise_for_status()
+
+
+@http_connection(60)
+def make_get_iter_request(url, params, headers, connection, chunk_size=64 * 1024,
+                          retry_policy=None, hooks=None, rate_limiter=None):
+    """
+    Helper function that makes an HTTP GET request to the given firebase
+    endpoint and yields the top-level members of the response while it is
+    being downloaded. The request is sent when the iteration starts.
+    `chunk_size`: Number of bytes read from the connection at once.
+
+    See `make_get_request` for the other parameters and `JSONItemsDecoder`
+    for the yielded pairs.
+
+    for key, value in make_get_iter_request('https://firebase.localhost/users.json',
+                                            {}, {}, connection):
+        ...
+    """
+    response = send_request('get', url, params, headers, connection,
+                            retry_policy=retry_policy, stream=True, hooks=hooks,
+                            rate_limiter=rate_limiter)
+    try:
+        if not (response.ok or response.status_code == 403):
+            response.raise_for_status()
+        decoder = JSONItemsDecoder()
+        for chunk in iter_chunks(response, chunk_size):
+            for item in decoder.feed(chunk):
+                yield item
+        for item in decoder.close():
+            yield item
+    finally:
+        response.close()
+
+
+NOT_MODIFIED = object()
+
+
+@http_connection(60)
+def make_conditional_get_request(url, params, headers, etag, connection,
+                                 retry_policy=None, codec=None, hooks=None,
+                                 rate_limiter=None):
+    """
+    Helper function that makes an HTTP GET request asking for the ETag of
+    the data. If `etag` is given it is sent as ``if-none-match`` and
+    `NOT_MODIFIED` is returned instead of the value when the server answers
+    with 304 Not Modified.
+
+    The returning value is a ``(status, value, etag, size)`` tuple, where
+    `size` is the length of the response body. However, if the status code
+    is not 2x, 304 or 403, an requests.HTTPError is raised. The body is
+    decoded with `codec`, `default_codec` if not given, `hooks` are told
+    about the request and `rate_limiter` paces it.
+
+    response = make_conditional_get_request('http://firebase.localhost/users', {},
+                                            {}, None, connection)
+    response => (200, {'1': 'John Doe', '2': 'Jane Doe'}, 'kDnr4ZyrV+2l...', 42)
+    """
+    headers = dict(headers, **{'X-Firebase-ETag': 'true'})
+    if etag is not None:
+        headers['if-none-match'] = etag
+    response = send_request('get', url, params, headers, connection,
+                            retry_policy=retry_policy, hooks=hooks,
+                            rate_limiter=rate_limiter)
+    response_etag = response.headers.get('ETag', etag)
+    if response.status_code == 304:
+        return 304, NOT_MODIFIED, response_etag, 0
     if response.ok or response.status_code == 403:
-        return response.json() if response.content else None
+        value = decode_response(response, codec)
+        return (response.status_code, value, response_etag,
+                len(response.content or ''))
     else:
         response.raise_for_status()
 
 
 @http_connection(60)
-def make_put_request(url, data, params, headers, connection):
+def make_put_request(url, data, params, headers, connection,
+                     retry_policy=None, codec=None, hooks=None, rate_limiter=None,
+                     response_mode='full'):
     """
     Helper function that makes an HTTP PUT request to the given firebase
     endpoint. Timeout is 60 seconds.
@@ -53,6 +303,12 @@ def make_put_request(url, data, params, headers, connection):
     `headers`: Python dict. HTTP request headers.
     `connection`: Predefined HTTP connection instance. If not given, it
     is supplied by the `decorators.http_connection` function.
+    `retry_policy`: Optional `RetryPolicy` applied to failed attempts.
+    `codec`: Codec of the response body, `default_codec` if not given.
+    `hooks`: Optional `metrics.RequestHook` told about the request.
+    `rate_limiter`: Optional `RateLimiter` pacing the request.
+    `response_mode`: ``'full'``, ``'silent'`` or ``'etag'``, see
+    `apply_response_mode`.
 
     The returning value is a Python dict deserialized by the JSON decoder. However,
     if the status code is not 2x or 403, an requests.HTTPError is raised.
@@ -63,17 +319,49 @@ def make_put_request(url, data, params, headers, connection):
                                 {'X_FIREBASE_SOMETHING': 'Hi'}, connection)
     response => {'1': 'Ozgur Vatansever'} or {'error': 'Permission denied.'}
     """
-    timeout = getattr(connection, 'timeout')
-    response = connection.put(url, data=data, params=params, headers=headers,
-                              timeout=timeout)
+    params, headers = apply_response_mode(response_mode, params, headers)
+    response = send_request('put', url, params, headers, connection, data,
+                            retry_policy, hooks=hooks, rate_limiter=rate_limiter)
     if response.ok or response.status_code == 403:
-        return response.json() if response.content else None
+        return decode_write_response(response, codec, response_mode)
     else:
         response.raise_for_status()
 
 
 @http_connection(60)
-def make_post_request(url, data, params, headers, connection):
+def make_conditional_put_request(url, data, params, headers, etag, connection,
+                                 retry_policy=None, codec=None, hooks=None,
+                                 rate_limiter=None):
+    """
+    Helper function that makes an HTTP PUT request that is only applied if
+    the ETag of the current value is `etag`, sent as ``if-match``.
+
+    The returning value is a ``(committed, value, etag)`` tuple. When the
+    write is applied, `value` is the written value echoed by the server;
+    when the server answers with 412 Precondition Failed because the value
+    has changed, `committed` is False and `value` and `etag` are the current
+    ones. Any other status that is not 2x raises an requests.HTTPError. The
+    body is decoded with `codec`, `default_codec` if not given, `hooks` are
+    told about the request and `rate_limiter` paces it.
+
+    response = make_conditional_put_request('http://firebase.localhost/counter.json',
+                                            '2', {}, {}, 'kDnr4ZyrV+2l...', connection)
+    response => (False, 5, 'aV8+2kPlo2Kd...')
+    """
+    headers = dict(headers, **{'X-Firebase-ETag': 'true', 'if-match': etag})
+    response = send_request('put', url, params, headers, connection, data,
+                            retry_policy, hooks=hooks, rate_limiter=rate_limiter)
+    if response.status_code == 412 or response.ok:
+        return (response.status_code != 412, decode_response(response, codec),
+                response.headers.get('ETag'))
+    else:
+        response.raise_for_status()
+
+
+@http_connection(60)
+def make_post_request(url, data, params, headers, connection,
+                      retry_policy=None, codec=None, hooks=None, rate_limiter=None,
+                      response_mode='full'):
     """
     Helper function that makes an HTTP POST request to the given firebase
     endpoint. Timeout is 60 seconds.
@@ -83,6 +371,12 @@ def make_post_request(url, data, params, headers, connection):
     `headers`: Python dict. HTTP request headers.
     `connection`: Predefined HTTP connection instance. If not given, it
     is supplied by the `decorators.http_connection` function.
+    `retry_policy`: Optional `RetryPolicy` applied to failed attempts.
+    `codec`: Codec of the response body, `default_codec` if not given.
+    `hooks`: Optional `metrics.RequestHook` told about the request.
+    `rate_limiter`: Optional `RateLimiter` pacing the request.
+    `response_mode`: ``'full'``, ``'silent'`` or ``'etag'``, see
+    `apply_response_mode`.
 
     The returning value is a Python dict deserialized by the JSON decoder. However,
     if the status code is not 2x or 403, an requests.HTTPError is raised.
@@ -92,17 +386,19 @@ def make_post_request(url, data, params, headers, connection):
        '{"Ozgur Vatansever"}', {'X_FIREBASE_SOMETHING': 'Hi'}, connection)
     response => {u'name': u'-Inw6zol_2f5ThHwVcSe'} or {'error': 'Permission denied.'}
     """
-    timeout = getattr(connection, 'timeout')
-    response = connection.post(url, data=data, params=params, headers=headers,
-                               timeout=timeout)
+    params, headers = apply_response_mode(response_mode, params, headers)
+    response = send_request('post', url, params, headers, connection, data,
+                            retry_policy, hooks=hooks, rate_limiter=rate_limiter)
     if response.ok or response.status_code == 403:
-        return response.json() if response.content else None
+        return decode_write_response(response, codec, response_mode)
     else:
         response.raise_for_status()
 
 
 @http_connection(60)
-def make_patch_request(url, data, params, headers, connection):
+def make_patch_request(url, data, params, headers, connection,
+                       retry_policy=None, codec=None, hooks=None, rate_limiter=None,
+                       response_mode='full'):
     """
     Helper function that makes an HTTP PATCH request to the given firebase
     endpoint. Timeout is 60 seconds.
@@ -112,6 +408,12 @@ def make_patch_request(url, data, params, headers, connection):
     `headers`: Python dict. HTTP request headers.
     `connection`: Predefined HTTP connection instance. If not given, it
     is supplied by the `decorators.http_connection` function.
+    `retry_policy`: Optional `RetryPolicy` applied to failed attempts.
+    `codec`: Codec of the response body, `default_codec` if not given.
+    `hooks`: Optional `metrics.RequestHook` told about the request.
+    `rate_limiter`: Optional `RateLimiter` pacing the request.
+    `response_mode`: ``'full'``, ``'silent'`` or ``'etag'``, see
+    `apply_response_mode`.
 
     The returning value is a Python dict deserialized by the JSON decoder. However,
     if the status code is not 2x or 403, an requests.HTTPError is raised.
@@ -121,17 +423,19 @@ def make_patch_request(url, data, params, headers, connection):
        '{"Ozgur Vatansever"}', {'X_FIREBASE_SOMETHING': 'Hi'}, connection)
     response => {'Ozgur Vatansever'} or {'error': 'Permission denied.'}
     """
-    timeout = getattr(connection, 'timeout')
-    response = connection.patch(url, data=data, params=params, headers=headers,
-                                timeout=timeout)
+    params, headers = apply_response_mode(response_mode, params, headers)
+    response = send_request('patch', url, params, headers, connection, data,
+                            retry_policy, hooks=hooks, rate_limiter=rate_limiter)
     if response.ok or response.status_code == 403:
-        return response.json() if response.content else None
+        return decode_write_response(response, codec, response_mode)
     else:
         response.raise_for_status()
 
 
 @http_connection(60)
-def make_delete_request(url, params, headers, connection):
+def make_delete_request(url, params, headers, connection,
+                        retry_policy=None, codec=None, hooks=None, rate_limiter=None,
+                        response_mode='full'):
     """
     Helper function that makes an HTTP DELETE request to the given firebase
     endpoint. Timeout is 60 seconds.
@@ -140,6 +444,12 @@ def make_delete_request(url, params, headers, connection):
     `headers`: Python dict. HTTP request headers.
     `connection`: Predefined HTTP connection instance. If not given, it
     is supplied by the `decorators.http_connection` function.
+    `retry_policy`: Optional `RetryPolicy` applied to failed attempts.
+    `codec`: Codec of the response body, `default_codec` if not given.
+    `hooks`: Optional `metrics.RequestHook` told about the request.
+    `rate_limiter`: Optional `RateLimiter` pacing the request.
+    `response_mode`: ``'full'``, ``'silent'`` or ``'etag'``, see
+    `apply_response_mode`.
 
     The returning value is NULL. However, if the status code is not 2x or 403,
     an requests.HTTPError is raised.
@@ -149,14 +459,28 @@ def make_delete_request(url, params, headers, connection):
                                 {'X_FIREBASE_SOMETHING': 'Hi'}, connection)
     response => NULL or {'error': 'Permission denied.'}
     """
-    timeout = getattr(connection, 'timeout')
-    response = connection.delete(url, params=params, headers=headers, timeout=timeout)
+    params, headers = apply_response_mode(response_mode, params, headers)
+    response = send_request('delete', url, params, headers, connection,
+                            retry_policy=retry_policy, hooks=hooks,
+                            rate_limiter=rate_limiter)
     if response.ok or response.status_code == 403:
-        return response.json() if response.content else None
+        return decode_write_response(response, codec, response_mode)
     else:
         response.raise_for_status()
 
 
+REQUEST_HELPERS = {'get': make_get_request, 'put': make_put_request,
+                   'post': make_post_request, 'patch': make_patch_request,
+                   'delete': make_delete_request}
+
+
+class TransactionConflict(Exception):
+    """
+    Raised when a transaction gives up because the value kept changing
+    between its reads and its writes.
+    """
+
+
 class FirebaseUser(object):
     """
     Class that wraps the credentials of the authenticated user. Think of
@@ -176,59 +500,109 @@ class FirebaseAuthentication(object):
 
     In addition, the provided email and password information is totally
     useless and they never appear in the ``auth`` variable at the server.
+
+    Minted tokens are cached and reused until ``refresh_margin`` seconds
+    before they expire, at most half of their lifetime. If ``expires_in`` is given, the tokens carry an
+    ``expires`` claim of that many seconds from now; otherwise they are
+    considered valid for the server default of 24 hours.
     """
-    def __init__(self, secret, email, debug=False, admin=False, extra=None):
+    DEFAULT_TOKEN_LIFETIME = 24 * 60 * 60
+
+    def __init__(self, secret, email, debug=False, admin=False, extra=None,
+                 expires_in=None, refresh_margin=300):
         self.authenticator = FirebaseTokenGenerator(secret, debug, admin)
         self.email = email
         self.provider = 'password'
         self.extra = (extra or {}).copy()
         self.extra.update({'debug': debug, 'admin': admin,
                            'email': self.email, 'provider': self.provider})
+        self.expires_in = expires_in
+        self.refresh_margin = refresh_margin
+        # The cached (user, refresh_at, extra) tuple, replaced as a whole so
+        # that the lock-free readers never see a partially updated token.
+        self._token = None
+        self._lock = threading.Lock()
+
+    def _valid_token(self, now):
+        token = self._token
+        if token is not None and now < token[1] and token[2] == self.extra:
+            return token
+        return None
 
-    def get_user(self):
+    def _create_token(self, now):
+        options = None
+        lifetime = self.DEFAULT_TOKEN_LIFETIME
+        if self.expires_in is not None:
+            lifetime = self.expires_in
+            options = {'expires': int(now + lifetime)}
+        extra = self.extra.copy()
+        token = self.authenticator.create_token(extra, options)
+        user = FirebaseUser(self.email, token, self.provider, extra.get('id'))
+        # A margin longer than the lifetime would mint a token per request.
+        margin = min(self.refresh_margin, lifetime / 2.0)
+        return user, now + lifetime - margin, extra
+
+    def get_user(self, hooks=None):
         """
         Method that gets the authenticated user. The returning user has
-        the token, email and the provider data.
+        the token, email and the provider data. A new token is only minted
+        when the cached one is about to expire or ``extra`` has changed;
+        ``hooks`` are then told how long it took.
         """
-        token = self.authenticator.create_token(self.extra)
-        user_id = self.extra.get('id')
-        return FirebaseUser(self.email, token, self.provider, user_id)
-
+        now = time.time()
+        token = self._valid_token(now)
+        if token is not None:
+            return token[0]
+        with self._lock:
+            token = self._valid_token(now)
+            if token is None:
+                token = self._token = self._create_token(now)
+                if hooks is not None:
+                    hooks.on_token_mint(time.time() - now)
+            return token[0]
 
-class FirebaseApplication(object):
-    """
-    Class that actually connects with the Firebase backend via HTTP calls.
-    It fully implements the RESTful specifications defined by Firebase. Data
-    is transmitted as in JSON format in both ways. This class needs a DSN value
-    that defines the base URL of the backend, and if needed, authentication
-    credentials are accepted and then are taken into consideration while
-    constructing HTTP requests.
+    def invalidate(self):
+        """
+        Drops the cached token so that the next request mints a new one.
+        """
+        with self._lock:
+            self._token = None
 
-    There are also the corresponding asynchronous versions of each HTTP method.
-    The async calls make use of the on-demand process pool defined under the
-    module `async`.
 
-    auth = FirebaseAuthentication(FIREBASE_SECRET, 'firebase@firebase.com', 'fbpw')
-    firebase = FirebaseApplication('https://firebase.localhost', auth)
+class BaseFirebaseApplication(object):
+    """
+    Class that holds the parts shared by the synchronous and the asyncio
+    Firebase clients: the DSN, the authentication credentials, the endpoint
+    URL construction and the JSON encoding of the request bodies.
 
-    That's all there is. Then you start connecting with the backend:
+    The bodies are encoded and decoded by ``codec``, either a codec backend
+    name, ``'json'`` or ``'orjson'``, or an object with ``dumps`` and
+    ``loads`` methods such as `jsonutil.JSONCodec`. By default orjson is
+    used when it is installed.
 
-    json_dict = firebase.get('/users', '1', {'print': 'pretty'})
-    print json_dict
-    {'1': 'John Doe', '2': 'Jane Doe', ...}
+    ``hooks``, a `metrics.RequestHook` or a list of them, are told about
+    every request, e.g. to collect metrics with a `metrics.MetricsCollector`.
 
-    Async version is:
-    firebase.get('/users', '1', {'print': 'pretty'}, callback=log_json_dict)
-
-    The callback method is fed with the returning response.
+    Request bodies of at least ``gzip_threshold`` bytes are sent gzipped at
+    compression level ``gzip_level``; they are never compressed by default.
+    Responses are always accepted gzipped and decompressed as they arrive.
     """
     NAME_EXTENSION = '.json'
     URL_SEPERATOR = '/'
 
-    def __init__(self, dsn, authentication=None):
+    def __init__(self, dsn, authentication=None, codec=None, hooks=None,
+                 gzip_threshold=None, gzip_level=6):
         assert dsn.startswith('https://'), 'DSN must be a secure URL'
         self.dsn = dsn
         self.authentication = authentication
+        self.hooks = create_hooks(hooks)
+        self.gzip_threshold = gzip_threshold
+        self.gzip_level = gzip_level
+        if codec is None:
+            codec = default_codec
+        elif isinstance(codec, str):
+            codec = create_codec(codec)
+        self.codec = codec
 
     def _build_endpoint_url(self, url, name=None):
         """
@@ -256,66 +630,367 @@ class FirebaseApplication(object):
         returns without doing anything.
         """
         if self.authentication:
-            user = self.authentication.get_user()
+            user = self.authentication.get_user(self.hooks)
             params.update({'auth_token': user.firebase_auth_token})
             headers.update(self.authentication.authenticator.HEADERS)
 
-    @http_connection(60)
+    def _prepare_request(self, url, name, params, headers):
+        """
+        Method that returns the endpoint url along with the authenticated
+        copies of the given querystring and headers.
+        """
+        params = params or {}
+        headers = headers or {}
+        endpoint = self._build_endpoint_url(url, name)
+        self._authenticate(params, headers)
+        return endpoint, params, headers
+
+    def _encode_data(self, data):
+        """
+        Method that serializes the request body into JSON.
+        """
+        return self.codec.dumps(data)
+
+    def _encode_body(self, data, headers):
+        """
+        Method that serializes the request body and compresses it when it
+        reaches ``gzip_threshold`` bytes. Returns the body and the headers
+        to send it with: a copy of `headers` with the ``Content-Encoding``
+        header when it is compressed, `headers` itself otherwise.
+        """
+        body = self._encode_data(data)
+        if self.gzip_threshold is None or len(body) < self.gzip_threshold:
+            return body, headers
+        if not isinstance(body, bytes):
+            body = body.encode('utf-8')
+        compressor = zlib.compressobj(self.gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        headers = dict(headers, **{'Content-Encoding': 'gzip'})
+        return compressor.compress(body) + compressor.flush(), headers
+
+
+class FirebaseApplication(BaseFirebaseApplication):
+    """
+    Class that actually connects with the Firebase backend via HTTP calls.
+    It fully implements the RESTful specifications defined by Firebase. Data
+    is transmitted as in JSON format in both ways. This class needs a DSN value
+    that defines the base URL of the backend, and if needed, authentication
+    credentials are accepted and then are taken into consideration while
+    constructing HTTP requests.
+
+    There are also the corresponding asynchronous versions of each HTTP method.
+    The async calls run on an on-demand executor, a pool of ``max_workers``
+    threads by default. Pass ``executor='process'`` for a process pool, or any
+    ``concurrent.futures.Executor`` instance. They return futures.
+
+    auth = FirebaseAuthentication(FIREBASE_SECRET, 'firebase@firebase.com', 'fbpw')
+    firebase = FirebaseApplication('https://firebase.localhost', auth)
+
+    That's all there is. Then you start connecting with the backend:
+
+    json_dict = firebase.get('/users', '1', {'print': 'pretty'})
+    print json_dict
+    {'1': 'John Doe', '2': 'Jane Doe', ...}
+
+    Async version is:
+    future = firebase.get_async('/users', '1', callback=log_json_dict,
+                                error_callback=log_error)
+
+    The callback method is fed with the returning response, the error callback
+    with the exception raised while making the request.
+
+    Synchronous calls share the keep-alive connections of the application's
+    own connection pool. Pass a configured `ConnectionPool` to tune it and
+    close the application when you are done with it:
+
+    pool = ConnectionPool(pool_maxsize=20, pool_block=True, idle_timeout=300)
+    with FirebaseApplication('https://firebase.localhost', auth, pool) as firebase:
+        firebase.get('/users', None)
+
+    A `ratelimit.RateLimiter` given as ``rate_limiter`` paces every request of
+    the application, the asynchronous and batched ones included, so that a
+    burst of ``*_async`` calls does not overrun the backend.
+
+    The write methods take a ``response_mode``. By default the backend
+    echoes the written value, which is downloaded and decoded; ``'silent'``
+    writes get an empty response and return None, and ``'etag'`` writes
+    return the ETag of the written value. The ``*_async`` writes also accept
+    ``'none'`` to fire and forget: the write is sent silently, None is
+    returned instead of a future and only a failure is reported, to the
+    ``error_callback``.
+
+    firebase.put('/users', '1', user, response_mode='silent')
+    for uid, user in users.items():
+        firebase.put_async('/users', uid, user, response_mode='none',
+                           error_callback=log_error)
+
+    With ``coalesce=True``, concurrent identical ``get`` and ``get_async``
+    calls share a single request and each receives its own copy of the
+    result, see `coalesce.SingleFlight`. A write by the application makes
+    the later reads of its path send a new request.
+    """
+    def __init__(self, dsn, authentication=None, connection_pool=None,
+                 executor='thread', max_workers=5, cache=None, retry_policy=None,
+                 codec=None, hooks=None, gzip_threshold=None, gzip_level=6,
+                 rate_limiter=None, coalesce=False):
+        super(FirebaseApplication, self).__init__(dsn, authentication, codec, hooks,
+                                                  gzip_threshold, gzip_level)
+        self.connection_pool = connection_pool or ConnectionPool()
+        self.cache = cache
+        self.retry_policy = retry_policy
+        self.rate_limiter = rate_limiter
+        self.flights = SingleFlight() if coalesce else None
+        self.max_workers = max_workers
+        if self.hooks is not None and hasattr(self.connection_pool, 'add_wait_listener'):
+            self.connection_pool.add_wait_listener(self.hooks.on_pool_wait)
+        if isinstance(executor, str):
+            self.executor_backend = executor
+            self._executor = None
+        else:
+            self.executor_backend = None
+            self._executor = executor
+        self._executor_lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """
+        Closes the pooled connections and shuts down the executor created
+        by the application.
+        """
+        if self.executor_backend is not None and self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self.connection_pool.close()
+
+    @property
+    def executor(self):
+        """
+        The executor the ``*_async`` methods run on, created on first use.
+        """
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = create_executor(self.executor_backend,
+                                                     self.max_workers)
+        return self._executor
+
+    def _submit(self, function, args, callback=None, error_callback=None,
+                invalidate=None, response_mode=None):
+        """
+        Method that runs the given request helper on the executor and returns
+        the future. Thread workers share the application's pooled connections,
+        retry policy, codec and rate limiter whereas process workers fall back
+        to their own connection pool and the default codec and do not retry;
+        their requests and body bytes are paced by the rate limiter before
+        being submitted, holding their in-flight slots until they are done.
+        `invalidate` is the endpoint of a write whose cached responses are
+        dropped once the request is done, `response_mode` that of a write.
+        A write in the ``'none'`` response mode is sent silently and None
+        is returned instead of the future.
+        """
+        kwargs = {}
+        forget = response_mode == 'none'
+        if response_mode is not None:
+            if not forget and response_mode not in RESPONSE_MODES:
+                raise ValueError('Unknown response mode: %s' % response_mode)
+            kwargs['response_mode'] = 'silent' if forget else response_mode
+        executor = self.executor
+        if is_process_executor(executor):
+            permit = None
+            if self.rate_limiter is not None:
+                # The encoded body of a write follows the endpoint.
+                size = len(args[1]) if len(args) == 4 else 0
+                permit = self.rate_limiter.acquire(args[0], size)
+            future = executor.submit(function, *args, **kwargs)
+            if permit is not None:
+                future.add_done_callback(lambda future: permit.release())
+        else:
+            future = executor.submit(function, *args,
+                                     connection=self._get_connection(),
+                                     retry_policy=self.retry_policy,
+                                     codec=self.codec, hooks=self.hooks,
+                                     rate_limiter=self.rate_limiter, **kwargs)
+        if invalidate is not None and self.cache is not None:
+            self._invalidate(invalidate)
+            future.add_done_callback(lambda future: self._invalidate(invalidate))
+        add_callbacks(future, callback, error_callback)
+        return None if forget else future
+
+    def _get_connection(self, connection=None):
+        """
+        Method that returns the given connection, or a pooled keep-alive
+        connection if none is given.
+        """
+        if connection:
+            return connection
+        return self.connection_pool.get_connection()
+
     def get(self, url, name, params=None, headers=None, connection=None):
         """
-        Synchronous GET request.
+        Synchronous GET request. If the application has a `ResponseCache`,
+        the response is served from and stored into it. With ``coalesce``,
+        identical requests made at the same time share a single one.
         """
         if name is None: name = ''
         params = params or {}
         headers = headers or {}
-        endpoint = self._build_endpoint_url(url, name)
+        return self._get_endpoint(self._build_endpoint_url(url, name), params, headers,
+                                  connection)
+
+    def _get_endpoint(self, endpoint, params, headers, connection):
+        """
+        Method that reads the given endpoint through the coalesced requests
+        and the cache. `params` and `headers` are not authenticated yet.
+        """
+        if self.flights is not None:
+            return self.flights.do(request_key(endpoint, params, headers),
+                                   self._get, endpoint, params, headers, connection)
+        return self._get(endpoint, params, headers, connection)
+
+    def _get(self, endpoint, params, headers, connection):
+        if self.cache is not None:
+            return self._cached_get(endpoint, params, headers,
+                                    self._get_connection(connection))
         self._authenticate(params, headers)
-        return make_get_request(endpoint, params, headers, connection=connection)
+        return self._send('get', endpoint, params, headers, connection=connection)
+
+    def _send(self, method, endpoint, params, headers, data=None, connection=None,
+              response_mode='full'):
+        """
+        Method that sends an authenticated request to the given endpoint
+        with the application's connection, retry policy, codec, hooks and
+        rate limiter. The cached responses affected by a write are dropped
+        once it is done. `data` is the encoded body of a PUT, POST or PATCH,
+        `response_mode` that of a write, see `apply_response_mode`.
+        """
+        helper = REQUEST_HELPERS[method]
+        args = (endpoint, params, headers) if data is None else (endpoint, data, params, headers)
+        kwargs = {'connection': self._get_connection(connection),
+                  'retry_policy': self.retry_policy, 'codec': self.codec,
+                  'hooks': self.hooks, 'rate_limiter': self.rate_limiter}
+        if method == 'get':
+            return helper(*args, **kwargs)
+        kwargs['response_mode'] = response_mode
+        try:
+            return helper(*args, **kwargs)
+        finally:
+            self._invalidate(endpoint)
+
+    def get_iter(self, url, name, params=None, headers=None, connection=None,
+                 chunk_size=64 * 1024):
+        """
+        Synchronous GET request that yields the top-level members of the
+        response as ``(key, value)`` pairs while it is being downloaded, so
+        that a large location never has to be held in memory as a whole.
+        The response cache is bypassed.
+
+        for uid, user in firebase.get_iter('/users', None):
+            print(uid, user['name'])
+        """
+        endpoint, params, headers = self._prepare_request(url, name, params, headers)
+        return make_get_iter_request(endpoint, params, headers,
+                                     connection=self._get_connection(connection),
+                                     chunk_size=chunk_size,
+                                     retry_policy=self.retry_policy, hooks=self.hooks,
+                                     rate_limiter=self.rate_limiter)
 
-    def get_async(self, url, name, callback=None, params=None, headers=None):
+    def _cached_get(self, endpoint, params, headers, connection):
         """
-        Asynchronous GET request with the process pool.
+        Method that answers a GET request from the cache, revalidating stale
+        entries with their ETag. Only successful responses are stored, and
+        not when a write invalidated the path while the request was made.
+        """
+        key = self.cache.make_key(endpoint, params)
+        entry, fresh = self.cache.lookup(key)
+        if fresh:
+            if self.hooks is not None:
+                self.hooks.on_cache_lookup(True)
+            return self.cache.read(entry)
+        self._authenticate(params, headers)
+        etag = entry.etag if entry is not None else None
+        generation = self.cache.generation
+        status, value, etag, size = make_conditional_get_request(
+            endpoint, params, headers, etag, connection=connection,
+            retry_policy=self.retry_policy, codec=self.codec,
+            hooks=self.hooks, rate_limiter=self.rate_limiter)
+        if self.hooks is not None:
+            self.hooks.on_cache_lookup(value is NOT_MODIFIED)
+        if value is NOT_MODIFIED:
+            self.cache.revalidated(key, entry)
+            return self.cache.read(entry)
+        if 200 <= status < 300:
+            self.cache.store(key, endpoint_segments(endpoint), copy.deepcopy(value),
+                             etag, size, generation)
+        return value
+
+    def _invalidate(self, endpoint):
+        """
+        Method that drops the cached responses affected by a write to the
+        given endpoint and detaches the coalesced requests in flight to it.
+        """
+        if self.cache is not None:
+            self.cache.invalidate(endpoint_segments(endpoint))
+        if self.flights is not None:
+            self.flights.forget(endpoint_segments(endpoint))
+
+    def get_async(self, url, name, callback=None, params=None, headers=None,
+                  error_callback=None):
+        """
+        Asynchronous GET request with the executor. Returns a future. With
+        ``coalesce``, identical requests made at the same time share a
+        single one.
         """
         if name is None: name = ''
         params = params or {}
         headers = headers or {}
         endpoint = self._build_endpoint_url(url, name)
+        if self.flights is not None:
+            key = request_key(endpoint, params, headers)
+            self._authenticate(params, headers)
+            future = self.flights.submit(key, lambda: self._submit(
+                make_get_request, (endpoint, params, headers)))
+            return add_callbacks(future, callback, error_callback)
         self._authenticate(params, headers)
-        process_pool.apply_async(make_get_request,
-            args=(endpoint, params, headers), callback=callback)
+        return self._submit(make_get_request, (endpoint, params, headers),
+                            callback, error_callback)
 
-    @http_connection(60)
-    def put(self, url, name, data, params=None, headers=None, connection=None):
+    def put(self, url, name, data, params=None, headers=None, connection=None,
+            response_mode='full'):
         """
-        Synchronous PUT request. There will be no returning output from
-        the server, because the request will be made with ``silent``
-        parameter. ``data`` must be a JSONable value.
+        Synchronous PUT request. ``data`` must be a JSONable value. The
+        backend echoes the written value, which is returned, unless another
+        ``response_mode`` is given, see `apply_response_mode`.
         """
         assert name, 'Snapshot name must be specified'
         params = params or {}
         headers = headers or {}
         endpoint = self._build_endpoint_url(url, name)
         self._authenticate(params, headers)
-        data = json.dumps(data, cls=JSONEncoder)
-        return make_put_request(endpoint, data, params, headers,
-                                connection=connection)
+        data, headers = self._encode_body(data, headers)
+        return self._send('put', endpoint, params, headers, data,
+                          connection=connection, response_mode=response_mode)
 
-    def put_async(self, url, name, data, callback=None, params=None, headers=None):
+    def put_async(self, url, name, data, callback=None, params=None, headers=None,
+                  error_callback=None, response_mode='full'):
         """
-        Asynchronous PUT request with the process pool.
+        Asynchronous PUT request with the executor. Returns a future.
         """
         if name is None: name = ''
         params = params or {}
         headers = headers or {}
         endpoint = self._build_endpoint_url(url, name)
         self._authenticate(params, headers)
-        data = json.dumps(data, cls=JSONEncoder)
-        process_pool.apply_async(make_put_request,
-                                 args=(endpoint, data, params, headers),
-                                 callback=callback)
+        data, headers = self._encode_body(data, headers)
+        return self._submit(make_put_request, (endpoint, data, params, headers),
+                            callback, error_callback,
+                            invalidate=endpoint, response_mode=response_mode)
 
-    @http_connection(60)
-    def post(self, url, data, params=None, headers=None, connection=None):
+    def post(self, url, data, params=None, headers=None, connection=None,
+             response_mode='full'):
         """
         Synchronous POST request. ``data`` must be a JSONable value.
         """
@@ -323,51 +998,53 @@ class FirebaseApplication(object):
         headers = headers or {}
         endpoint = self._build_endpoint_url(url, None)
         self._authenticate(params, headers)
-        data = json.dumps(data, cls=JSONEncoder)
-        return make_post_request(endpoint, data, params, headers,
-                                 connection=connection)
+        data, headers = self._encode_body(data, headers)
+        return self._send('post', endpoint, params, headers, data,
+                          connection=connection, response_mode=response_mode)
 
-    def post_async(self, url, data, callback=None, params=None, headers=None):
+    def post_async(self, url, data, callback=None, params=None, headers=None,
+                   error_callback=None, response_mode='full'):
         """
-        Asynchronous POST request with the process pool.
+        Asynchronous POST request with the executor. Returns a future.
         """
         params = params or {}
         headers = headers or {}
         endpoint = self._build_endpoint_url(url, None)
         self._authenticate(params, headers)
-        data = json.dumps(data, cls=JSONEncoder)
-        process_pool.apply_async(make_post_request,
-                                 args=(endpoint, data, params, headers),
-                                 callback=callback)
+        data, headers = self._encode_body(data, headers)
+        return self._submit(make_post_request, (endpoint, data, params, headers),
+                            callback, error_callback,
+                            invalidate=endpoint, response_mode=response_mode)
 
-    @http_connection(60)
-    def patch(self, url, data, params=None, headers=None, connection=None):
+    def patch(self, url, data, params=None, headers=None, connection=None,
+              response_mode='full'):
         """
-        Synchronous POST request. ``data`` must be a JSONable value.
+        Synchronous PATCH request. ``data`` must be a JSONable value.
         """
         params = params or {}
         headers = headers or {}
         endpoint = self._build_endpoint_url(url, None)
         self._authenticate(params, headers)
-        data = json.dumps(data, cls=JSONEncoder)
-        return make_patch_request(endpoint, data, params, headers,
-                                  connection=connection)
+        data, headers = self._encode_body(data, headers)
+        return self._send('patch', endpoint, params, headers, data,
+                          connection=connection, response_mode=response_mode)
 
-    def patch_async(self, url, data, callback=None, params=None, headers=None):
+    def patch_async(self, url, data, callback=None, params=None, headers=None,
+                    error_callback=None, response_mode='full'):
         """
-        Asynchronous PATCH request with the process pool.
+        Asynchronous PATCH request with the executor. Returns a future.
         """
         params = params or {}
         headers = headers or {}
         endpoint = self._build_endpoint_url(url, None)
         self._authenticate(params, headers)
-        data = json.dumps(data, cls=JSONEncoder)
-        process_pool.apply_async(make_patch_request,
-                                 args=(endpoint, data, params, headers),
-                                 callback=callback)
+        data, headers = self._encode_body(data, headers)
+        return self._submit(make_patch_request, (endpoint, data, params, headers),
+                            callback, error_callback,
+                            invalidate=endpoint, response_mode=response_mode)
 
-    @http_connection(60)
-    def delete(self, url, name, params=None, headers=None, connection=None):
+    def delete(self, url, name, params=None, headers=None, connection=None,
+               response_mode='full'):
         """
         Synchronous DELETE request. ``data`` must be a JSONable value.
         """
@@ -376,16 +1053,198 @@ class FirebaseApplication(object):
         headers = headers or {}
         endpoint = self._build_endpoint_url(url, name)
         self._authenticate(params, headers)
-        return make_delete_request(endpoint, params, headers, connection=connection)
+        return self._send('delete', endpoint, params, headers,
+                          connection=connection, response_mode=response_mode)
 
-    def delete_async(self, url, name, callback=None, params=None, headers=None):
+    def delete_async(self, url, name, callback=None, params=None, headers=None,
+                     error_callback=None, response_mode='full'):
         """
-        Asynchronous DELETE request with the process pool.
+        Asynchronous DELETE request with the executor. Returns a future.
         """
         if not name: name = ''
         params = params or {}
         headers = headers or {}
         endpoint = self._build_endpoint_url(url, name)
         self._authenticate(params, headers)
-        process_pool.apply_async(make_delete_request,
-                    args=(endpoint, params, headers), callback=callback)
+        return self._submit(make_delete_request, (endpoint, params, headers),
+                            callback, error_callback,
+                            invalidate=endpoint, response_mode=response_mode)
+
+    def transaction(self, url, update_function, max_retries=25, params=None,
+                    headers=None, connection=None):
+        """
+        Replaces the value of the given location with the result of
+        ``update_function`` applied to its current value, unless another
+        client changed the value in the meantime. The value is fetched with
+        its ETag and written with ``if-match``; when the write is rejected,
+        the current value and ETag sent back with the rejection are used to
+        try again, without another read. Returns the written value.
+
+        ``update_function`` may be called several times and must not have
+        side effects; an exception it raises aborts the transaction. After
+        ``max_retries`` rejected writes, `TransactionConflict` is raised.
+        A read denied by the security rules raises `WriteRejected`, and a
+        response without an ETag raises ValueError rather than letting the
+        write overwrite the value unconditionally.
+
+        The conditional writes are not retried by the retry policy: a write
+        that was applied but whose response was lost would be rejected on
+        retry with the value it wrote, and the update would be applied
+        twice. Such a failure is raised instead.
+
+        visits = firebase.transaction('/counters/visits', lambda count: (count or 0) + 1)
+        """
+        params = params or {}
+        headers = headers or {}
+        endpoint = self._build_endpoint_url(url, None)
+        self._authenticate(params, headers)
+        options = {'codec': self.codec, 'hooks': self.hooks,
+                   'rate_limiter': self.rate_limiter}
+        try:
+            status, value, etag, _ = make_conditional_get_request(
+                endpoint, params, headers, None, retry_policy=self.retry_policy,
+                connection=self._get_connection(connection), **options)
+            if not 200 <= status < 300:
+                raise WriteRejected(value)
+            for _ in range(max_retries + 1):
+                if etag is None:
+                    raise ValueError('%s was sent without an ETag' % url)
+                new_value = update_function(value)
+                data, write_headers = self._encode_body(new_value, headers)
+                committed, value, etag = make_conditional_put_request(
+                    endpoint, data, params, write_headers, etag,
+                    connection=self._get_connection(connection), **options)
+                if committed:
+                    return new_value
+        finally:
+            self._invalidate(endpoint)
+        raise TransactionConflict('%s kept changing, gave up after %d retries'
+                                  % (url, max_retries))
+
+    def stream(self, url, callback=None, name=None, params=None, headers=None,
+               **kwargs):
+        """
+        Listens to the changes of the given location through the REST
+        streaming endpoint and returns an `EventStream`. Without a callback
+        the stream is an iterator of `StreamEvent` instances; with a callback
+        it runs in a background thread until it is closed. The remaining
+        keyword arguments are passed to `EventStream`.
+        """
+        event_stream = EventStream(self, url, name, params, headers,
+                                   callback=callback, **kwargs)
+        if callback is not None:
+            event_stream.start()
+        return event_stream
+
+    def mirror(self, url, name=None, params=None, headers=None, **kwargs):
+        """
+        Returns a started `LocalMirror` of the given location that serves
+        repeated reads from memory.
+        """
+        return LocalMirror(self, url, name, params, headers, **kwargs).start()
+
+    def batch(self, max_bytes=1024 * 1024, params=None, headers=None):
+        """
+        Returns a `WriteBatch` that sends the queued writes as multi-location
+        PATCH requests when it is committed or its ``with`` block exits.
+        """
+        return WriteBatch(self, max_bytes, params, headers)
+
+    def keys(self, url, name=None, params=None, headers=None, connection=None):
+        """
+        Returns the keys of the children of the given location in key order
+        without downloading their values, using a ``shallow`` request. A
+        listing denied by the security rules raises `WriteRejected`.
+        """
+        params = dict(params or {}, shallow='true')
+        result = raise_for_denied(self.get(url, name, params, headers, connection))
+        if not isinstance(result, dict):
+            return []
+        return sorted(result, key=key_order)
+
+    def get_many(self, url, keys, concurrency=None, ordered=True, params=None,
+                 headers=None):
+        """
+        Fetches the given children of a location in parallel with the
+        executor and yields them as ``(key, value)`` pairs, in the order of
+        ``keys`` or, when ``ordered`` is False, as soon as they arrive. At
+        most ``concurrency`` requests are in flight, ``max_workers`` by
+        default, and ``keys`` is consumed lazily, so a fetch interrupted by
+        an error can be resumed from the last yielded key. The executor
+        created by the application cannot run more requests than its
+        ``max_workers``: a larger ``concurrency`` is lowered to that number
+        with a warning. An executor given by the caller is trusted to run
+        the requested ``concurrency``.
+
+        keys = firebase.keys('/users')
+        for uid, user in firebase.get_many('/users', keys, concurrency=10,
+                                           ordered=False):
+            process(uid, user)
+        """
+        concurrency = concurrency or self.max_workers
+        if self.executor_backend is not None and concurrency > self.max_workers:
+            warnings.warn('get_many runs at most %d requests at a time, the number of '
+                          'workers of the executor' % self.max_workers, stacklevel=2)
+            concurrency = self.max_workers
+        keys = iter(keys)
+        # Futures in the order their requests were sent.
+        pending = collections.OrderedDict()
+        try:
+            while True:
+                for key in itertools.islice(keys, concurrency - len(pending)):
+                    future = self.get_async(url, key, params=dict(params or {}),
+                                            headers=dict(headers or {}))
+                    pending[future] = key
+                if not pending:
+                    return
+                if ordered:
+                    future = next(iter(pending))
+                else:
+                    future = next(iter(wait(pending, return_when=FIRST_COMPLETED).done))
+                key = pending.pop(future)
+                yield key, future.result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def query(self, url, name=None, params=None, headers=None):
+        """
+        Returns a `Query` that orders and filters the children of the given
+        location.
+        """
+        return Query(self, url, name, params, headers)
+
+    def ref(self, url, params=None, headers=None):
+        """
+        Returns a `Reference` to the given location whose endpoint URL and
+        authenticated querystring are computed once for all its requests.
+
+        user = firebase.ref('/users').child('1')
+        user.update({'name': 'John Doe'})
+        """
+        return Reference(self, url, params, headers)
+
+    def scan(self, url, page_size=1000, prefetch=False, params=None, headers=None):
+        """
+        Walks the children of the given location in key order, one page of
+        ``page_size`` children per request. See `Query.scan`.
+
+        for uid, user in firebase.scan('/users', page_size=500):
+            process(uid, user)
+        """
+        return self.query(url, None, params, headers).scan(page_size, prefetch)
+
+    def buffered_writer(self, **kwargs):
+        """
+        Returns a `BufferedWriter` that queues writes and sends them in the
+        background. The keyword arguments are passed to `BufferedWriter`.
+        """
+        return BufferedWriter(self, **kwargs)
+
+    def spool(self, directory, **kwargs):
+        """
+        Returns a `WriteSpool` that journals writes in ``directory`` and
+        replays them in the background. The keyword arguments are passed to
+        `WriteSpool`.
+        """
+        return WriteSpool(self, directory, **kwargs)
@@ -32,6 +32,8 @@ class FirebaseTokenGenerator(object):
         self.secret = secret
         self.admin = admin
         self.debug = debug
+        self._secret_bytes = self._portable_bytes(secret)
+        self._encoded_header = self._encode_json(self.HEADERS)
 
     def create_token(self, data, options=None):
         """
@@ -87,7 +89,7 @@ class FirebaseTokenGenerator(object):
         claims = {}
         for k in opts:
             if k in self.CLAIMS_MAP:
-                claims[k] = opts[k]
+                claims[self.CLAIMS_MAP[k]] = opts[k]
             else:
                 raise ValueError('Unrecognized Option: %s' % k)
         return claims
@@ -99,18 +101,23 @@ class FirebaseTokenGenerator(object):
     def _encode_json(self, obj):
         return self._encode(json.dumps(obj).encode("utf-8"))
 
+    @staticmethod
+    def _portable_bytes(s):
+        try:
+            return bytes(s, 'utf-8')
+        except TypeError:
+            return bytes(s)
+
     def _sign(self, secret, to_sign):
-        def portable_bytes(s):
-            try:
-                return bytes(s, 'utf-8')
-            except TypeError:
-                return bytes(s)
-        return self._encode(hmac.new(portable_bytes(secret), portable_bytes(to_sign),
+        if secret is self.secret:
+            secret_bytes = self._secret_bytes
+        else:
+            secret_bytes = self._portable_bytes(secret)
+        return self._encode(hmac.new(secret_bytes, self._portable_bytes(to_sign),
                                      hashlib.sha256).digest())
 
     def _encode_token(self, secret, claims):
-        encoded_header = self._encode_json(self.HEADERS)
         encoded_claims = self._encode_json(claims)
-        secure_bits = '%s%s%s' % (encoded_header, self.TOKEN_SEP, encoded_claims)
+        secure_bits = '%s%s%s' % (self._encoded_header, self.TOKEN_SEP, encoded_claims)
         sig = self._sign(secret, secure_bits)
         return '%s%s%s' % (secure_bits, self.TOKEN_SEP, sig)
@@ -1,6 +1,13 @@
+import codecs
 import datetime
 import json
 import decimal
+import re
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 try:
     total_seconds = datetime.timedelta.total_seconds
@@ -18,3 +25,294 @@ class JSONEncoder(json.JSONEncoder):
             return float(obj)
         else:
             return json.JSONEncoder.default(self, obj)
+
+
+class JSONCodec(object):
+    """
+    Codec that encodes the request bodies and decodes the responses with
+    the standard library. Dates, time deltas and decimals are encoded as
+    `JSONEncoder` does. With ``compact`` no whitespace is written after
+    the separators.
+    """
+    name = 'json'
+
+    def __init__(self, compact=True):
+        separators = (',', ':') if compact else None
+        self.encoder = JSONEncoder(separators=separators)
+
+    def dumps(self, data):
+        return self.encoder.encode(data)
+
+    def loads(self, data):
+        return json.loads(data)
+
+
+class OrjsonCodec(JSONCodec):
+    """
+    Codec backed by the ``orjson`` package, several times faster than the
+    standard library. The output is always compact and UTF-8 encoded.
+    Dates are encoded by `JSONEncoder` rather than in the native format of
+    orjson, and the values orjson cannot handle, like integers wider than
+    64 bits, fall back to the standard library.
+    """
+    name = 'orjson'
+
+    def __init__(self, compact=True):
+        if orjson is None:
+            raise ImportError('orjson is required to use OrjsonCodec. '
+                              'Install it with `pip install orjson`.')
+        super(OrjsonCodec, self).__init__(compact)
+        self.options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, data):
+        try:
+            return orjson.dumps(data, default=self.encoder.default, option=self.options)
+        except TypeError:
+            return super(OrjsonCodec, self).dumps(data)
+
+    def loads(self, data):
+        try:
+            return orjson.loads(data)
+        except ValueError:
+            return super(OrjsonCodec, self).loads(data)
+
+
+CODEC_BACKENDS = {
+    'json': JSONCodec,
+    'orjson': OrjsonCodec,
+}
+
+
+def create_codec(backend=None, compact=True):
+    """
+    Function that creates the codec of the request and response bodies.
+    Without a backend, orjson is used when it is installed and the standard
+    library otherwise.
+    """
+    if backend is None:
+        backend = 'orjson' if orjson is not None else 'json'
+    try:
+        codec_class = CODEC_BACKENDS[backend]
+    except KeyError:
+        raise ValueError('Unknown codec backend: %s' % backend)
+    return codec_class(compact=compact)
+
+
+default_codec = create_codec()
+
+
+class JSONItemsDecoder(object):
+    """
+    Incremental decoder that yields the top-level members of a JSON
+    document while it is being received, so that a large object never has
+    to be held in memory as a whole. Members of an object are yielded as
+    ``(key, value)`` pairs and elements of an array as ``(index, value)``
+    pairs. Only the member being received is buffered.
+
+    A scalar document is yielded as a single ``(None, value)`` pair and a
+    ``null`` document yields nothing.
+
+    decoder = JSONItemsDecoder()
+    decoder.feed(b'{"1": {"name": "John"}, "2": {"na')
+    => [('1', {'name': 'John'})]
+    decoder.feed(b'me": "Jane"}}')
+    => [('2', {'name': 'Jane'})]
+    list(decoder.close())
+    => []
+    """
+    _STRUCTURE = re.compile(r'["{}\[\],]')
+    _STRING = re.compile(r'["\\]')
+    _WHITESPACE = re.compile(r'\s*')
+
+    def __init__(self, loads=json.loads):
+        self.loads = loads
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        # Scanned text of the member being received, set aside.
+        self._parts = []
+        self._start = 0
+        self._pos = 0
+        self._state = 'start'
+        self._container = None
+        self._key = None
+        self._index = 0
+        self._depth = 0
+        self._in_string = False
+        self._scanning = False
+        # Complete members are decoded in one go when loads is the stdlib's.
+        self._raw_decode = json.JSONDecoder().raw_decode if loads is json.loads else None
+
+    def _skip_whitespace(self):
+        self._pos = self._WHITESPACE.match(self._buffer, self._pos).end()
+        return self._pos < len(self._buffer)
+
+    def _consume(self, position):
+        self._start = self._pos = position
+
+    def _scan_string(self):
+        # Moves past the closing quote of the string the position is in.
+        while True:
+            match = self._STRING.search(self._buffer, self._pos)
+            if match is None:
+                self._pos = len(self._buffer)
+                return False
+            if match.group() == '\\':
+                if match.end() >= len(self._buffer):
+                    self._pos = match.start()
+                    return False
+                self._pos = match.end() + 1
+            else:
+                self._pos = match.end()
+                return True
+
+    def _unexpected(self):
+        raise ValueError('Unexpected character %r in JSON document'
+                         % self._buffer[self._pos])
+
+    def _pending_text(self, end):
+        text = ''.join(self._parts) + self._buffer[self._start:end]
+        del self._parts[:]
+        return text
+
+    def _finish(self, position, value):
+        # Ends the member whose value is followed by the character at position.
+        char = self._buffer[position]
+        if char != ',' and char != ('}' if self._container == '{' else ']'):
+            self._pos = position
+            self._unexpected()
+        self._consume(position + 1)
+        self._scanning = False
+        if char == ',':
+            self._state = 'key_start' if self._container == '{' else 'value_start'
+        else:
+            self._state = 'done'
+        if self._container == '{':
+            return self._key, value
+        self._index += 1
+        return self._index - 1, value
+
+    def feed(self, chunk):
+        """
+        Feeds a chunk of bytes and returns the list of the members completed
+        by it.
+        """
+        text = self._decoder.decode(chunk)
+        if self._state == 'scalar' or (self._scanning and self._pos >= len(self._buffer)):
+            # Set the text scanned so far aside instead of copying it again
+            # with every chunk of a large member.
+            self._parts.append(self._buffer[self._start:])
+            self._pos -= len(self._buffer)
+            self._buffer = text
+        else:
+            # Drop the text of the members decoded so far.
+            self._buffer = self._buffer[self._start:] + text
+            self._pos -= self._start
+        self._start = 0
+        return list(self._parse())
+
+    def _parse(self):
+        while True:
+            state = self._state
+            if state == 'scalar':
+                return
+            if state in ('start', 'key_start', 'colon', 'value_start', 'separator', 'done'):
+                if not self._skip_whitespace():
+                    self._consume(self._pos)
+                    return
+                char = self._buffer[self._pos]
+                if state == 'start':
+                    if char in '{[':
+                        self._container = char
+                        self._state = 'key_start' if char == '{' else 'value_start'
+                        self._consume(self._pos + 1)
+                    else:
+                        self._state = 'scalar'
+                        return
+                elif state == 'key_start':
+                    if char == '}' and self._key is None:
+                        self._state = 'done'
+                        self._consume(self._pos + 1)
+                    elif char == '"':
+                        self._consume(self._pos)
+                        self._pos += 1
+                        self._state = 'key'
+                    else:
+                        self._unexpected()
+                elif state == 'colon':
+                    if char != ':':
+                        self._unexpected()
+                    self._state = 'value_start'
+                    self._consume(self._pos + 1)
+                elif state == 'value_start':
+                    if char == ']' and self._container == '[' and self._index == 0:
+                        self._state = 'done'
+                        self._consume(self._pos + 1)
+                    else:
+                        self._consume(self._pos)
+                        self._state = 'value'
+                        self._depth = 0
+                        self._in_string = False
+                        self._scanning = False
+                elif state == 'done':
+                    self._unexpected()
+            elif state == 'key':
+                if not self._scan_string():
+                    return
+                self._key = self.loads(self._buffer[self._start:self._pos])
+                self._state = 'colon'
+                self._consume(self._pos)
+            elif state == 'value':
+                if not self._scanning and self._raw_decode is not None:
+                    # Fast path: decode the member at once if it has been
+                    # received completely, scan for its end otherwise.
+                    try:
+                        value, end = self._raw_decode(self._buffer, self._start)
+                    except ValueError:
+                        self._scanning = True
+                        continue
+                    position = self._WHITESPACE.match(self._buffer, end).end()
+                    if position >= len(self._buffer):
+                        # A number may go on in the next chunk.
+                        return
+                    if self._buffer[position] not in ',}]':
+                        # Truncated number or garbage, let the scanner decide.
+                        self._scanning = True
+                        continue
+                    yield self._finish(position, value)
+                    continue
+                if self._in_string:
+                    if not self._scan_string():
+                        return
+                    self._in_string = False
+                    continue
+                match = self._STRUCTURE.search(self._buffer, self._pos)
+                if match is None:
+                    self._pos = len(self._buffer)
+                    return
+                char = match.group()
+                self._pos = match.end()
+                if char == '"':
+                    self._in_string = True
+                elif char in '{[':
+                    self._depth += 1
+                elif char in '}]' and self._depth:
+                    self._depth -= 1
+                elif char != ',' or not self._depth:
+                    value = self.loads(self._pending_text(match.start()))
+                    yield self._finish(match.start(), value)
+
+    def close(self):
+        """
+        Signals the end of the document and yields what is left.
+        """
+        self._buffer = self._pending_text(len(self._buffer)) + self._decoder.decode(b'', True)
+        self._start = self._pos = 0
+        if self._state == 'scalar':
+            value = self.loads(self._buffer)
+            if value is not None:
+                yield None, value
+        elif self._state == 'start':
+            if self._buffer.strip():
+                raise ValueError('Invalid JSON document')
+        elif self._state != 'done' or self._buffer.strip():
+            raise ValueError('Truncated JSON document')
@@ -0,0 +1,310 @@
+import bisect
+import re
+import threading
+import time
+
+try:
+    import urlparse
+except ImportError:
+    #py3k
+    from urllib import parse as urlparse
+
+from .mirror import split_path
+
+__all__ = ['RequestHook', 'RequestInfo', 'MetricsCollector', 'Histogram',
+           'path_template']
+
+# Segments that look like record identifiers: numbers, push keys and UUIDs.
+_IDENTIFIER = re.compile(r'(-?[0-9]+|-[0-9A-Za-z_-]{19}|[0-9a-fA-F-]{32,36})\Z')
+
+
+def path_template(url, templates=()):
+    """
+    Returns the path of a firebase endpoint with its variable segments
+    replaced by ``*``. ``templates`` are tried first, a ``*`` segment of a
+    template matches any segment. Otherwise the segments that look like
+    record identifiers are replaced.
+
+    path_template('https://firebase.localhost/users/42/name.json') => '/users/*/name'
+    path_template('/users/jane/name', ['/users/*/name']) => '/users/*/name'
+    """
+    path = urlparse.urlparse(url).path
+    if path.endswith('.json'):
+        path = path[:-len('.json')]
+    segments = split_path(path)
+    for template in templates:
+        template_segments = split_path(template)
+        if len(template_segments) == len(segments) and all(
+                expected in ('*', segment)
+                for expected, segment in zip(template_segments, segments)):
+            return '/' + '/'.join(template_segments)
+    return '/' + '/'.join('*' if _IDENTIFIER.match(segment) else segment
+                          for segment in segments)
+
+
+class RequestInfo(object):
+    """
+    Class that describes a request to the hooks. ``params`` and ``headers``
+    are the ones about to be sent, so `RequestHook.before_request` may add
+    tracing headers to them. The outcome fields are set before
+    `RequestHook.after_request` is called: ``status`` is None if the
+    request raised ``exception``. ``bytes_in`` is the size of the received
+    body; for a streamed response, `RequestHook.after_request` is called
+    once the response is closed and counts the part of the body that was
+    read.
+    """
+    def __init__(self, method, url, params, headers, data=None):
+        self.method = method
+        self.url = url
+        self.params = params
+        self.headers = headers
+        self.bytes_out = len(data) if data is not None else 0
+        self.started = time.time()
+        self.elapsed = None
+        self.status = None
+        self.bytes_in = 0
+        self.retries = 0
+        self.exception = None
+
+    def finish(self, status=None, bytes_in=0, retry_state=None, exception=None):
+        self.elapsed = time.time() - self.started
+        self.status = status
+        self.bytes_in = bytes_in
+        self.retries = retry_state.retries if retry_state is not None else 0
+        self.exception = exception
+        return self
+
+
+class RequestHook(object):
+    """
+    Base class of the instrumentation hooks of an application. Subclasses
+    override the methods they are interested in; they are called from the
+    thread or the event loop making the request, so they must be quick.
+
+    class Tracer(RequestHook):
+        def before_request(self, info):
+            info.headers['X-Trace-Id'] = new_trace_id()
+
+    firebase = FirebaseApplication('https://firebase.localhost', auth,
+                                   hooks=[Tracer(), MetricsCollector()])
+    """
+    def before_request(self, info):
+        pass
+
+    def after_request(self, info):
+        pass
+
+    def on_pool_wait(self, seconds):
+        pass
+
+    def on_token_mint(self, seconds):
+        pass
+
+    def on_cache_lookup(self, hit):
+        pass
+
+    def on_rate_limit_wait(self, seconds):
+        pass
+
+
+class HookList(RequestHook):
+    """
+    Hook that forwards the calls to a list of hooks.
+    """
+    def __init__(self, hooks):
+        self.hooks = list(hooks)
+
+    def before_request(self, info):
+        for hook in self.hooks:
+            hook.before_request(info)
+
+    def after_request(self, info):
+        for hook in self.hooks:
+            hook.after_request(info)
+
+    def on_pool_wait(self, seconds):
+        for hook in self.hooks:
+            hook.on_pool_wait(seconds)
+
+    def on_token_mint(self, seconds):
+        for hook in self.hooks:
+            hook.on_token_mint(seconds)
+
+    def on_cache_lookup(self, hit):
+        for hook in self.hooks:
+            hook.on_cache_lookup(hit)
+
+    def on_rate_limit_wait(self, seconds):
+        for hook in self.hooks:
+            hook.on_rate_limit_wait(seconds)
+
+
+def create_hooks(hooks):
+    """
+    Function that turns the ``hooks`` argument of an application, a hook
+    or a list of hooks, into a single hook. Returns None without hooks.
+    """
+    if hooks is None:
+        return None
+    if isinstance(hooks, RequestHook):
+        hooks = [hooks]
+    hooks = list(hooks)
+    return HookList(hooks) if hooks else None
+
+
+class Histogram(object):
+    """
+    Class that counts observations in fixed buckets. ``bounds`` are the
+    upper bounds of the buckets in increasing order, larger observations
+    fall into an overflow bucket. Percentiles are estimated with the upper
+    bound of the bucket they fall into.
+    """
+    DEFAULT_BOUNDS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                      1, 2.5, 5, 10, 30)
+
+    def __init__(self, bounds=DEFAULT_BOUNDS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, fraction):
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        total = 0
+        for index, count in enumerate(self.counts):
+            total += count
+            if total >= rank and count:
+                if index == len(self.bounds):
+                    return self.max
+                return min(self.bounds[index], self.max)
+        return self.max
+
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'mean': self.sum / self.count if self.count else None,
+            'min': self.min,
+            'max': self.max,
+            'p50': self.percentile(0.5),
+            'p90': self.percentile(0.9),
+            'p99': self.percentile(0.99),
+            'buckets': [[bound, count] for bound, count
+                        in zip(self.bounds + (None,), self.counts)],
+        }
+
+
+class RequestMetrics(object):
+    def __init__(self, bounds):
+        self.latency = Histogram(bounds)
+        self.statuses = {}
+        self.errors = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.retries = 0
+
+    def snapshot(self):
+        return {
+            'count': self.latency.count,
+            'errors': self.errors,
+            'statuses': dict(self.statuses),
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'retries': self.retries,
+            'latency': self.latency.snapshot(),
+        }
+
+
+class MetricsCollector(RequestHook):
+    """
+    Hook that records, per HTTP method and path template, the latency
+    histogram, the status codes, the failures, the bytes sent and received
+    and the retries of the requests. It also records the time spent waiting
+    for a connection of the `ConnectionPool` or for the rate limiter, the
+    time spent minting authentication tokens and the hit ratio of the
+    response cache. ``templates`` are passed to `path_template` and
+    latencies are in seconds.
+
+    metrics = MetricsCollector(templates=['/users/*/profile'])
+    firebase = FirebaseApplication('https://firebase.localhost', auth, hooks=metrics)
+    ...
+    metrics.snapshot()['requests']['GET /users/*/profile']['latency']['p99']
+    """
+    def __init__(self, templates=(), bounds=Histogram.DEFAULT_BOUNDS):
+        self.templates = list(templates)
+        self.bounds = bounds
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._requests = {}
+            self._pool_wait = Histogram(self.bounds)
+            self._token_mint = Histogram(self.bounds)
+            self._rate_limit_wait = Histogram(self.bounds)
+            self._cache_hits = 0
+            self._cache_misses = 0
+
+    def after_request(self, info):
+        key = '%s %s' % (info.method.upper(), path_template(info.url, self.templates))
+        with self._lock:
+            metrics = self._requests.get(key)
+            if metrics is None:
+                metrics = self._requests[key] = RequestMetrics(self.bounds)
+            metrics.latency.observe(info.elapsed)
+            if info.status is not None:
+                metrics.statuses[info.status] = metrics.statuses.get(info.status, 0) + 1
+            if info.status is None or info.status >= 400:
+                metrics.errors += 1
+            metrics.bytes_in += info.bytes_in
+            metrics.bytes_out += info.bytes_out
+            metrics.retries += info.retries
+
+    def on_pool_wait(self, seconds):
+        with self._lock:
+            self._pool_wait.observe(seconds)
+
+    def on_token_mint(self, seconds):
+        with self._lock:
+            self._token_mint.observe(seconds)
+
+    def on_rate_limit_wait(self, seconds):
+        with self._lock:
+            self._rate_limit_wait.observe(seconds)
+
+    def on_cache_lookup(self, hit):
+        with self._lock:
+            if hit:
+                self._cache_hits += 1
+            else:
+                self._cache_misses += 1
+
+    def snapshot(self):
+        """
+        Returns the recorded metrics as a JSON serializable dict.
+        """
+        with self._lock:
+            lookups = self._cache_hits + self._cache_misses
+            return {
+                'requests': dict((key, metrics.snapshot())
+                                 for key, metrics in self._requests.items()),
+                'pool_wait': self._pool_wait.snapshot(),
+                'token_mint': self._token_mint.snapshot(),
+                'rate_limit_wait': self._rate_limit_wait.snapshot(),
+                'cache': {
+                    'hits': self._cache_hits,
+                    'misses': self._cache_misses,
+                    'hit_ratio': self._cache_hits / lookups if lookups else None,
+                },
+            }
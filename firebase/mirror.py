@@ -0,0 +1,244 @@
+import sys
+import threading
+import traceback
+
+__all__ = ['LocalMirror']
+
+
+def split_path(path):
+    """
+    Splits a Firebase path into a tuple of its segments.
+
+    split_path('/users/1/') => ('users', '1')
+    """
+    return tuple(segment for segment in (path or '').split('/') if segment)
+
+
+def _normalize(value):
+    # Firebase never stores nulls or empty objects, they mean deletion.
+    if isinstance(value, dict):
+        normalized = {}
+        for key, child in value.items():
+            child = _normalize(child)
+            if child is not None:
+                normalized[key] = child
+        return normalized or None
+    if isinstance(value, list):
+        return _normalize(dict((str(index), child) for index, child in enumerate(value)))
+    return value
+
+
+def _export(value):
+    # Copies a mirrored node, rendering the objects keyed by array indexes
+    # as lists like Firebase does when more than half of the indexes are set.
+    if not isinstance(value, dict):
+        return value
+    children = dict((key, _export(child)) for key, child in value.items())
+    if not all(key.isdigit() and str(int(key)) == key for key in children):
+        return children
+    size = max(int(key) for key in children) + 1
+    if len(children) * 2 <= size:
+        return children
+    array = [None] * size
+    for key, child in children.items():
+        array[int(key)] = child
+    return array
+
+
+class LocalMirror(object):
+    """
+    Class that keeps an in-memory copy of a Firebase location up to date by
+    applying the ``put`` and ``patch`` events of an `EventStream` to a tree
+    keyed by path segments. Reads are then served locally without an HTTP
+    round-trip: the node is found in O(depth), and a copy of it is returned,
+    which takes time proportional to the size of the returned subtree.
+    Arrays are stored as objects keyed by their indexes and turned back into
+    lists when they are read, like Firebase does.
+
+    mirror = firebase.mirror('/config')
+    mirror.wait(timeout=10)
+    mirror.get('/features/beta')
+    => True
+
+    Callbacks subscribed to a path prefix are called with the event path and
+    data whenever a change touches that prefix, its ancestors or its
+    descendants:
+
+    mirror.subscribe('/features', on_features_changed)
+
+    Exceptions raised by the subscribers are passed to ``error_callback``
+    and do not stop the mirror. If the stream fails, the mirror is no longer
+    ``ready``, the exception is kept in ``error`` and passed to
+    ``error_callback`` as well.
+    """
+    def __init__(self, application, url, name=None, params=None, headers=None,
+                 error_callback=None, **stream_kwargs):
+        self.application = application
+        self.url = url
+        self.name = name
+        self.params = params
+        self.headers = headers
+        self.error_callback = error_callback
+        self.stream_kwargs = stream_kwargs
+        self.stream = None
+        self.error = None
+        self.events_applied = 0
+        self._root = None
+        self._subscribers = []
+        self._lock = threading.RLock()
+        self._ready = threading.Event()
+        self._settled = threading.Event()
+
+    def start(self):
+        """
+        Starts listening to the location in the background. Returns the
+        mirror itself.
+        """
+        self.stream = self.application.stream(self.url, self.apply, self.name,
+                                              self.params, self.headers,
+                                              error_callback=self._stream_failed,
+                                              **self.stream_kwargs)
+        return self
+
+    def _stream_failed(self, exception):
+        self.error = exception
+        self._ready.clear()
+        self._settled.set()
+        self._report(exception)
+
+    def _report(self, exception):
+        if self.error_callback is not None:
+            self.error_callback(exception)
+        else:
+            traceback.print_exception(type(exception), exception,
+                                      exception.__traceback__)
+
+    def close(self):
+        """
+        Stops listening to the location. The mirrored data stays readable.
+        """
+        if self.stream is not None:
+            self.stream.close()
+
+    def wait(self, timeout=None):
+        """
+        Blocks until the initial snapshot has been received. Returns False
+        if the timeout expires first or the stream has failed.
+        """
+        self._settled.wait(timeout)
+        return self.ready
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    def _set(self, segments, value):
+        if not segments:
+            self._root = value
+            return
+        if not isinstance(self._root, dict):
+            if value is None:
+                return
+            self._root = {}
+        parents = []
+        node = self._root
+        for segment in segments[:-1]:
+            child = node.get(segment)
+            if not isinstance(child, dict):
+                if value is None:
+                    return
+                child = node[segment] = {}
+            parents.append((node, segment))
+            node = child
+        if value is None:
+            node.pop(segments[-1], None)
+            # Prune the ancestors left empty by the deletion.
+            while not node and parents:
+                parent, segment = parents.pop()
+                del parent[segment]
+                node = parent
+            if not self._root:
+                self._root = None
+        else:
+            node[segments[-1]] = value
+
+    def apply(self, event):
+        """
+        Applies a `StreamEvent` to the mirrored tree and notifies the
+        subscribers whose prefix is touched by the change.
+        """
+        segments = split_path(event.path)
+        with self._lock:
+            if event.event == 'put':
+                self._set(segments, _normalize(event.data))
+            elif event.event == 'patch':
+                for key, value in (event.data or {}).items():
+                    self._set(segments + split_path(key), _normalize(value))
+            else:
+                return
+            self.events_applied += 1
+            subscribers = list(self._subscribers)
+        if not segments and event.event == 'put':
+            self._ready.set()
+            self._settled.set()
+        for prefix, callback in subscribers:
+            length = min(len(prefix), len(segments))
+            if prefix[:length] == segments[:length]:
+                try:
+                    callback(event.path, event.data)
+                except Exception as exception:
+                    self._report(exception)
+
+    def get(self, path='/', default=None):
+        """
+        Returns a copy of the mirrored value at the given path, relative to
+        the mirrored location, or ``default`` if there is no such node.
+        """
+        with self._lock:
+            node = self._root
+            for segment in split_path(path):
+                if not isinstance(node, dict) or segment not in node:
+                    return default
+                node = node[segment]
+            if node is None:
+                return default
+            return _export(node)
+
+    def subscribe(self, prefix, callback):
+        """
+        Registers a callback that is called with ``(path, data)`` for every
+        change that touches the given path prefix.
+        """
+        with self._lock:
+            self._subscribers.append((split_path(prefix), callback))
+
+    def unsubscribe(self, prefix, callback):
+        """
+        Removes a callback registered with `subscribe`.
+        """
+        with self._lock:
+            self._subscribers.remove((split_path(prefix), callback))
+
+    def stats(self):
+        """
+        Returns the memory statistics of the mirrored tree: the number of
+        inner nodes and leaves, the maximum depth and an approximation of
+        the memory used in bytes.
+        """
+        nodes = leaves = depth = size = 0
+        with self._lock:
+            stack = [(self._root, 0)] if self._root is not None else []
+            while stack:
+                node, level = stack.pop()
+                depth = max(depth, level)
+                size += sys.getsizeof(node)
+                if isinstance(node, dict):
+                    nodes += 1
+                    for key, child in node.items():
+                        size += sys.getsizeof(key)
+                        stack.append((child, level + 1))
+                else:
+                    leaves += 1
+            return {'nodes': nodes, 'leaves': leaves, 'depth': depth,
+                    'bytes': size, 'events_applied': self.events_applied,
+                    'subscribers': len(self._subscribers)}
@@ -1,5 +1,3 @@
-import multiprocessing
-
 from .lazy import LazyLoadProxy
 
 __all__ = ['process_pool']
@@ -8,7 +6,20 @@ _process_pool = None
 def get_process_pool(size=5):
     global _process_pool
     if _process_pool is None:
+        # Imported on first use, most programs never need the pool.
+        import multiprocessing
         _process_pool = multiprocessing.Pool(processes=size)
     return _process_pool
 process_pool = LazyLoadProxy(get_process_pool)
 
+
+def close_process_pool():
+    """
+    Closes and terminates the process pool if it was ever created.
+    """
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.close()
+        _process_pool.join()
+        _process_pool.terminate()
+        _process_pool = None
@@ -0,0 +1,152 @@
+import copy
+import json
+import re
+
+from .batch import raise_for_denied
+
+__all__ = ['Query', 'key_order']
+
+_INTEGER_KEY = re.compile(r'(0|-?[1-9][0-9]*)\Z')
+
+
+def key_order(key):
+    """
+    Sort key that reproduces the order of ``orderBy="$key"``: the keys that
+    parse as 32-bit integers come first in numeric order, then the others
+    in lexicographic order.
+
+    sorted(['b', '10', 'a', '9'], key=key_order) => ['9', '10', 'a', 'b']
+    """
+    if _INTEGER_KEY.match(key):
+        value = int(key)
+        if -2 ** 31 <= value < 2 ** 31:
+            return 0, value, ''
+    return 1, 0, key
+
+
+class Query(object):
+    """
+    Class that builds the ordering and filtering querystring of a GET
+    request. Every method returns a new query, so a query can be reused as
+    the base of several others. Values are JSON encoded as Firebase expects.
+
+    query = firebase.query('/users').order_by_child('age').start_at(18).limit_to_first(10)
+    adults = query.get()
+
+    Large collections are better walked page by page with `scan`.
+    """
+    def __init__(self, application, url, name=None, params=None, headers=None):
+        self.application = application
+        self.url = url
+        self.name = name
+        self.params = dict(params or {})
+        self.headers = dict(headers or {})
+        self._query = {}
+
+    def _extend(self, **query):
+        clone = copy.copy(self)
+        clone._query = dict(self._query, **query)
+        return clone
+
+    def order_by_key(self):
+        return self._extend(orderBy='$key')
+
+    def order_by_value(self):
+        return self._extend(orderBy='$value')
+
+    def order_by_priority(self):
+        return self._extend(orderBy='$priority')
+
+    def order_by_child(self, path):
+        return self._extend(orderBy=path)
+
+    def start_at(self, value):
+        return self._extend(startAt=value)
+
+    def end_at(self, value):
+        return self._extend(endAt=value)
+
+    def equal_to(self, value):
+        return self._extend(equalTo=value)
+
+    def limit_to_first(self, limit):
+        return self._extend(limitToFirst=limit)
+
+    def limit_to_last(self, limit):
+        return self._extend(limitToLast=limit)
+
+    def build_params(self):
+        """
+        Returns the querystring of the query merged into a copy of its
+        ``params``.
+        """
+        if 'orderBy' not in self._query and self._query:
+            raise ValueError('A query must be ordered to be filtered or limited')
+        if 'limitToFirst' in self._query and 'limitToLast' in self._query:
+            raise ValueError('A query cannot be limited from both ends')
+        params = dict(self.params)
+        for key, value in self._query.items():
+            params[key] = json.dumps(value)
+        return params
+
+    def get(self, connection=None):
+        """
+        Sends the query and returns the matching children.
+        """
+        return self.application.get(self.url, self.name, params=self.build_params(),
+                                    headers=dict(self.headers), connection=connection)
+
+    def get_async(self, callback=None, error_callback=None):
+        """
+        Sends the query with the executor of the application. Returns a
+        future.
+        """
+        return self.application.get_async(self.url, self.name, callback=callback,
+                                          params=self.build_params(),
+                                          headers=dict(self.headers),
+                                          error_callback=error_callback)
+
+    def _page(self, cursor, exclusive, page_size):
+        # An exclusive cursor is fetched along with the page and dropped.
+        query = self.order_by_key().limit_to_first(page_size + 1 if exclusive else page_size)
+        if cursor is not None:
+            query = query.start_at(cursor)
+        return query
+
+    def scan(self, page_size=1000, prefetch=False):
+        """
+        Generator that walks the children in key order, ``page_size`` of
+        them per request, and yields them as ``(key, value)`` pairs. Only
+        one page is held in memory at a time. The ``start_at`` and
+        ``end_at`` bounds of the query are kept. With ``prefetch`` the next
+        page is downloaded with the executor of the application while the
+        current one is being processed. A page denied by the security rules
+        raises `WriteRejected`.
+
+        for uid, user in firebase.query('/users').start_at('m').scan(500, prefetch=True):
+            process(uid, user)
+        """
+        if self._query.get('orderBy', '$key') != '$key':
+            raise ValueError('Only queries ordered by key can be scanned')
+        if set(self._query) & set(['equalTo', 'limitToFirst', 'limitToLast']):
+            raise ValueError('Queries with equal_to or a limit cannot be scanned')
+        cursor, exclusive = self._query.get('startAt'), False
+        query = self._page(cursor, exclusive, page_size)
+        future = query.get_async() if prefetch else None
+        while True:
+            result = raise_for_denied(future.result() if prefetch else query.get())
+            if not isinstance(result, dict):
+                result = {}
+            items = sorted(result.items(), key=lambda item: key_order(item[0]))
+            more = len(items) == page_size + exclusive
+            if exclusive and items and items[0][0] == cursor:
+                items = items[1:]
+            if more:
+                cursor, exclusive = items[-1][0], True
+                query = self._page(cursor, exclusive, page_size)
+                if prefetch:
+                    future = query.get_async()
+            for item in items:
+                yield item
+            if not more:
+                return
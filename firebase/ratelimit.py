@@ -0,0 +1,249 @@
+import collections
+import threading
+import time
+
+from .cache import endpoint_segments
+from .mirror import split_path
+
+__all__ = ['RateLimiter', 'TokenBucket', 'ConcurrencyLimit']
+
+
+class TokenBucket(object):
+    """
+    Class that hands out ``rate`` tokens per second and stores up to
+    ``capacity`` unused ones. Callers reserve tokens before they are
+    available and wait for the returned delay, so they are served in order
+    and paced evenly instead of retrying in bursts.
+    """
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount=1):
+        """
+        Takes ``amount`` tokens and returns the number of seconds to wait
+        before using them.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity,
+                               self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= amount
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+
+class ConcurrencyLimit(object):
+    """
+    Semaphore of ``max_in_flight`` slots that threads and coroutines can
+    wait on alike. Freed slots are handed to the waiters in arrival order.
+    """
+    def __init__(self, max_in_flight):
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self._waiters = collections.deque()
+        self._lock = threading.Lock()
+
+    @property
+    def queued(self):
+        return len(self._waiters)
+
+    def _try_acquire(self, waker):
+        with self._lock:
+            if self.in_flight < self.max_in_flight and not self._waiters:
+                self.in_flight += 1
+                return True
+            self._waiters.append(waker)
+            return False
+
+    def acquire(self):
+        event = threading.Event()
+        if not self._try_acquire(event.set):
+            # The slot of the releasing request is handed over.
+            event.wait()
+
+    async def acquire_async(self):
+        import asyncio
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def grant():
+            if future.cancelled():
+                self.release()
+            else:
+                future.set_result(None)
+
+        def waker():
+            loop.call_soon_threadsafe(grant)
+
+        if self._try_acquire(waker):
+            return
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                try:
+                    self._waiters.remove(waker)
+                except ValueError:
+                    # Already granted, ``grant`` gives the slot back.
+                    pass
+            raise
+
+    def release(self):
+        with self._lock:
+            if self._waiters:
+                waker = self._waiters.popleft()
+            else:
+                self.in_flight -= 1
+                return
+        waker()
+
+
+class Permit(object):
+    """
+    Class returned by `RateLimiter.acquire`. ``waited`` is the number of
+    seconds the request was held back; the in-flight slots are given back
+    with ``release``.
+    """
+    def __init__(self, limits, waited):
+        self.limits = limits
+        self.waited = waited
+
+    def release(self):
+        limits, self.limits = self.limits, []
+        for limit in reversed(limits):
+            limit.release()
+
+
+class RateLimiter(object):
+    """
+    Class that paces the requests of an application. ``requests_per_second``
+    and ``bytes_per_second`` are enforced with token buckets that allow
+    bursts of ``burst`` seconds worth of requests or request body bytes,
+    and at most ``max_in_flight`` requests are sent at the same time.
+
+    ``prefixes`` maps path prefixes to other `RateLimiter` instances: the
+    requests under the longest matching prefix are limited by that limiter
+    as well as this one. The limits are shared by the synchronous, the
+    executor, the batched and the asyncio requests of the applications the
+    limiter is given to. Each attempt of a retried request is limited.
+
+    limiter = RateLimiter(requests_per_second=100, max_in_flight=20,
+                          prefixes={'/logs': RateLimiter(bytes_per_second=256 * 1024)})
+    firebase = FirebaseApplication('https://firebase.localhost', auth,
+                                   rate_limiter=limiter)
+    """
+    def __init__(self, requests_per_second=None, bytes_per_second=None,
+                 max_in_flight=None, burst=1.0, prefixes=None):
+        self.requests = None
+        if requests_per_second:
+            self.requests = TokenBucket(requests_per_second,
+                                        max(1, requests_per_second * burst))
+        self.bytes = None
+        if bytes_per_second:
+            self.bytes = TokenBucket(bytes_per_second, bytes_per_second * burst)
+        self.concurrency = ConcurrencyLimit(max_in_flight) if max_in_flight else None
+        self.prefixes = sorted(((split_path(prefix), limiter)
+                                for prefix, limiter in (prefixes or {}).items()),
+                               key=lambda item: len(item[0]), reverse=True)
+        self.acquired = 0
+        self.delayed = 0
+        self.wait_seconds = 0.0
+        self.max_wait = 0.0
+        self._lock = threading.Lock()
+
+    def _chain(self, url):
+        if self.prefixes:
+            segments = endpoint_segments(url)
+            for prefix, limiter in self.prefixes:
+                if segments[:len(prefix)] == prefix:
+                    return [limiter, self]
+        return [self]
+
+    def _reserve(self, size):
+        delay = 0.0
+        if self.requests is not None:
+            delay = self.requests.reserve(1)
+        if self.bytes is not None and size:
+            delay = max(delay, self.bytes.reserve(size))
+        return delay
+
+    def _record(self, waited):
+        with self._lock:
+            self.acquired += 1
+            if waited > 0.001:
+                self.delayed += 1
+            self.wait_seconds += waited
+            self.max_wait = max(self.max_wait, waited)
+
+    def acquire(self, url, size=0):
+        """
+        Blocks until a request of ``size`` body bytes may be sent to the
+        given endpoint and returns its `Permit`.
+        """
+        started = time.monotonic()
+        chain = self._chain(url)
+        permit = Permit([], 0)
+        try:
+            for limiter in chain:
+                if limiter.concurrency is not None:
+                    limiter.concurrency.acquire()
+                    permit.limits.append(limiter.concurrency)
+            delay = max(limiter._reserve(size) for limiter in chain)
+            if delay > 0:
+                time.sleep(delay)
+        except BaseException:
+            permit.release()
+            raise
+        permit.waited = time.monotonic() - started
+        for limiter in chain:
+            limiter._record(permit.waited)
+        return permit
+
+    async def acquire_async(self, url, size=0):
+        """
+        Coroutine version of `acquire` that waits without blocking the
+        event loop.
+        """
+        import asyncio
+        started = time.monotonic()
+        chain = self._chain(url)
+        permit = Permit([], 0)
+        try:
+            for limiter in chain:
+                if limiter.concurrency is not None:
+                    await limiter.concurrency.acquire_async()
+                    permit.limits.append(limiter.concurrency)
+            delay = max(limiter._reserve(size) for limiter in chain)
+            if delay > 0:
+                await asyncio.sleep(delay)
+        except BaseException:
+            permit.release()
+            raise
+        permit.waited = time.monotonic() - started
+        for limiter in chain:
+            limiter._record(permit.waited)
+        return permit
+
+    def stats(self):
+        """
+        Returns the queueing statistics of the limiter and of its prefixes.
+        """
+        with self._lock:
+            stats = {
+                'acquired': self.acquired,
+                'delayed': self.delayed,
+                'wait_seconds': self.wait_seconds,
+                'max_wait': self.max_wait,
+                'in_flight': self.concurrency.in_flight if self.concurrency else None,
+                'queued': self.concurrency.queued if self.concurrency else None,
+            }
+        if self.prefixes:
+            stats['prefixes'] = dict(('/' + '/'.join(prefix), limiter.stats())
+                                     for prefix, limiter in self.prefixes)
+        return stats
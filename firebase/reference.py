@@ -0,0 +1,187 @@
+try:
+    import urlparse
+except ImportError:
+    #py3k
+    from urllib import parse as urlparse
+
+from .mirror import split_path
+from .writer import generate_push_id
+
+__all__ = ['Reference']
+
+
+class Reference(object):
+    """
+    Class that points at a location of the database. Its endpoint URL is
+    computed once when the reference is created, and the authenticated
+    copies of its default ``params`` and ``headers`` are reused as long as
+    the authentication token does not change, so the requests of a hot loop
+    skip the URL parsing and the dict building of the application methods.
+    Child references are derived from the endpoint of their parent.
+
+    users = firebase.ref('/users')
+    for uid, name in names.items():
+        users.child(uid).set({'name': name})
+    users.child('1', 'name').get()
+
+    Reads go through the response cache and the coalesced requests of the
+    application when it has them, and writes invalidate them.
+    """
+    __slots__ = ['application', 'segments', 'params', 'headers', 'endpoint', '_root',
+                 '_authenticated']
+
+    def __init__(self, application, path, params=None, headers=None):
+        self.application = application
+        self.segments = split_path(path)
+        self.params = dict(params or {})
+        self.headers = dict(headers or {})
+        self._root = urlparse.urljoin(application.dsn, application.URL_SEPERATOR)
+        self.endpoint = '%s%s%s' % (self._root, '/'.join(self.segments),
+                                    application.NAME_EXTENSION)
+        self._authenticated = None
+
+    def _clone(self, segments):
+        # The clone shares the params, the headers and their authenticated
+        # copies, which are never modified.
+        clone = object.__new__(Reference)
+        clone.application = self.application
+        clone.segments = segments
+        clone.params = self.params
+        clone.headers = self.headers
+        clone._root = self._root
+        clone.endpoint = '%s%s%s' % (self._root, '/'.join(segments),
+                                     self.application.NAME_EXTENSION)
+        clone._authenticated = self._authenticated
+        return clone
+
+    @property
+    def path(self):
+        return '/' + '/'.join(self.segments)
+
+    @property
+    def key(self):
+        """
+        The last segment of the path, None for the root.
+        """
+        return self.segments[-1] if self.segments else None
+
+    @property
+    def parent(self):
+        """
+        The reference of the parent location, None for the root.
+        """
+        if not self.segments:
+            return None
+        return self._clone(self.segments[:-1])
+
+    def child(self, *path):
+        """
+        Returns the reference of a location below this one. Each argument
+        is a key or a relative path.
+
+        firebase.ref('/users').child(uid, 'name')
+        """
+        if len(path) == 1 and path[0] and '/' not in path[0]:
+            return self._clone(self.segments + (path[0],))
+        segments = split_path('/'.join(path))
+        if not segments:
+            return self
+        return self._clone(self.segments + segments)
+
+    def _authenticate(self):
+        """
+        Returns the authenticated params and headers of the reference. They
+        are shared by the requests and must not be modified; `send_request`
+        sends copies of them when the hooks may add headers.
+        """
+        authentication = self.application.authentication
+        if not authentication:
+            return self.params, self.headers
+        user = authentication.get_user(self.application.hooks)
+        authenticated = self._authenticated
+        if authenticated is None or authenticated[0] is not user:
+            params = dict(self.params, auth_token=user.firebase_auth_token)
+            headers = dict(self.headers, **authentication.authenticator.HEADERS)
+            self._authenticated = authenticated = user, params, headers
+        return authenticated[1], authenticated[2]
+
+    def _write(self, method, data, connection, response_mode):
+        params, headers = self._authenticate()
+        data, headers = self.application._encode_body(data, headers)
+        return self.application._send(method, self.endpoint, params, headers, data,
+                                      connection=connection, response_mode=response_mode)
+
+    def get(self, connection=None):
+        """
+        Returns the value of the location.
+        """
+        application = self.application
+        if application.cache is not None or application.flights is not None:
+            return application._get_endpoint(self.endpoint, dict(self.params),
+                                             dict(self.headers), connection)
+        params, headers = self._authenticate()
+        return application._send('get', self.endpoint, params, headers,
+                                 connection=connection)
+
+    def set(self, data, connection=None, response_mode='full'):
+        """
+        Replaces the value of the location with ``data``. See
+        `apply_response_mode` for ``response_mode``.
+        """
+        return self._write('put', data, connection, response_mode)
+
+    def update(self, data, connection=None, response_mode='full'):
+        """
+        Sets the given children of the location, leaving the others as they
+        are.
+        """
+        return self._write('patch', data, connection, response_mode)
+
+    def push(self, data, connection=None, response_mode='silent'):
+        """
+        Adds ``data`` as a new child of the location and returns the
+        reference of the child. Its key is generated locally, in the format
+        of the keys Firebase creates, so a retried request does not create
+        a second child. The value is not echoed back by default.
+        """
+        child = self.child(generate_push_id())
+        child.set(data, connection, response_mode)
+        return child
+
+    def remove(self, connection=None, response_mode='full'):
+        """
+        Deletes the location.
+        """
+        params, headers = self._authenticate()
+        return self.application._send('delete', self.endpoint, params, headers,
+                                      connection=connection, response_mode=response_mode)
+
+    def transaction(self, update_function, max_retries=25, connection=None):
+        """
+        Updates the value of the location with ``update_function`` unless
+        another client changes it in the meantime. See
+        `FirebaseApplication.transaction`.
+        """
+        return self.application.transaction(self.path, update_function, max_retries,
+                                            dict(self.params), dict(self.headers),
+                                            connection)
+
+    def query(self):
+        """
+        Returns a `Query` that orders and filters the children of the
+        location.
+        """
+        return self.application.query(self.path, None, self.params, self.headers)
+
+    def __eq__(self, other):
+        return (isinstance(other, Reference) and self.application is other.application
+                and self.segments == other.segments)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.segments)
+
+    def __repr__(self):
+        return '<Reference %s>' % self.path
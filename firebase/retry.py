@@ -0,0 +1,208 @@
+import asyncio
+import email.utils
+import random
+import threading
+import time
+
+try:
+    import urlparse
+except ImportError:
+    #py3k
+    from urllib import parse as urlparse
+
+import requests
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+__all__ = ['RetryPolicy', 'CircuitBreaker', 'CircuitOpenError']
+
+
+def _transient_exceptions():
+    exceptions = [requests.ConnectionError, requests.Timeout, asyncio.TimeoutError]
+    if aiohttp is not None:
+        exceptions.append(aiohttp.ClientConnectionError)
+    return tuple(exceptions)
+
+
+def _unsent_exceptions():
+    # Failures raised before the request could reach the server.
+    exceptions = [requests.ConnectTimeout]
+    if aiohttp is not None:
+        exceptions.append(aiohttp.ClientConnectorError)
+    return tuple(exceptions)
+
+
+def parse_retry_after(value):
+    """
+    Parses the value of a ``Retry-After`` header, either a number of
+    seconds or an HTTP date, into seconds. Returns None if it is invalid.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    date = email.utils.parsedate_tz(value)
+    if date is None:
+        return None
+    return max(0.0, email.utils.mktime_tz(date) - time.time())
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of making a request while the circuit of the target host
+    is open.
+    """
+
+
+class CircuitBreaker(object):
+    """
+    Class that stops the requests to a host after ``failure_threshold``
+    consecutive failures. Requests fail fast with `CircuitOpenError` for
+    ``recovery_timeout`` seconds, then a single trial request is let
+    through: its success closes the circuit, its failure opens it again.
+    """
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half-open'
+
+    def __init__(self, failure_threshold=5, recovery_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def state(self, host):
+        with self._lock:
+            return self._hosts.get(host, [self.CLOSED])[0]
+
+    def allow(self, host):
+        """
+        Raises `CircuitOpenError` if no request may be sent to the host.
+        """
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None or state[0] == self.CLOSED:
+                return
+            if time.time() - state[2] >= self.recovery_timeout:
+                # Let a single trial request through.
+                state[0] = self.HALF_OPEN
+                state[2] = time.time()
+                return
+            raise CircuitOpenError('Circuit is open for %s' % host)
+
+    def record_success(self, host):
+        with self._lock:
+            self._hosts.pop(host, None)
+
+    def record_failure(self, host):
+        with self._lock:
+            # [state, consecutive failures, opened at]
+            state = self._hosts.setdefault(host, [self.CLOSED, 0, None])
+            state[1] += 1
+            if state[0] == self.HALF_OPEN or state[1] >= self.failure_threshold:
+                state[0] = self.OPEN
+                state[2] = time.time()
+
+
+class RetryPolicy(object):
+    """
+    Class that decides whether and when a failed request is sent again. It
+    is shared by the synchronous helpers and the asyncio client.
+
+    Requests failing with a connection error, a timeout or one of the
+    ``statuses`` are retried up to ``max_retries`` times, waiting an
+    exponentially growing delay between ``backoff`` and ``max_backoff``
+    seconds with full jitter, or the delay asked by a ``Retry-After``
+    header. No retry is made once ``deadline`` seconds have passed since the
+    first attempt. Methods not listed in ``methods`` (POST by default, since
+    it is not idempotent) are only retried when the request surely did not
+    reach the server.
+
+    An optional `CircuitBreaker` is consulted before each attempt.
+
+    policy = RetryPolicy(max_retries=5, deadline=30,
+                         circuit_breaker=CircuitBreaker())
+    firebase = FirebaseApplication('https://firebase.localhost', auth,
+                                   retry_policy=policy)
+    """
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+    IDEMPOTENT_METHODS = ('get', 'put', 'patch', 'delete')
+
+    def __init__(self, max_retries=3, backoff=0.1, max_backoff=10, deadline=None,
+                 statuses=RETRY_STATUSES, methods=IDEMPOTENT_METHODS,
+                 respect_retry_after=True, circuit_breaker=None):
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.deadline = deadline
+        self.statuses = statuses
+        self.methods = methods
+        self.respect_retry_after = respect_retry_after
+        self.circuit_breaker = circuit_breaker
+
+    def start(self, method, url):
+        """
+        Returns the `RetryState` that follows the attempts of one request.
+        """
+        return RetryState(self, method.lower(), urlparse.urlparse(url).netloc)
+
+    def get_delay(self, attempt, retry_after=None):
+        if retry_after is not None and self.respect_retry_after:
+            return retry_after
+        return random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt)))
+
+
+class RetryState(object):
+    """
+    Class that tracks the attempts of a single request. ``on_response`` and
+    ``on_exception`` return the number of seconds to wait before the next
+    attempt, or None when the outcome must be handed to the caller.
+    """
+    def __init__(self, policy, method, host):
+        self.policy = policy
+        self.method = method
+        self.host = host
+        self.retries = 0
+        self.started = time.time()
+
+    def before_attempt(self):
+        if self.policy.circuit_breaker is not None:
+            self.policy.circuit_breaker.allow(self.host)
+
+    def _record(self, failed):
+        breaker = self.policy.circuit_breaker
+        if breaker is not None:
+            if failed:
+                breaker.record_failure(self.host)
+            else:
+                breaker.record_success(self.host)
+
+    def _next_delay(self, retry_after=None):
+        if self.retries >= self.policy.max_retries:
+            return None
+        delay = self.policy.get_delay(self.retries, retry_after)
+        if (self.policy.deadline is not None and
+                time.time() + delay - self.started > self.policy.deadline):
+            return None
+        self.retries += 1
+        return delay
+
+    def on_response(self, status, retry_after=None):
+        failed = status in self.policy.statuses
+        self._record(failed)
+        # A 429 means the request was rejected before being processed.
+        if not failed or (self.method not in self.policy.methods and status != 429):
+            return None
+        return self._next_delay(parse_retry_after(retry_after))
+
+    def on_exception(self, exception):
+        if not isinstance(exception, _transient_exceptions()):
+            return None
+        self._record(True)
+        if (self.method not in self.policy.methods and
+                not isinstance(exception, _unsent_exceptions())):
+            return None
+        return self._next_delay()
@@ -0,0 +1,438 @@
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+import requests
+
+from .batch import WriteBatch
+from .mirror import split_path
+from .writer import generate_push_id
+
+__all__ = ['WriteSpool', 'FSYNC_POLICIES']
+
+FSYNC_POLICIES = ('always', 'interval', 'never')
+
+JOURNAL_NAME = 'journal'
+CHECKPOINT_NAME = 'checkpoint'
+
+
+class SpoolRecord(object):
+    __slots__ = ['seq', 'operation', 'path', 'line']
+
+    def __init__(self, seq, operation, path, line):
+        self.seq = seq
+        self.operation = operation
+        self.path = path
+        self.line = line
+
+
+def is_client_error(exception):
+    """
+    Returns True if the request failed with a 4xx status that retrying will
+    not fix, `WriteRejected` included.
+    """
+    status = getattr(exception, 'status_code', None)
+    if status is None:
+        status = getattr(getattr(exception, 'response', None), 'status_code', None)
+    return status is not None and 400 <= status < 500 and status not in (408, 429)
+
+
+def is_transient_error(exception):
+    """
+    Returns True if the request failed in a way that retrying may fix: a
+    network error, a server error or an open circuit. Other exceptions,
+    client errors included, are caused by the writes that were sent.
+    """
+    from .retry import CircuitOpenError
+    if not isinstance(exception, (requests.RequestException, EnvironmentError,
+                                  CircuitOpenError)):
+        return False
+    return not is_client_error(exception)
+
+
+def queue_write(batch, operation, path, data):
+    """
+    Queues a spooled write in the given `WriteBatch`.
+    """
+    if operation == 'patch':
+        batch.update(path, data)
+    else:
+        batch.set(path, data)
+
+
+def compact_records(records, codec):
+    """
+    Returns the records that are not superseded by a later record: a put or
+    a delete supersedes the earlier writes to its path and below, a patch
+    those to the children it sets.
+    """
+    overwritten = set()
+
+    def covered(segments):
+        return any(segments[:length] in overwritten
+                   for length in range(1, len(segments) + 1))
+
+    kept = []
+    for record in reversed(records):
+        segments = split_path(record.path)
+        if covered(segments):
+            continue
+        if record.operation == 'patch':
+            data = codec.loads(record.line)[3]
+            if isinstance(data, dict):
+                children = [segments + split_path(key) for key in data]
+                if all(covered(child) for child in children):
+                    continue
+                overwritten.update(children)
+            # Other patches are kept to be reported and dropped when sent.
+        else:
+            overwritten.add(segments)
+        kept.append(record)
+    kept.reverse()
+    return kept
+
+
+class WriteSpool(object):
+    """
+    Class that makes writes durable on the local disk and acknowledges them
+    right away, before they reach the backend. The writes are appended to a
+    journal in ``directory`` and a background thread replays them in order
+    as multi-location PATCH requests of up to ``batch_size`` writes and
+    ``max_bytes`` of data, so that the callers do not wait for a slow or
+    unreachable backend.
+
+    ``fsync`` controls when the journal is flushed to the disk: after
+    every write with ``'always'``, at most every ``fsync_interval`` seconds
+    with ``'interval'``, or never, leaving it to the operating system. With
+    ``'interval'``, a write is on the disk at most ``fsync_interval``
+    seconds after it was spooled, even if no other write follows it.
+
+    Requests that failed because of the network or the server are retried
+    with an exponential backoff from ``retry_interval`` up to
+    ``max_retry_interval`` seconds. Writes rejected with a client error, 403
+    Permission Denied included, or that cannot be sent at all are reported
+    to ``error_callback`` and dropped. Writes that a `WriteBatch` would
+    refuse raise when they are spooled.
+    The replayed position is checkpointed; writes that were still pending
+    when the process stopped are replayed by the next spool opened on the
+    same directory, so a write can be sent more than once. Once
+    ``compact_bytes`` of replayed writes have piled up, the journal is
+    rewritten without them and without the writes superseded by later ones.
+
+    spool = firebase.spool('/var/spool/firebase', fsync='always')
+    spool.put('/users', '1', {'name': 'John Doe'})
+    spool.post('/events', {'type': 'login'})
+    spool.close(timeout=5)
+    """
+    def __init__(self, application, directory, fsync='interval', fsync_interval=1.0,
+                 batch_size=500, max_bytes=256 * 1024, retry_interval=0.5,
+                 max_retry_interval=30, compact_bytes=4 * 1024 * 1024,
+                 error_callback=None):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError('Unknown fsync policy: %s' % fsync)
+        self.application = application
+        self.directory = directory
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.batch_size = batch_size
+        self.max_bytes = max_bytes
+        self.retry_interval = retry_interval
+        self.max_retry_interval = max_retry_interval
+        self.compact_bytes = compact_bytes
+        self.error_callback = error_callback
+        self.closed = False
+        self.replayed = 0
+        self.dropped = 0
+        self._stopped = False
+        self._pending = []
+        self._pending_bytes = 0
+        self._garbage_bytes = 0
+        self._seq = 0
+        self._checkpoint = 0
+        self._synced_at = time.time()
+        self._unsynced = False
+        self._sync_timer = None
+        self._isolate_until = 0
+        self._condition = threading.Condition()
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self._lock_file = open(os.path.join(directory, 'lock'), 'w')
+        if fcntl is not None:
+            try:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except IOError:
+                self._lock_file.close()
+                raise ValueError('The spool directory is in use: %s' % directory)
+        self._recover()
+        self._thread = threading.Thread(target=self._run, name='firebase-spool')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _recover(self):
+        """
+        Loads the writes that were not replayed yet. A partially written
+        last record, left by a crash, is discarded.
+        """
+        try:
+            with open(self._path(CHECKPOINT_NAME)) as checkpoint_file:
+                self._checkpoint = int(checkpoint_file.read().strip() or 0)
+        except (IOError, OSError, ValueError):
+            self._checkpoint = 0
+        self._seq = self._checkpoint
+        records = []
+        try:
+            with open(self._path(JOURNAL_NAME), 'rb') as journal:
+                content = journal.read()
+        except (IOError, OSError):
+            content = b''
+        for line in content.split(b'\n')[:-1]:
+            try:
+                seq, operation, path, _ = self.application.codec.loads(line)
+            except ValueError:
+                continue
+            self._seq = max(self._seq, seq)
+            if seq > self._checkpoint:
+                records.append(SpoolRecord(seq, operation, path, line + b'\n'))
+        self._pending = records
+        self._journal = None
+        self._rewrite_journal()
+
+    def _sync_file(self, file_object):
+        file_object.flush()
+        if self.fsync != 'never':
+            os.fsync(file_object.fileno())
+            self._synced_at = time.time()
+
+    def _sync_directory(self):
+        if self.fsync == 'never':
+            return
+        try:
+            descriptor = os.open(self.directory, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(descriptor)
+        except OSError:
+            pass
+        finally:
+            os.close(descriptor)
+
+    def _rewrite_journal(self):
+        """
+        Replaces the journal with the pending writes that are not
+        superseded. Called with the condition held or before the thread
+        starts.
+        """
+        self._pending = compact_records(self._pending, self.application.codec)
+        self._pending_bytes = sum(len(record.line) for record in self._pending)
+        temporary = self._path(JOURNAL_NAME + '.tmp')
+        with open(temporary, 'wb') as journal:
+            journal.writelines(record.line for record in self._pending)
+            self._sync_file(journal)
+        if self._journal is not None:
+            self._journal.close()
+        os.replace(temporary, self._path(JOURNAL_NAME))
+        self._sync_directory()
+        self._journal = open(self._path(JOURNAL_NAME), 'ab')
+        self._unsynced = False
+        self._garbage_bytes = 0
+
+    def _write_checkpoint(self, seq):
+        temporary = self._path(CHECKPOINT_NAME + '.tmp')
+        with open(temporary, 'w') as checkpoint_file:
+            checkpoint_file.write('%d\n' % seq)
+            self._sync_file(checkpoint_file)
+        os.replace(temporary, self._path(CHECKPOINT_NAME))
+        self._checkpoint = seq
+
+    def _append(self, operation, path, data):
+        # Queued right away so that an invalid write fails here rather than
+        # when it is sent.
+        queue_write(WriteBatch(self.application), operation, path, data)
+        encoded_path, encoded_data = [
+            encoded if isinstance(encoded, bytes) else encoded.encode('utf-8')
+            for encoded in (self.application.codec.dumps(path),
+                            self.application.codec.dumps(data))]
+        if b'\n' in encoded_path or b'\n' in encoded_data:
+            # The records of the journal are delimited by newlines.
+            raise ValueError('The codec must not emit newlines')
+        with self._condition:
+            if self.closed:
+                raise ValueError('Write to a closed WriteSpool')
+            self._seq += 1
+            line = b'[%d,"%s",%s,%s]\n' % (self._seq, operation.encode('ascii'),
+                                           encoded_path, encoded_data)
+            self._journal.write(line)
+            if (self.fsync == 'always' or self.fsync == 'interval' and
+                    time.time() - self._synced_at >= self.fsync_interval):
+                self._sync_file(self._journal)
+                self._unsynced = False
+            else:
+                self._journal.flush()
+                self._unsynced = True
+                if self.fsync == 'interval' and self._sync_timer is None:
+                    self._start_sync_timer()
+            self._pending.append(SpoolRecord(self._seq, operation, path, line))
+            self._pending_bytes += len(line)
+            self._condition.notify_all()
+
+    def _start_sync_timer(self):
+        # The thread replaying the writes may be stuck in a request, the
+        # journal is synced by a timer of its own.
+        delay = max(0, self._synced_at + self.fsync_interval - time.time())
+        self._sync_timer = threading.Timer(delay, self._timed_sync)
+        self._sync_timer.daemon = True
+        self._sync_timer.start()
+
+    def _timed_sync(self):
+        with self._condition:
+            self._sync_timer = None
+            if self._unsynced and not self._journal.closed:
+                self._sync_file(self._journal)
+                self._unsynced = False
+
+    def put(self, url, name, data):
+        """
+        Spools a write of ``data`` to ``url/name``.
+        """
+        path = '%s/%s' % (url, name)
+        assert split_path(path), 'The root cannot be written in a spool'
+        self._append('put', path, data)
+
+    def patch(self, url, data):
+        """
+        Spools an update of the given children of ``url``. ``data`` must be
+        a dict.
+        """
+        if not isinstance(data, dict):
+            raise ValueError('A patch must be a dict of children')
+        self._append('patch', url, data)
+
+    def post(self, url, data):
+        """
+        Spools the creation of a new child of ``url`` and returns its key.
+        The key is generated locally so that replaying the write twice
+        does not create two children.
+        """
+        name = generate_push_id()
+        self._append('put', '%s/%s' % (url, name), data)
+        return name
+
+    def delete(self, url, name):
+        """
+        Spools the removal of ``url/name``.
+        """
+        path = '%s/%s' % (url, name)
+        assert split_path(path), 'The root cannot be written in a spool'
+        self._append('delete', path, None)
+
+    def __len__(self):
+        return len(self._pending)
+
+    @property
+    def pending_bytes(self):
+        return self._pending_bytes
+
+    def _next_records(self):
+        limit = 1 if self._pending[0].seq <= self._isolate_until else self.batch_size
+        records, size = [], 0
+        for record in self._pending[:limit]:
+            if records and size + len(record.line) > self.max_bytes:
+                break
+            records.append(record)
+            size += len(record.line)
+        return records
+
+    def _send(self, records):
+        batch = WriteBatch(self.application, max_bytes=self.max_bytes)
+        for record in records:
+            queue_write(batch, record.operation, record.path,
+                        self.application.codec.loads(record.line)[3])
+        batch.commit()
+
+    def _done(self, records):
+        with self._condition:
+            del self._pending[:len(records)]
+            size = sum(len(record.line) for record in records)
+            self._pending_bytes -= size
+            self._garbage_bytes += size
+            self._write_checkpoint(records[-1].seq)
+            if self._garbage_bytes >= self.compact_bytes:
+                self._rewrite_journal()
+            self._condition.notify_all()
+
+    def _run(self):
+        delay = self.retry_interval
+        while True:
+            with self._condition:
+                while not self._pending and not self._stopped:
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                records = self._next_records()
+            try:
+                self._send(records)
+            except Exception as exception:
+                transient = is_transient_error(exception)
+                if not transient and len(records) > 1:
+                    # Replay the writes one by one to drop only the bad one.
+                    self._isolate_until = records[-1].seq
+                    continue
+                if self.error_callback is not None:
+                    self.error_callback(exception)
+                if transient:
+                    with self._condition:
+                        self._condition.wait_for(lambda: self._stopped, delay)
+                    delay = min(delay * 2, self.max_retry_interval)
+                    continue
+                self.dropped += 1
+            else:
+                self.replayed += len(records)
+            delay = self.retry_interval
+            self._done(records)
+
+    def flush(self, timeout=None):
+        """
+        Waits until the spooled writes are replayed. Returns False if some
+        are still pending after ``timeout`` seconds.
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._pending, timeout)
+
+    def close(self, timeout=0):
+        """
+        Stops accepting writes, waits up to ``timeout`` seconds for the
+        pending ones to be replayed, None meaning until they are, and stops
+        the background thread once its current request is done. The writes
+        left are replayed by the next spool opened on the directory.
+        """
+        with self._condition:
+            if self.closed:
+                return
+            self.closed = True
+        self.flush(timeout)
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        self._thread.join()
+        with self._condition:
+            if self._sync_timer is not None:
+                self._sync_timer.cancel()
+                self._sync_timer = None
+            self._sync_file(self._journal)
+            self._journal.close()
+        self._lock_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
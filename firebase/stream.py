@@ -0,0 +1,285 @@
+import codecs
+import random
+import threading
+
+__all__ = ['StreamEvent', 'EventStream', 'SSEParser', 'StreamCancelled', 'iter_chunks']
+
+
+def iter_chunks(response, chunk_size):
+    """
+    Yields the decoded chunks of the body of a streamed response as soon as
+    they arrive, and counts their bytes in the ``bytes_received`` attribute
+    of the response when it has one.
+    """
+    # ``iter_content`` waits for chunk_size bytes on bodies that are not
+    # chunk-encoded, ``read1`` hands out whatever has already arrived,
+    # decompressed like ``iter_content`` does.
+    raw = getattr(response, 'raw', None)
+    if raw is None or not hasattr(raw, 'read1'):
+        chunks = response.iter_content(chunk_size=chunk_size)
+    else:
+        chunks = iter(lambda: raw.read1(chunk_size, decode_content=True), b'')
+    counted = hasattr(response, 'bytes_received')
+    for chunk in chunks:
+        if counted:
+            response.bytes_received += len(chunk)
+        yield chunk
+
+
+class StreamEvent(object):
+    """
+    Class that wraps a ``put`` or ``patch`` event sent by the Firebase
+    streaming endpoint. ``path`` is relative to the streamed location.
+    """
+    def __init__(self, event, path, data):
+        self.event = event
+        self.path = path
+        self.data = data
+
+    def __repr__(self):
+        return 'StreamEvent(%r, %r, %r)' % (self.event, self.path, self.data)
+
+
+class SSEParser(object):
+    """
+    Incremental parser of a ``text/event-stream`` body. Chunks of bytes are
+    fed as they arrive and the completely received events are returned as
+    ``(event, data)`` tuples.
+
+    parser = SSEParser()
+    parser.feed(b'event: put\\ndata: {"path": "/", "da')
+    => []
+    parser.feed(b'ta": 1}\\n\\n')
+    => [('put', '{"path": "/", "data": 1}')]
+    """
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        self._event = None
+        self._data = []
+        self.last_event_id = None
+        self.retry = None
+
+    def feed(self, chunk):
+        self._buffer += self._decoder.decode(chunk)
+        events = []
+        while True:
+            index = -1
+            for terminator in ('\r', '\n'):
+                position = self._buffer.find(terminator)
+                if position != -1 and (index == -1 or position < index):
+                    index = position
+            if index == -1:
+                break
+            if self._buffer[index] == '\r':
+                if index + 1 == len(self._buffer):
+                    # A \r\n terminator may be split between two chunks.
+                    break
+                end = index + 2 if self._buffer[index + 1] == '\n' else index + 1
+            else:
+                end = index + 1
+            line = self._buffer[:index]
+            self._buffer = self._buffer[end:]
+            event = self._parse_line(line)
+            if event is not None:
+                events.append(event)
+        return events
+
+    def _parse_line(self, line):
+        if not line:
+            if not self._data and self._event is None:
+                return None
+            event = (self._event or 'message', '\n'.join(self._data))
+            self._event = None
+            self._data = []
+            return event
+        if line.startswith(':'):
+            return None
+        field, _, value = line.partition(':')
+        if value.startswith(' '):
+            value = value[1:]
+        if field == 'event':
+            self._event = value
+        elif field == 'data':
+            self._data.append(value)
+        elif field == 'id':
+            self.last_event_id = value
+        elif field == 'retry' and value.isdigit():
+            self.retry = int(value) / 1000.0
+        return None
+
+
+class StreamCancelled(Exception):
+    """
+    Raised when the server cancels the stream, e.g. because the security
+    rules no longer allow reading the location.
+    """
+
+
+class EventStream(object):
+    """
+    Class that listens to the changes of a Firebase location through the
+    REST streaming endpoint. Iterating over it yields `StreamEvent`
+    instances for every ``put`` and ``patch`` event. ``keep-alive`` events
+    are skipped, ``auth_revoked`` refreshes the token and reconnects and
+    ``cancel`` stops the stream.
+
+    Dropped connections are reopened with an exponential backoff that
+    starts at ``backoff`` seconds and is capped at ``max_backoff``. A
+    ``retry`` interval sent by the server takes precedence over
+    ``backoff``. The retry policy of the application is not used for the
+    stream; its hooks are told about every connection and its rate limiter
+    paces them, but an open stream does not hold an in-flight permit.
+
+    for event in firebase.stream('/messages'):
+        print event.event, event.path, event.data
+
+    With a callback the stream runs in a background thread:
+
+    stream = firebase.stream('/messages', callback=handle_event,
+                             error_callback=handle_error)
+    ...
+    stream.close()
+
+    If the callback raises or the stream fails with an error that is not
+    retried, the background thread stops, the exception is kept in
+    ``error`` and passed to ``error_callback``.
+    """
+    CHUNK_SIZE = 8192
+
+    def __init__(self, application, url, name=None, params=None, headers=None,
+                 callback=None, reconnect=True, backoff=1, max_backoff=30,
+                 timeout=(10, 90), connection=None, error_callback=None):
+        self.application = application
+        self.url = url
+        self.name = name
+        self.params = params
+        self.headers = headers
+        self.callback = callback
+        self.error_callback = error_callback
+        self.reconnect = reconnect
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.connection = connection
+        self.cancelled = False
+        self.error = None
+        self._closed = threading.Event()
+        self._response = None
+        self._thread = None
+
+    @property
+    def closed(self):
+        return self._closed.is_set()
+
+    def _open(self, last_event_id):
+        from .firebase import send_request
+        endpoint, params, headers = self.application._prepare_request(
+            self.url, self.name, dict(self.params or {}), dict(self.headers or {}))
+        headers['Accept'] = 'text/event-stream'
+        if last_event_id is not None:
+            headers['Last-Event-ID'] = last_event_id
+        application = self.application
+        if application.rate_limiter is not None:
+            # The permit would be held for as long as the stream is open.
+            permit = application.rate_limiter.acquire(endpoint)
+            permit.release()
+            if application.hooks is not None:
+                application.hooks.on_rate_limit_wait(permit.waited)
+        connection = application._get_connection(self.connection)
+        response = send_request('get', endpoint, params, headers, connection,
+                                stream=True, hooks=application.hooks,
+                                timeout=self.timeout)
+        if not response.ok:
+            response.close()
+            response.raise_for_status()
+        return response
+
+    def _events(self, response, parser):
+        for chunk in iter_chunks(response, self.CHUNK_SIZE):
+            if self.closed:
+                return
+            for event, data in parser.feed(chunk):
+                yield event, data
+
+    def _should_retry(self, exception):
+        status = getattr(getattr(exception, 'response', None), 'status_code', None)
+        if status is not None and 400 <= status < 500 and status != 429:
+            return False
+        return self.reconnect
+
+    def _wait(self, attempt, parser):
+        delay = parser.retry if parser.retry is not None else self.backoff
+        delay = min(self.max_backoff, delay * (2 ** attempt))
+        self._closed.wait(delay * random.uniform(0.5, 1))
+
+    def __iter__(self):
+        parser = SSEParser()
+        attempt = 0
+        while not self.closed:
+            revoked = False
+            try:
+                self._response = self._open(parser.last_event_id)
+                attempt = 0
+                for event, data in self._events(self._response, parser):
+                    if event in ('put', 'patch'):
+                        payload = self.application.codec.loads(data)
+                        yield StreamEvent(event, payload['path'], payload['data'])
+                    elif event == 'cancel':
+                        self.cancelled = True
+                        raise StreamCancelled(data)
+                    elif event == 'auth_revoked':
+                        if self.application.authentication:
+                            self.application.authentication.invalidate()
+                        revoked = True
+                        break
+            except StreamCancelled:
+                self.close()
+                return
+            except Exception as exception:
+                if self.closed:
+                    return
+                if not self._should_retry(exception):
+                    raise
+                self._wait(attempt, parser)
+                attempt += 1
+                continue
+            finally:
+                if self._response is not None:
+                    self._response.close()
+                    self._response = None
+            if not self.reconnect:
+                return
+            if not revoked:
+                # The server closed the stream, back off before reconnecting.
+                self._wait(0, parser)
+
+    def _run(self):
+        try:
+            for event in self:
+                self.callback(event)
+        except Exception as exception:
+            self.error = exception
+            self.close()
+            if self.error_callback is not None:
+                self.error_callback(exception)
+
+    def start(self):
+        """
+        Starts listening in a daemon thread that feeds the callback with
+        the received events. Returns the stream itself.
+        """
+        assert self.callback, 'Callback must be specified'
+        self._thread = threading.Thread(target=self._run, name='firebase-stream')
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def close(self):
+        """
+        Stops listening and closes the underlying connection.
+        """
+        self._closed.set()
+        response = self._response
+        if response is not None:
+            response.close()
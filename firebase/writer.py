@@ -0,0 +1,212 @@
+import random
+import threading
+import time
+import weakref
+
+from .batch import WriteBatch
+
+__all__ = ['BufferedWriter', 'BufferFull', 'generate_push_id', 'buffered_writers']
+
+PUSH_CHARS = '-0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz'
+
+_push_id_lock = threading.Lock()
+_last_push_time = 0
+_last_random_chars = []
+
+
+def generate_push_id():
+    """
+    Generates a chronologically ordered unique key in the format of the keys
+    Firebase creates for POST requests: 8 characters of timestamp followed
+    by 12 random characters, incremented when several keys are generated
+    within the same millisecond.
+    """
+    global _last_push_time, _last_random_chars
+    with _push_id_lock:
+        now = int(time.time() * 1000)
+        if now == _last_push_time:
+            index = 11
+            while index >= 0 and _last_random_chars[index] == 63:
+                _last_random_chars[index] = 0
+                index -= 1
+            if index >= 0:
+                _last_random_chars[index] += 1
+        else:
+            _last_random_chars = [random.randint(0, 63) for _ in range(12)]
+        _last_push_time = now
+        random_chars = list(_last_random_chars)
+    timestamp_chars = []
+    for _ in range(8):
+        timestamp_chars.append(PUSH_CHARS[now % 64])
+        now //= 64
+    return ''.join(reversed(timestamp_chars)) + ''.join(PUSH_CHARS[c] for c in random_chars)
+
+
+class BufferFull(Exception):
+    """
+    Raised when a write cannot be queued because the buffer stays full for
+    longer than the writer's ``block_timeout``.
+    """
+
+
+buffered_writers = weakref.WeakSet()
+
+
+class BufferedWriter(object):
+    """
+    Class that queues writes in memory and sends them in the background as
+    multi-location PATCH requests. Patches to the same path are merged and
+    POSTs are turned into writes under client-generated push keys, so many
+    small writes cost few requests.
+
+    The buffer is flushed when it holds ``max_count`` writes or ``max_bytes``
+    of encoded data, or ``flush_interval`` seconds after the first queued
+    write. At most ``max_pending_bytes`` of data are kept in memory; beyond
+    that the writers block until a flush frees some room, and `BufferFull`
+    is raised if that takes longer than ``block_timeout`` seconds.
+
+    Failed flushes are reported to ``error_callback``, their writes are
+    dropped. Open writers are flushed and closed when the interpreter exits.
+
+    writer = firebase.buffered_writer(flush_interval=0.5)
+    writer.post('/events', {'type': 'click'})
+    writer.patch('/counters', {'clicks': 10})
+    writer.close()
+    """
+    def __init__(self, application, max_count=500, max_bytes=256 * 1024,
+                 flush_interval=1.0, max_pending_bytes=16 * 1024 * 1024,
+                 block_timeout=None, error_callback=None):
+        self.application = application
+        self.max_count = max_count
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self.max_pending_bytes = max_pending_bytes
+        self.block_timeout = block_timeout
+        self.error_callback = error_callback
+        self.closed = False
+        self._batch = self._new_batch()
+        self._batch_bytes = 0
+        self._batch_started = None
+        self._pending_bytes = 0
+        self._flush_lock = threading.Lock()
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name='firebase-writer')
+        self._thread.daemon = True
+        self._thread.start()
+        buffered_writers.add(self)
+
+    def _new_batch(self):
+        return WriteBatch(self.application, max_bytes=self.max_bytes)
+
+    def _queue(self, operation, path, data):
+        size = len(path) + len(self.application._encode_data(data))
+        with self._condition:
+            if self.closed:
+                raise ValueError('Write to a closed BufferedWriter')
+            deadline = None
+            if self.block_timeout is not None:
+                deadline = time.time() + self.block_timeout
+            while (self._pending_bytes and
+                   self._pending_bytes + size > self.max_pending_bytes):
+                timeout = None if deadline is None else deadline - time.time()
+                if timeout is not None and timeout <= 0:
+                    raise BufferFull('%d bytes are waiting to be written'
+                                     % self._pending_bytes)
+                self._condition.wait(timeout)
+            operation(self._batch, path, data)
+            self._batch_bytes += size
+            self._pending_bytes += size
+            if self._batch_started is None:
+                # Wake the flushing thread up to start the interval timer.
+                self._batch_started = time.time()
+                self._condition.notify_all()
+            elif (len(self._batch) >= self.max_count or
+                    self._batch_bytes >= self.max_bytes):
+                self._condition.notify_all()
+
+    def put(self, url, name, data):
+        """
+        Queues a write of ``data`` to ``url/name``.
+        """
+        self._queue(WriteBatch.set, '%s/%s' % (url, name), data)
+
+    def patch(self, url, data):
+        """
+        Queues an update of the given children of ``url``. It is merged with
+        the other queued writes to the same path.
+        """
+        self._queue(WriteBatch.update, url, data)
+
+    def post(self, url, data):
+        """
+        Queues the creation of a new child of ``url`` and returns its key.
+        """
+        name = generate_push_id()
+        self._queue(WriteBatch.set, '%s/%s' % (url, name), data)
+        return name
+
+    def delete(self, url, name):
+        """
+        Queues the removal of ``url/name``.
+        """
+        self._queue(WriteBatch.set, '%s/%s' % (url, name), None)
+
+    def _due(self):
+        if not len(self._batch):
+            return False
+        return (self.closed or len(self._batch) >= self.max_count or
+                self._batch_bytes >= self.max_bytes or
+                time.time() - self._batch_started >= self.flush_interval)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._due():
+                    if self.closed:
+                        return
+                    timeout = None
+                    if self._batch_started is not None:
+                        timeout = max(0, self._batch_started + self.flush_interval
+                                      - time.time())
+                    self._condition.wait(timeout)
+            self.flush()
+
+    def flush(self):
+        """
+        Sends the queued writes and waits for the requests to finish.
+        """
+        with self._flush_lock:
+            with self._condition:
+                batch, size = self._batch, self._batch_bytes
+                self._batch = self._new_batch()
+                self._batch_bytes = 0
+                self._batch_started = None
+            try:
+                if len(batch):
+                    batch.commit()
+            except Exception as exception:
+                if self.error_callback is not None:
+                    self.error_callback(exception)
+            finally:
+                with self._condition:
+                    self._pending_bytes -= size
+                    self._condition.notify_all()
+
+    def close(self):
+        """
+        Flushes the queued writes and stops the background thread.
+        """
+        with self._condition:
+            if self.closed:
+                return
+            self.closed = True
+            self._condition.notify_all()
+        self._thread.join()
+        self.flush()
+        buffered_writers.discard(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -35,5 +35,6 @@ setup(name='python-firebase',
       packages=['firebase'],
       test_suite='tests.all_tests',
       install_requires=['requests>=1.1.0'],
+      extras_require={'async': ['aiohttp>=3.0'], 'orjson': ['orjson>=3.0']},
       zip_safe=False,
 )
@@ -1,11 +1,44 @@
 import unittest
 
-from .jsonutil_test import JSONTestCase
+from .jsonutil_test import JSONTestCase, JSONCodecTestCase, JSONItemsDecoderTestCase
 from .firebase_test import FirebaseTestCase
+from .connection_test import ConnectionPoolTestCase
+from .aio_test import AsyncFirebaseTestCase
+from .stream_test import SSEParserTestCase, EventStreamTestCase
+from .mirror_test import LocalMirrorTestCase
+from .cache_test import ResponseCacheTestCase
+from .batch_test import WriteBatchTestCase
+from .writer_test import BufferedWriterTestCase
+from .retry_test import RetryPolicyTestCase
+from .query_test import QueryTestCase
+from .metrics_test import MetricsTestCase
+from .ratelimit_test import RateLimiterTestCase
+from .coalesce_test import SingleFlightTestCase
+from .spool_test import WriteSpoolTestCase
+from .cli_test import CommandLineTestCase
+from .reference_test import ReferenceTestCase
 
 
 def all_tests():
     suite = unittest.TestSuite()
     suite.addTest(unittest.makeSuite(JSONTestCase))
+    suite.addTest(unittest.makeSuite(JSONCodecTestCase))
+    suite.addTest(unittest.makeSuite(JSONItemsDecoderTestCase))
     suite.addTest(unittest.makeSuite(FirebaseTestCase))
+    suite.addTest(unittest.makeSuite(ConnectionPoolTestCase))
+    suite.addTest(unittest.makeSuite(AsyncFirebaseTestCase))
+    suite.addTest(unittest.makeSuite(SSEParserTestCase))
+    suite.addTest(unittest.makeSuite(EventStreamTestCase))
+    suite.addTest(unittest.makeSuite(LocalMirrorTestCase))
+    suite.addTest(unittest.makeSuite(ResponseCacheTestCase))
+    suite.addTest(unittest.makeSuite(WriteBatchTestCase))
+    suite.addTest(unittest.makeSuite(BufferedWriterTestCase))
+    suite.addTest(unittest.makeSuite(RetryPolicyTestCase))
+    suite.addTest(unittest.makeSuite(QueryTestCase))
+    suite.addTest(unittest.makeSuite(MetricsTestCase))
+    suite.addTest(unittest.makeSuite(RateLimiterTestCase))
+    suite.addTest(unittest.makeSuite(SingleFlightTestCase))
+    suite.addTest(unittest.makeSuite(WriteSpoolTestCase))
+    suite.addTest(unittest.makeSuite(CommandLineTestCase))
+    suite.addTest(unittest.makeSuite(ReferenceTestCase))
     return suite
@@ -0,0 +1,95 @@
+import asyncio
+import json
+import unittest
+
+from firebase.aio import AsyncFirebaseApplication
+from firebase.firebase import FirebaseAuthentication
+
+
+class MockAsyncResponse(object):
+    def __init__(self, status, content, headers=None):
+        self.status = status
+        self.content = content
+        self.headers = headers or {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+    async def read(self):
+        return self.content
+
+    def raise_for_status(self):
+        raise Exception('Fake HTTP Error')
+
+
+class MockAsyncConnection(object):
+    def __init__(self, response):
+        self.response = response
+        self.requests = []
+
+    def request(self, method, url, **kwargs):
+        self.requests.append((method, url, kwargs))
+        return self.response
+
+
+class AsyncFirebaseTestCase(unittest.TestCase):
+    def setUp(self):
+        self.DSN = 'https://firebase.localhost'
+        authentication = FirebaseAuthentication('FAKE_FIREBASE_SECRET',
+                                                'python-firebase@firebase.com')
+        self.firebase = AsyncFirebaseApplication(self.DSN, authentication)
+
+    def run_coroutine(self, coroutine):
+        return asyncio.run(coroutine)
+
+    def test_get(self):
+        content = json.dumps({'1': 'John Doe'}).encode('utf-8')
+        connection = MockAsyncConnection(MockAsyncResponse(200, content))
+        result = self.run_coroutine(self.firebase.get('/users', None,
+                                                      connection=connection))
+        self.assertEqual(result, {'1': 'John Doe'})
+        method, url, kwargs = connection.requests[0]
+        self.assertEqual(method, 'GET')
+        self.assertEqual(url, self.DSN + '/users/.json')
+        self.assertTrue('auth_token' in kwargs['params'])
+
+    def test_put(self):
+        content = json.dumps({'error': 'Permission required.'}).encode('utf-8')
+        connection = MockAsyncConnection(MockAsyncResponse(403, content))
+        result = self.run_coroutine(self.firebase.put('/users', '1', {'a': 1},
+                                                      connection=connection))
+        self.assertEqual(result, {'error': 'Permission required.'})
+        method, url, kwargs = connection.requests[0]
+        self.assertEqual(method, 'PUT')
+        self.assertEqual(json.loads(kwargs['data']), {'a': 1})
+
+    def test_delete_without_content(self):
+        connection = MockAsyncConnection(MockAsyncResponse(200, b''))
+        result = self.run_coroutine(self.firebase.delete('/users', '1',
+                                                         connection=connection))
+        self.assertEqual(result, None)
+
+    def test_error_status(self):
+        connection = MockAsyncConnection(MockAsyncResponse(500, b''))
+        with self.assertRaises(Exception):
+            self.run_coroutine(self.firebase.patch('/users', {},
+                                                   connection=connection))
+
+    def test_write_response_modes(self):
+        response = MockAsyncResponse(204, b'', {'ETag': 'abc='})
+        connection = MockAsyncConnection(response)
+        result = self.run_coroutine(self.firebase.put('/users', '1', {'a': 1},
+                                                      connection=connection,
+                                                      response_mode='etag'))
+        self.assertEqual(result, 'abc=')
+        method, url, kwargs = connection.requests[0]
+        self.assertEqual(kwargs['params']['print'], 'silent')
+        self.assertEqual(kwargs['headers']['X-Firebase-ETag'], 'true')
+        response.status, response.content = 200, b'{"a": 1}'
+        result = self.run_coroutine(self.firebase.patch('/users/1', {'a': 1},
+                                                        connection=connection,
+                                                        response_mode='silent'))
+        self.assertEqual(result, None)
@@ -0,0 +1,88 @@
+import json
+import unittest
+
+from firebase.batch import raise_for_denied
+from firebase.firebase import FirebaseApplication, WriteRejected
+
+from .firebase_test import MockResponse
+
+
+class MockPatchConnection(object):
+    def __init__(self, status_code=200):
+        self.status_code = status_code
+        self.patches = []
+        self.headers = {}
+
+    def patch(self, url, data, params, headers, *args, **kwargs):
+        self.patches.append((url, json.loads(data)))
+        if self.status_code == 403:
+            return MockResponse(403, json.dumps({'error': 'Permission denied'}))
+        return MockResponse(self.status_code, '' if params.get('print') == 'silent' else data)
+
+
+class WriteBatchTestCase(unittest.TestCase):
+    def setUp(self):
+        self.connection = MockPatchConnection()
+        self.firebase = FirebaseApplication('https://firebase.localhost')
+        self.firebase._get_connection = lambda connection=None: self.connection
+
+    def test_coalescing(self):
+        with self.firebase.batch() as batch:
+            batch.set('/users/1/name', 'John')
+            batch.set('/users/1/age', 30)
+            batch.set('/users/1', {'name': 'Johnny'})
+            batch.update('/users/1', {'age': 31, 'tags/a': True})
+            batch.delete('/users/1/name')
+            batch.set('/users/2/name', 'Jane')
+            batch.delete('/users/3')
+        self.assertEqual(len(batch), 0)
+        self.assertEqual(self.connection.patches, [(
+            'https://firebase.localhost/.json',
+            {'users/1': {'age': 31, 'tags': {'a': True}},
+             'users/2/name': 'Jane',
+             'users/3': None})])
+
+    def test_later_write_overrides_descendants(self):
+        batch = self.firebase.batch()
+        batch.set('/a/b/c', 1).set('/a/d', 2).set('/a', 3)
+        self.assertEqual(batch.chunks(), [{'a': 3}])
+        self.assertEqual(batch._descendants, {(): 1})
+
+    def test_chunking(self):
+        batch = self.firebase.batch(max_bytes=40)
+        for index in range(6):
+            batch.set('/items/%d' % index, 'x' * 5)
+        chunks = batch.chunks()
+        self.assertTrue(len(chunks) > 1)
+        self.assertEqual(sum(len(chunk) for chunk in chunks), 6)
+        for chunk in chunks:
+            self.assertTrue(len(json.dumps(chunk)) <= 40)
+        batch.commit()
+        self.assertEqual(len(self.connection.patches), len(chunks))
+
+    def test_no_commit_on_error(self):
+        try:
+            with self.firebase.batch() as batch:
+                batch.set('/a', 1)
+                raise ValueError()
+        except ValueError:
+            pass
+        self.assertEqual(self.connection.patches, [])
+        self.assertEqual(len(batch), 1)
+
+    def test_rejected_write(self):
+        self.connection.status_code = 403
+        batch = self.firebase.batch()
+        batch.set('/a', 1)
+        try:
+            batch.commit()
+        except WriteRejected as exception:
+            self.assertEqual(exception.error, {'error': 'Permission denied'})
+        else:
+            self.fail('WriteRejected not raised')
+        self.assertEqual(len(batch), 1)
+
+    def test_raise_for_denied(self):
+        self.assertRaises(WriteRejected, raise_for_denied, {'error': 'Permission denied'})
+        for value in (None, 1, {'error': True}, {'error': 'x', 'other': 'y'}):
+            self.assertEqual(raise_for_denied(value), value)
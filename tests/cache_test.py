@@ -0,0 +1,134 @@
+import json
+import unittest
+
+from firebase.cache import ResponseCache, endpoint_segments
+from firebase.firebase import FirebaseApplication
+
+from .firebase_test import MockConnectionPool, MockResponse
+
+
+class MockSequenceConnection(object):
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+        self.headers = {}
+
+    def _respond(self, method, url, headers):
+        self.requests.append((method, url, dict(headers)))
+        return self.responses.pop(0)
+
+    def get(self, url, params, headers, *args, **kwargs):
+        return self._respond('get', url, headers)
+
+    def put(self, url, data, params, headers, *args, **kwargs):
+        return self._respond('put', url, headers)
+
+    def delete(self, url, params, headers, *args, **kwargs):
+        return self._respond('delete', url, headers)
+
+
+class ResponseCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.DSN = 'https://firebase.localhost'
+        self.cache = ResponseCache(max_bytes=100, default_ttl=60,
+                                   ttls={'/volatile': 0})
+
+    def application(self, responses):
+        self.connection = MockSequenceConnection(responses)
+        return FirebaseApplication(self.DSN, None,
+                                   MockConnectionPool(self.connection),
+                                   cache=self.cache)
+
+    def test_endpoint_segments(self):
+        self.assertEqual(endpoint_segments(self.DSN + '/users/1.json'), ('users', '1'))
+        self.assertEqual(endpoint_segments(self.DSN + '/.json'), ())
+
+    def test_hit_returns_copy(self):
+        firebase = self.application([MockResponse(200, json.dumps({'a': [1]}))])
+        result = firebase.get('/users', '1')
+        result['a'].append(2)
+        self.assertEqual(firebase.get('/users', '1'), {'a': [1]})
+        self.assertEqual(len(self.connection.requests), 1)
+        self.assertEqual(self.connection.requests[0][2]['X-Firebase-ETag'], 'true')
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_params_are_part_of_the_key(self):
+        firebase = self.application([MockResponse(200, '1'), MockResponse(200, '2')])
+        self.assertEqual(firebase.get('/users', None, {'shallow': 'true'}), 1)
+        self.assertEqual(firebase.get('/users', None), 2)
+
+    def test_revalidation(self):
+        firebase = self.application([
+            MockResponse(200, '"v1"', {'ETag': 'etag-1'}),
+            MockResponse(304, '', {'ETag': 'etag-1'}),
+        ])
+        self.assertEqual(firebase.get('/volatile', None), 'v1')
+        self.assertEqual(firebase.get('/volatile', None), 'v1')
+        self.assertEqual(self.connection.requests[1][2]['if-none-match'], 'etag-1')
+        self.assertEqual(self.cache.revalidations, 1)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_write_invalidates_ancestors_and_descendants(self):
+        firebase = self.application([
+            MockResponse(200, '1'), MockResponse(200, '2'), MockResponse(200, '3'),
+            MockResponse(200, 'null'),
+        ])
+        firebase.get('/users', None)
+        firebase.get('/users/1/name', None)
+        firebase.get('/config', None)
+        self.assertEqual(len(self.cache), 3)
+        firebase.put('/users', '1', 'John')
+        self.assertEqual(len(self.cache), 1)
+
+    def test_lru_eviction_by_bytes(self):
+        self.cache.store('a', ('a',), 'a', size=60)
+        self.cache.store('b', ('b',), 'b', size=30)
+        self.cache.lookup('a')
+        self.cache.store('c', ('c',), 'c', size=30)
+        self.assertEqual(self.cache.lookup('b'), (None, False))
+        self.assertTrue(self.cache.lookup('a')[1])
+        self.assertEqual(self.cache.size, 90)
+        self.cache.store('d', ('d',), 'd', size=200)
+        self.assertEqual(self.cache.lookup('d'), (None, False))
+
+    def test_errors_are_not_stored(self):
+        firebase = self.application([
+            MockResponse(403, json.dumps({'error': 'Permission denied'})),
+            MockResponse(200, '"v1"'),
+        ])
+        self.assertEqual(firebase.get('/users', None), {'error': 'Permission denied'})
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(firebase.get('/users', None), 'v1')
+
+    def test_write_during_request(self):
+        generation = self.cache.generation
+        self.cache.invalidate(('users', '1'))
+        self.cache.store('a', ('users',), 'stale', generation=generation)
+        self.cache.store('b', ('config',), 'fresh', generation=generation)
+        self.assertEqual(self.cache.lookup('a'), (None, False))
+        self.assertTrue(self.cache.lookup('b')[1])
+        for index in range(ResponseCache.MAX_INVALIDATIONS):
+            self.cache.invalidate(('logs', str(index)))
+        self.cache.store('c', ('config',), 'unknown', generation=generation)
+        self.assertEqual(self.cache.lookup('c'), (None, False))
+
+    def test_oversized_value_drops_entry(self):
+        self.cache.store('a', ('a',), 'a', size=60)
+        self.cache.store('a', ('a',), 'aa', size=200)
+        self.assertEqual(self.cache.lookup('a'), (None, False))
+        self.assertEqual(self.cache.size, 0)
+
+    def test_invalidate_index(self):
+        for segments in [(), ('users',), ('users', '1'), ('users', '1', 'name'),
+                         ('users', '2'), ('config',)]:
+            self.cache.store(segments, segments, 'x', size=1)
+        self.cache.invalidate(('users', '1'))
+        self.assertEqual(sorted(self.cache._entries), [('config',), ('users', '2')])
+        self.cache.store(('users',), ('users',), 'x', size=1)
+        self.cache.invalidate(('users', '3', 'name'))
+        self.assertEqual(sorted(self.cache._entries), [('config',), ('users', '2')])
+        self.cache.invalidate(('users',))
+        self.assertEqual(list(self.cache._entries), [('config',)])
+        self.cache.invalidate(('config',))
+        self.assertEqual(self.cache.size, 0)
+        self.assertEqual(self.cache._index.children, {})
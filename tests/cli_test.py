@@ -0,0 +1,148 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from firebase.cli import export_tree, import_tree, main
+from firebase.firebase import FirebaseApplication, WriteRejected
+from firebase.query import key_order
+
+from .firebase_test import MockConnectionPool, MockResponse
+
+
+class MockDatabaseConnection(object):
+    """
+    Connection that serves the children of ``/items`` from a dict and
+    answers shallow and key range requests.
+    """
+    def __init__(self, items=None, fail_after=None, denied=(), denied_reads=()):
+        self.items = dict(items or {})
+        self.fail_after = fail_after
+        self.denied = denied
+        self.denied_reads = denied_reads
+        self.requests = []
+        self.timeout = 60
+        self.headers = {}
+        self.lock = threading.Lock()
+
+    def get(self, url, params, headers, *args, **kwargs):
+        self.requests.append(('get', url, dict(params)))
+        if self.fail_after is not None and len(self.requests) > self.fail_after:
+            raise IOError('Connection reset')
+        if url.endswith('/items/.json'):
+            if ('shallow' if params.get('shallow') else 'page') in self.denied_reads:
+                return MockResponse(403, json.dumps({'error': 'Permission denied'}))
+            if params.get('shallow'):
+                return MockResponse(200, json.dumps(dict.fromkeys(self.items, True)))
+            start = key_order(json.loads(params['startAt']))
+            end = key_order(json.loads(params['endAt']))
+            return MockResponse(200, json.dumps(dict(
+                (key, value) for key, value in self.items.items()
+                if start <= key_order(key) <= end)))
+        key = url.split('/')[-1][:-len('.json')]
+        return MockResponse(200, json.dumps(self.items.get(key)))
+
+    def patch(self, url, data, params, headers, *args, **kwargs):
+        update = json.loads(data)
+        with self.lock:
+            self.requests.append(('patch', url, dict(params)))
+            if any(key in self.denied for key in update):
+                return MockResponse(403, json.dumps({'error': 'Permission denied'}))
+            self.items.update(update)
+        return MockResponse(200, '' if params.get('print') == 'silent' else data)
+
+
+class CommandLineTestCase(unittest.TestCase):
+    def setUp(self):
+        self.DSN = 'https://firebase.localhost'
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.items = dict(('%d' % index if index % 2 else 'item%03d' % index,
+                           {'index': index}) for index in range(25))
+
+    def application(self, connection):
+        return FirebaseApplication(self.DSN, None, MockConnectionPool(connection),
+                                   max_workers=4)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def test_export(self):
+        connection = MockDatabaseConnection(self.items)
+        output = io.BytesIO()
+        count = export_tree(self.application(connection), '/items', output,
+                            page_size=10, concurrency=2)
+        self.assertEqual(count, 25)
+        lines = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual([line['key'] for line in lines], sorted(self.items, key=key_order))
+        self.assertEqual(dict((line['key'], line['value']) for line in lines), self.items)
+        self.assertEqual(len(connection.requests), 4)
+
+        output = io.BytesIO()
+        export_tree(self.application(connection), '/items', output, format='json',
+                    page_size=10)
+        self.assertEqual(json.loads(output.getvalue()), self.items)
+
+    def test_resumed_export(self):
+        checkpoint = self.path('export.checkpoint')
+        output = io.BytesIO()
+        connection = MockDatabaseConnection(self.items, fail_after=2)
+        self.assertRaises(IOError, export_tree, self.application(connection), '/items',
+                          output, page_size=10, concurrency=1, checkpoint=checkpoint)
+        self.assertEqual(len(output.getvalue().splitlines()), 10)
+        connection = MockDatabaseConnection(self.items)
+        export_tree(self.application(connection), '/items', output, page_size=10,
+                    checkpoint=checkpoint)
+        lines = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual([line['key'] for line in lines], sorted(self.items, key=key_order))
+        self.assertRaises(ValueError, export_tree, self.application(connection), '/items',
+                          io.BytesIO(), format='json', checkpoint=checkpoint)
+
+    def test_import(self):
+        lines = [json.dumps({'key': key, 'value': value}).encode('utf-8') + b'\n'
+                 for key, value in self.items.items()]
+        checkpoint = self.path('import.checkpoint')
+        connection = MockDatabaseConnection()
+        count = import_tree(self.application(connection), '/items', lines + [b'\n'],
+                            chunk_size=10, concurrency=2, checkpoint=checkpoint)
+        self.assertEqual(count, 25)
+        self.assertEqual(connection.items, self.items)
+        self.assertEqual(len(connection.requests), 3)
+        with open(checkpoint) as checkpoint_file:
+            self.assertEqual(checkpoint_file.read(), '26\n')
+        connection = MockDatabaseConnection()
+        self.assertEqual(import_tree(self.application(connection), '/items', lines,
+                                     checkpoint=checkpoint), 0)
+        self.assertEqual(connection.requests, [])
+
+    def test_rejected_import(self):
+        lines = [json.dumps({'key': key, 'value': index}).encode('utf-8') + b'\n'
+                 for index, key in enumerate(['a', 'b', 'c', 'd'])]
+        checkpoint = self.path('import.checkpoint')
+        connection = MockDatabaseConnection(denied=['c'])
+        self.assertRaises(WriteRejected, import_tree, self.application(connection),
+                          '/items', lines, chunk_size=1, concurrency=1,
+                          checkpoint=checkpoint)
+        self.assertEqual(connection.items, {'a': 0, 'b': 1})
+        with open(checkpoint) as checkpoint_file:
+            self.assertEqual(checkpoint_file.read(), '2\n')
+
+    def test_rejected_export(self):
+        for denied_reads in (['shallow'], ['page']):
+            connection = MockDatabaseConnection(self.items, denied_reads=denied_reads)
+            output = io.BytesIO()
+            self.assertRaises(WriteRejected, export_tree, self.application(connection),
+                              '/items', output)
+            self.assertFalse(b'error' in output.getvalue())
+
+    def test_main(self):
+        source = self.path('items.ndjson')
+        with open(source, 'w') as source_file:
+            source_file.write('{"key": "a", "value": 1}\n')
+        self.assertRaises(SystemExit, main, ['import', self.DSN, '/items'])
+        # Nothing listens on this port, the request fails without retries.
+        self.assertRaises(Exception, main, ['import', 'https://127.0.0.1:9', '/items',
+                                            source, '--retries', '0', '--quiet'])
@@ -0,0 +1,211 @@
+import asyncio
+import json
+import threading
+import time
+import unittest
+
+from firebase.aio import AsyncFirebaseApplication
+from firebase.coalesce import AsyncSingleFlight, SingleFlight, request_key
+from firebase.firebase import FirebaseApplication
+
+from .firebase_test import MockConnectionPool, MockResponse
+
+
+class MockCountingConnection(object):
+    def __init__(self, content, delay=0.05):
+        self.content = content
+        self.delay = delay
+        self.timeout = 60
+        self.headers = {}
+        self.requests = []
+
+    def get(self, url, *args, **kwargs):
+        self.requests.append(url)
+        time.sleep(self.delay)
+        if isinstance(self.content, Exception):
+            raise self.content
+        return MockResponse(200, json.dumps(self.content))
+
+    def put(self, url, *args, **kwargs):
+        return MockResponse(200, 'null')
+
+
+class MockAsyncCountingConnection(object):
+    def __init__(self, content, delay=0.05):
+        self.content = content
+        self.delay = delay
+        self.requests = []
+
+    def request(self, method, url, **kwargs):
+        self.requests.append(url)
+        return MockAsyncDelayedResponse(json.dumps(self.content).encode('utf-8'),
+                                        self.delay)
+
+
+class MockAsyncDelayedResponse(object):
+    status = 200
+    headers = {}
+
+    def __init__(self, content, delay):
+        self.content = content
+        self.delay = delay
+
+    async def __aenter__(self):
+        await asyncio.sleep(self.delay)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+    async def read(self):
+        return self.content
+
+
+class SingleFlightTestCase(unittest.TestCase):
+    def setUp(self):
+        self.DSN = 'https://firebase.localhost'
+
+    def application(self, content, **kwargs):
+        self.connection = MockCountingConnection(content)
+        return FirebaseApplication(self.DSN, None, MockConnectionPool(self.connection),
+                                   coalesce=True, max_workers=10, **kwargs)
+
+    def run_threads(self, function, count=10):
+        results = [None] * count
+
+        def run(index):
+            try:
+                results[index] = function()
+            except Exception as exception:
+                results[index] = exception
+        threads = [threading.Thread(target=run, args=(index,)) for index in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_request_key(self):
+        self.assertEqual(request_key('/a', {'b': 1, 'a': 2}, {}),
+                         request_key('/a', {'a': 2, 'b': 1}, {}))
+        self.assertNotEqual(request_key('/a', {}, {}), request_key('/a', {}, {'x': 'y'}))
+
+    def test_concurrent_gets_share_a_request(self):
+        firebase = self.application({'name': ['Jane']})
+        results = self.run_threads(lambda: firebase.get('/users', '1'))
+        self.assertEqual(len(self.connection.requests), 1)
+        self.assertEqual(firebase.flights.shared, 9)
+        self.assertEqual(results, [{'name': ['Jane']}] * 10)
+        results[0]['name'].append('John')
+        self.assertEqual(results[1], {'name': ['Jane']})
+        self.assertEqual(len(set(id(result) for result in results)), 10)
+        firebase.get('/users', '1')
+        self.assertEqual(len(self.connection.requests), 2)
+
+    def test_different_params_are_not_shared(self):
+        firebase = self.application(1)
+        self.run_threads(lambda: firebase.get('/users', None, {'shallow': 'true'}), 3)
+        self.run_threads(lambda: firebase.get('/users', None), 3)
+        self.assertEqual(len(self.connection.requests), 2)
+
+    def test_errors_are_shared(self):
+        firebase = self.application(IOError('Connection reset'))
+        results = self.run_threads(lambda: firebase.get('/users', '1'), 5)
+        self.assertEqual(len(self.connection.requests), 1)
+        self.assertTrue(all(isinstance(result, IOError) for result in results))
+
+    def test_write_detaches_flight(self):
+        flights = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow():
+            started.set()
+            release.wait()
+            return 'old'
+        key = request_key(self.DSN + '/users/1.json', {}, {})
+        thread = threading.Thread(target=flights.do, args=(key, slow))
+        thread.start()
+        started.wait()
+        flights.forget(('users',))
+        self.assertEqual(flights.do(key, lambda: 'new'), 'new')
+        release.set()
+        thread.join()
+
+    def test_interrupted_leader(self):
+        flights = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        results = []
+        key = request_key(self.DSN + '/users/1.json', {}, {})
+
+        def interrupted():
+            started.set()
+            release.wait()
+            raise KeyboardInterrupt()
+
+        def leader():
+            try:
+                flights.do(key, interrupted)
+            except KeyboardInterrupt:
+                pass
+
+        def follower():
+            try:
+                flights.do(key, lambda: 'unused')
+            except BaseException as exception:
+                results.append(exception)
+        threads = [threading.Thread(target=leader)]
+        threads[0].start()
+        started.wait()
+        threads.append(threading.Thread(target=follower))
+        threads[1].start()
+        while not flights.shared:
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join(1)
+        self.assertFalse(threads[1].is_alive())
+        self.assertTrue(isinstance(results[0], KeyboardInterrupt))
+
+    def test_get_async(self):
+        firebase = self.application([1, 2])
+        results = []
+        futures = [firebase.get_async('/items', None, callback=results.append)
+                   for _ in range(5)]
+        values = [future.result() for future in futures]
+        firebase.close()
+        self.assertEqual(len(self.connection.requests), 1)
+        self.assertEqual(values, [[1, 2]] * 5)
+        self.assertEqual(len(set(id(value) for value in values)), 5)
+        self.assertEqual(len(results), 5)
+
+    def test_asyncio(self):
+        connection = MockAsyncCountingConnection({'a': [1]})
+        firebase = AsyncFirebaseApplication(self.DSN, coalesce=True)
+
+        async def run():
+            return await asyncio.gather(*[firebase.get('/users', '1', connection=connection)
+                                          for _ in range(10)])
+        results = asyncio.run(run())
+        self.assertEqual(len(connection.requests), 1)
+        self.assertEqual(results, [{'a': [1]}] * 10)
+        self.assertEqual(len(set(id(result) for result in results)), 10)
+
+    def test_asyncio_cancellation(self):
+        flights = AsyncSingleFlight()
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return 'value'
+
+        async def run():
+            first = asyncio.ensure_future(flights.do('key', fetch))
+            second = asyncio.ensure_future(flights.do('key', fetch))
+            await asyncio.sleep(0.01)
+            first.cancel()
+            return await second
+        self.assertEqual(asyncio.run(run()), 'value')
+        self.assertEqual(len(calls), 1)
@@ -0,0 +1,65 @@
+import unittest
+
+from firebase.connection import ConnectionPool
+from firebase.firebase import FirebaseApplication
+
+
+class MockPooledConnection(object):
+    is_connected = True
+
+    def __init__(self, closed):
+        self.closed = closed
+
+    def close(self):
+        self.closed.append(self)
+
+
+class ConnectionPoolTestCase(unittest.TestCase):
+    def setUp(self):
+        self.pool = ConnectionPool(timeout=10, pool_maxsize=4, pool_block=True)
+
+    def tearDown(self):
+        self.pool.close()
+
+    def test_connection_is_reused(self):
+        connection = self.pool.get_connection()
+        self.assertTrue(connection is self.pool.get_connection())
+        self.assertEqual(connection.timeout, 10)
+        self.assertEqual(connection.headers['Content-type'], 'application/json')
+
+    def test_adapter_configuration(self):
+        adapter = self.pool.get_connection().get_adapter('https://firebase.localhost')
+        self.assertEqual(adapter._pool_maxsize, 4)
+        self.assertTrue(adapter._pool_block)
+
+    def test_idle_timeout(self):
+        pool = ConnectionPool(idle_timeout=30)
+        self.addCleanup(pool.close)
+        session = pool.get_connection()
+        adapter = session.get_adapter('https://firebase.localhost')
+        url_pool = adapter.poolmanager.connection_from_url('https://firebase.localhost')
+        closed = []
+        connection = MockPooledConnection(closed)
+        # Frees a slot of the queue, which is filled with placeholders.
+        url_pool.pool.get(block=False)
+        url_pool._put_conn(connection)
+        self.assertTrue(url_pool._get_conn() is connection)
+        self.assertEqual(closed, [])
+        url_pool._put_conn(connection)
+        connection.idle_since -= 60
+        self.assertTrue(url_pool._get_conn() is connection)
+        self.assertEqual(closed, [connection])
+        # The shared session is kept.
+        self.assertTrue(pool.get_connection() is session)
+
+    def test_close(self):
+        connection = self.pool.get_connection()
+        self.pool.close()
+        self.assertFalse(connection is self.pool.get_connection())
+
+    def test_application_owns_pool(self):
+        with FirebaseApplication('https://firebase.localhost', None,
+                                 self.pool) as firebase:
+            connection = firebase._get_connection()
+            self.assertTrue(connection is firebase._get_connection())
+        self.assertTrue(self.pool._session is None)
@@ -2,10 +2,17 @@ import unittest
 import os
 import requests
 import json
+import base64
+import gzip
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
 
 from firebase.firebase import (FirebaseAuthentication, FirebaseApplication,
-                               make_get_request, make_post_request, make_put_request,
-                               make_patch_request, make_delete_request)
+                               TransactionConflict, WriteRejected, make_get_request, make_post_request,
+                               make_put_request, make_patch_request, make_delete_request)
+from firebase.retry import RetryPolicy
 
 
 class MockConnection(object):
@@ -29,10 +36,85 @@ class MockConnection(object):
         return self.response
 
 
+class RecordingConnection(MockConnection):
+    def __init__(self, response):
+        super(RecordingConnection, self).__init__(response)
+        self.requests = []
+
+    def _record(self, url, params, headers):
+        self.requests.append((url, params, headers))
+        return self.response
+
+    def put(self, url, data, params, headers, *args, **kwargs):
+        return self._record(url, params, headers)
+
+    def post(self, url, data, params, headers, *args, **kwargs):
+        return self._record(url, params, headers)
+
+    def patch(self, url, data, params, headers, *args, **kwargs):
+        return self._record(url, params, headers)
+
+    def delete(self, url, params, headers, *args, **kwargs):
+        return self._record(url, params, headers)
+
+
+class MockETagConnection(object):
+    """
+    Connection holding a single value whose ETag is its version. The value
+    is changed by another client before each of the first ``conflicts``
+    conditional writes.
+    """
+    def __init__(self, value, conflicts=0):
+        self.value = value
+        self.version = 0
+        self.conflicts = conflicts
+        self.requests = []
+        self.headers = {}
+
+    def _response(self, status_code):
+        return MockResponse(status_code, json.dumps(self.value),
+                            {'ETag': str(self.version)})
+
+    def get(self, url, params, headers, *args, **kwargs):
+        self.requests.append('get')
+        return self._response(200)
+
+    def put(self, url, data, params, headers, *args, **kwargs):
+        self.requests.append('put')
+        if self.conflicts:
+            self.conflicts -= 1
+            self.value, self.version = self.value + 10, self.version + 1
+        if headers['if-match'] != str(self.version):
+            return self._response(412)
+        self.value, self.version = json.loads(data), self.version + 1
+        return self._response(200)
+
+
+class LostResponseETagConnection(MockETagConnection):
+    """
+    Connection that applies the conditional writes but loses their responses.
+    """
+    def put(self, url, data, params, headers, *args, **kwargs):
+        super(LostResponseETagConnection, self).put(url, data, params, headers)
+        raise requests.ConnectionError('Connection reset')
+
+
+class MockConnectionPool(object):
+    def __init__(self, connection):
+        self.connection = connection
+
+    def get_connection(self):
+        return self.connection
+
+    def close(self):
+        pass
+
+
 class MockResponse(object):
-    def __init__(self, status_code, content):
+    def __init__(self, status_code, content, headers=None):
         self.status_code = status_code
         self.content = content
+        self.headers = headers or {}
 
     @property
     def ok(self):
@@ -47,6 +129,17 @@ class MockResponse(object):
         raise Exception('Fake HTTP Error')
 
 
+class MockStreamedResponse(MockResponse):
+    closed = False
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+    def close(self):
+        self.closed = True
+
+
 class FirebaseTestCase(unittest.TestCase):
     def setUp(self):
         self.SECRET = 'FAKE_FIREBASE_SECRET'
@@ -62,6 +155,31 @@ class FirebaseTestCase(unittest.TestCase):
         url2 = os.path.join(self.DSN, 'users/1/.json')
         self.assertEqual(self.firebase._build_endpoint_url('/users/1', None), url2)
 
+    def test_encode_body_compression(self):
+        data = {'text': 'x' * 2000}
+        headers = {}
+        self.assertEqual(self.firebase._encode_body(data, headers),
+                         (self.firebase._encode_data(data), headers))
+        firebase = FirebaseApplication(self.DSN, gzip_threshold=1024, gzip_level=9)
+        body, gzip_headers = firebase._encode_body(data, headers)
+        self.assertEqual(gzip_headers, {'Content-Encoding': 'gzip'})
+        self.assertEqual(headers, {})
+        self.assertTrue(len(body) < 100)
+        self.assertEqual(json.loads(gzip.decompress(body)), data)
+        self.assertEqual(firebase._encode_body({'text': 'short'}, headers)[1], {})
+
+    def test_reused_headers_not_marked_gzip(self):
+        connection = RecordingConnection(MockResponse(200, json.dumps({})))
+        firebase = FirebaseApplication(self.DSN, gzip_threshold=1024)
+        headers = {'X-Custom': 'yes'}
+        firebase.patch('/users', {'text': 'x' * 2000}, headers=headers,
+                       connection=connection)
+        firebase.patch('/users', {'text': 'short'}, headers=headers,
+                       connection=connection)
+        self.assertEqual(headers, {'X-Custom': 'yes'})
+        self.assertEqual(connection.requests[0][2].get('Content-Encoding'), 'gzip')
+        self.assertFalse('Content-Encoding' in connection.requests[1][2])
+
     def test_make_get_request(self):
         response = MockResponse(403, json.dumps({'error': 'Permission required.'}))
         connection = MockConnection(response)
@@ -96,3 +214,154 @@ class FirebaseTestCase(unittest.TestCase):
         result = self.firebase.delete('url', 'snapshot', params={}, headers={},
                                       connection=connection)
         self.assertEqual(result, json.loads(response.content))
+
+    def test_write_response_modes(self):
+        connection = RecordingConnection(MockResponse(204, b'', {'ETag': 'abc='}))
+        params = {'print': 'pretty'}
+        result = self.firebase.put('/users', '1', {'a': 1}, params=params,
+                                   connection=connection, response_mode='silent')
+        self.assertEqual(result, None)
+        self.assertEqual(connection.requests[-1][1]['print'], 'silent')
+        self.assertEqual(params['print'], 'pretty')
+        result = self.firebase.patch('/users', {'1': 1}, connection=connection,
+                                     response_mode='etag')
+        self.assertEqual(result, 'abc=')
+        self.assertEqual(connection.requests[-1][2]['X-Firebase-ETag'], 'true')
+        self.assertRaises(ValueError, self.firebase.delete, '/users', '1',
+                          connection=connection, response_mode='none')
+        connection = RecordingConnection(MockResponse(200, json.dumps({'a': 1})))
+        self.assertEqual(self.firebase.put('/users', '1', {'a': 1}, connection=connection),
+                         {'a': 1})
+        self.assertFalse('print' in connection.requests[-1][1])
+
+    def test_fire_and_forget(self):
+        connection = RecordingConnection(MockResponse(204, b''))
+        errors = []
+        with FirebaseApplication(self.DSN, None, MockConnectionPool(connection)) as firebase:
+            self.assertEqual(firebase.put_async('/users', '1', {'a': 1},
+                                                response_mode='none'), None)
+            future = firebase.post_async('/users', {'a': 1}, response_mode='silent')
+            self.assertEqual(future.result(), None)
+            connection.response = MockResponse(500, b'')
+            firebase.delete_async('/users', '1', error_callback=errors.append,
+                                  response_mode='none')
+        self.assertEqual([request[1]['print'] for request in connection.requests],
+                         ['silent'] * 3)
+        self.assertEqual(len(errors), 1)
+
+    def test_transaction(self):
+        connection = MockETagConnection(1, conflicts=2)
+        result = self.firebase.transaction('/counter', lambda value: value + 1,
+                                           connection=connection)
+        self.assertEqual(result, 22)
+        self.assertEqual(connection.value, 22)
+        self.assertEqual(connection.requests, ['get', 'put', 'put', 'put'])
+        connection = MockETagConnection(1, conflicts=5)
+        self.assertRaises(TransactionConflict, self.firebase.transaction, '/counter',
+                          lambda value: value + 1, max_retries=3, connection=connection)
+        self.assertEqual(connection.requests.count('put'), 4)
+
+    def test_transaction_is_not_retried(self):
+        firebase = FirebaseApplication(self.DSN, self.authentication,
+                                       retry_policy=RetryPolicy(backoff=0.001))
+        connection = LostResponseETagConnection(1)
+        self.assertRaises(requests.ConnectionError, firebase.transaction, '/counter',
+                          lambda value: value + 1, connection=connection)
+        self.assertEqual(connection.value, 2)
+        self.assertEqual(connection.requests, ['get', 'put'])
+
+    def test_transaction_errors(self):
+        connection = MockConnection(MockResponse(200, '1'))
+        self.assertRaises(ValueError, self.firebase.transaction, '/counter',
+                          lambda value: value + 1, connection=connection)
+        connection = MockConnection(MockResponse(403, '{"error": "Permission denied"}'))
+        updates = []
+        self.assertRaises(WriteRejected, self.firebase.transaction, '/counter',
+                          updates.append, connection=connection)
+        self.assertEqual(updates, [])
+
+    def test_get_iter(self):
+        data = {'1': {'name': 'John Doe'}, '2': {'name': 'Jane Doe'}}
+        response = MockStreamedResponse(200, json.dumps(data).encode('utf-8'))
+        connection = MockConnection(response)
+        items = self.firebase.get_iter('/users', None, connection=connection,
+                                       chunk_size=5)
+        self.assertEqual(list(items), list(data.items()))
+        self.assertTrue(response.closed)
+
+    def test_get_iter_error(self):
+        response = MockStreamedResponse(500, b'')
+        connection = MockConnection(response)
+        items = self.firebase.get_iter('/users', None, connection=connection)
+        self.assertRaises(Exception, list, items)
+        self.assertTrue(response.closed)
+
+    def test_get_async_returns_future(self):
+        response = MockResponse(200, json.dumps({'1': 'John Doe'}))
+        pool = MockConnectionPool(MockConnection(response))
+        results = []
+        with FirebaseApplication(self.DSN, None, pool, max_workers=2) as firebase:
+            future = firebase.get_async('/users', None, callback=results.append)
+            self.assertEqual(future.result(), {'1': 'John Doe'})
+            self.assertTrue(isinstance(firebase.executor, ThreadPoolExecutor))
+        self.assertEqual(results, [{'1': 'John Doe'}])
+
+    def test_async_error_callback(self):
+        pool = MockConnectionPool(MockConnection(MockResponse(500, '')))
+        errors = []
+        with FirebaseApplication(self.DSN, None, pool) as firebase:
+            futures = [firebase.put_async('/users', '1', {}, error_callback=errors.append),
+                       firebase.delete_async('/users', '1', error_callback=errors.append)]
+            wait(futures)
+        self.assertEqual(len(errors), 2)
+        self.assertRaises(Exception, futures[0].result)
+
+    def test_executor_backends(self):
+        firebase = FirebaseApplication(self.DSN, None, executor='process',
+                                       max_workers=2)
+        self.assertTrue(isinstance(firebase.executor, ProcessPoolExecutor))
+        firebase.close()
+        executor = ThreadPoolExecutor(max_workers=1)
+        firebase = FirebaseApplication(self.DSN, None, executor=executor)
+        self.assertTrue(firebase.executor is executor)
+        firebase.close()
+        executor.shutdown()
+        self.assertRaises(ValueError, lambda: FirebaseApplication(
+            self.DSN, None, executor='fork').executor)
+
+    def test_lightweight_import(self):
+        script = ('import sys\n'
+                  'from firebase import firebase\n'
+                  'firebase.FirebaseApplication("https://firebase.localhost").close()\n'
+                  'print(sorted(name for name in ("multiprocessing", "asyncio",\n'
+                  '      "firebase.multiprocess_pool") if name in sys.modules))\n')
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        output = subprocess.check_output([sys.executable, '-c', script], cwd=root)
+        self.assertEqual(output.decode('utf-8').strip(), '[]')
+
+    def test_authentication_token_is_cached(self):
+        user = self.authentication.get_user()
+        self.assertTrue(self.authentication.get_user() is user)
+        self.authentication.extra['id'] = 5
+        self.assertFalse(self.authentication.get_user() is user)
+        user = self.authentication.get_user()
+        self.authentication.invalidate()
+        self.assertFalse(self.authentication.get_user() is user)
+
+    def test_authentication_token_refresh(self):
+        authentication = FirebaseAuthentication(self.SECRET, self.EMAIL,
+                                                expires_in=60, refresh_margin=10)
+        user = authentication.get_user()
+        claims = user.firebase_auth_token.split('.')[1]
+        claims = json.loads(base64.urlsafe_b64decode(claims + '=' * (-len(claims) % 4)))
+        self.assertTrue(claims['exp'] > claims['iat'])
+        self.assertTrue(authentication.get_user() is user)
+        user, refresh_at, extra = authentication._token
+        authentication._token = user, refresh_at - 60, extra
+        self.assertFalse(authentication.get_user() is user)
+
+    def test_short_token_lifetime_is_cached(self):
+        authentication = FirebaseAuthentication(self.SECRET, self.EMAIL, expires_in=60)
+        user = authentication.get_user()
+        self.assertTrue(authentication.get_user() is user)
+        self.assertTrue(authentication._token[1] > time.time() + 20)
@@ -3,7 +3,8 @@ import datetime
 import decimal
 import json
 
-from firebase.jsonutil import JSONEncoder
+from firebase.jsonutil import (JSONEncoder, JSONItemsDecoder, JSONCodec, OrjsonCodec,
+                               create_codec, orjson)
 
 
 class JSONTestCase(unittest.TestCase):
@@ -35,3 +36,73 @@ class JSONTestCase(unittest.TestCase):
 
         self.assertEqual(total_seconds(delta), 1303506.74)
 
+
+class JSONCodecTestCase(unittest.TestCase):
+    def setUp(self):
+        self.data = {'now': datetime.datetime(2014, 3, 11, 10, 30, 5, 120),
+                     'oneday': datetime.timedelta(days=1),
+                     'five': decimal.Decimal('5.5'),
+                     'date': datetime.date(2014, 3, 11),
+                     'name': 'Jane \u00e7', 1: [True, None, 2 ** 70]}
+        self.expected = json.loads(json.dumps(self.data, cls=JSONEncoder))
+
+    def test_json_codec(self):
+        codec = JSONCodec()
+        encoded = codec.dumps(self.data)
+        self.assertNotIn(', ', encoded)
+        self.assertEqual(codec.loads(encoded), self.expected)
+        self.assertIn(', ', JSONCodec(compact=False).dumps(self.data))
+
+    @unittest.skipIf(orjson is None, 'orjson is not installed')
+    def test_orjson_codec(self):
+        codec = OrjsonCodec()
+        self.assertEqual(codec.loads(codec.dumps(self.data)), self.expected)
+        self.assertEqual(codec.loads(b'{"a": 1}'), {'a': 1})
+        self.assertRaises(TypeError, codec.dumps, object())
+        self.assertRaises(ValueError, codec.loads, '{"a": 1')
+
+    def test_create_codec(self):
+        self.assertEqual(create_codec('json').name, 'json')
+        self.assertEqual(create_codec().name, 'json' if orjson is None else 'orjson')
+        self.assertRaises(ValueError, create_codec, 'yaml')
+
+
+class JSONItemsDecoderTestCase(unittest.TestCase):
+    def decode(self, document, chunk_size, **kwargs):
+        decoder = JSONItemsDecoder(**kwargs)
+        items = []
+        for start in range(0, len(document), chunk_size):
+            items.extend(decoder.feed(document[start:start + chunk_size]))
+        items.extend(decoder.close())
+        return items
+
+    def test_object_members(self):
+        data = {'1': {'name': 'John "Doe"', 'tags': ['a', ']', '}']},
+                '2': {'name': 'Jane\\', 'age': 30.5}, '3': None, '4': [],
+                '\u00e7\u20ac': '\U0001f600', '5': -12}
+        document = json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+        for chunk_size in (1, 3, 7, len(document)):
+            for loads in (json.loads, lambda text: json.loads(text)):
+                items = self.decode(document, chunk_size, loads=loads)
+                self.assertEqual(items, list(data.items()))
+
+    def test_members_are_yielded_early(self):
+        decoder = JSONItemsDecoder()
+        self.assertEqual(decoder.feed(b'{"1": {"name": "John"}, "2": {"na'),
+                         [('1', {'name': 'John'})])
+        self.assertEqual(decoder.feed(b'me": "Jane"}, "3": 12'), [('2', {'name': 'Jane'})])
+        self.assertEqual(decoder.feed(b'34}'), [('3', 1234)])
+        self.assertEqual(list(decoder.close()), [])
+
+    def test_array_and_scalar_documents(self):
+        self.assertEqual(self.decode(b'[1, "a", {"b": [2]}]', 2),
+                         [(0, 1), (1, 'a'), (2, {'b': [2]})])
+        self.assertEqual(self.decode(b'{}', 1), [])
+        self.assertEqual(self.decode(b'[ ]', 1), [])
+        self.assertEqual(self.decode(b'"John Doe"', 3), [(None, 'John Doe')])
+        self.assertEqual(self.decode(b'null', 2), [])
+
+    def test_invalid_documents(self):
+        for document in (b'{"a": 1', b'{"a" 1}', b'[1, 2]x', b'{"a": 1 2}',
+                         b'[tru]', b'{"a": 1}}'):
+            self.assertRaises(ValueError, self.decode, document, 2)
@@ -0,0 +1,115 @@
+import asyncio
+import json
+import unittest
+
+from firebase.aio import AsyncFirebaseApplication
+from firebase.cache import ResponseCache
+from firebase.connection import ConnectionPool
+from firebase.firebase import FirebaseApplication, FirebaseAuthentication
+from firebase.metrics import Histogram, MetricsCollector, RequestHook, path_template
+from firebase.retry import RetryPolicy
+
+from .aio_test import MockAsyncConnection, MockAsyncResponse
+from .cache_test import MockSequenceConnection
+from .firebase_test import MockConnectionPool, MockResponse, MockStreamedResponse
+
+
+class HeaderHook(RequestHook):
+    def before_request(self, info):
+        info.headers['X-Trace-Id'] = 'trace'
+
+
+class MetricsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.DSN = 'https://firebase.localhost'
+        self.metrics = MetricsCollector(templates=['/users/*/name'])
+
+    def application(self, responses, **kwargs):
+        self.connection = MockSequenceConnection(responses)
+        return FirebaseApplication(self.DSN, kwargs.pop('authentication', None),
+                                   MockConnectionPool(self.connection),
+                                   hooks=[HeaderHook(), self.metrics], **kwargs)
+
+    def test_path_template(self):
+        self.assertEqual(path_template(self.DSN + '/users/42/name.json'), '/users/*/name')
+        self.assertEqual(path_template(self.DSN + '/users/-JhLeOlGIEjaIOFHR0xd/.json'),
+                         '/users/*')
+        self.assertEqual(path_template(self.DSN + '/.json'), '/')
+        self.assertEqual(path_template('/users/jane/name', ['/users/*/name']),
+                         '/users/*/name')
+        self.assertEqual(path_template('/users/jane/age', ['/users/*/name']),
+                         '/users/jane/age')
+
+    def test_histogram(self):
+        histogram = Histogram(bounds=(1, 2, 5))
+        for value in (0.5, 1.5, 1.5, 4, 9):
+            histogram.observe(value)
+        snapshot = histogram.snapshot()
+        self.assertEqual(snapshot['count'], 5)
+        self.assertEqual((snapshot['min'], snapshot['max']), (0.5, 9))
+        self.assertEqual(snapshot['buckets'], [[1, 1], [2, 2], [5, 1], [None, 1]])
+        self.assertEqual((snapshot['p50'], snapshot['p90'], snapshot['p99']), (2, 9, 9))
+        self.assertEqual(Histogram().snapshot()['p50'], None)
+
+    def test_request_metrics(self):
+        firebase = self.application([MockResponse(200, json.dumps('Jane')),
+                                     MockResponse(200, json.dumps('John')),
+                                     MockResponse(503, ''),
+                                     MockResponse(200, '{}')],
+                                    retry_policy=RetryPolicy(backoff=0.001))
+        firebase.get('/users/1', 'name')
+        firebase.get('/users/2', 'name')
+        firebase.put('/users', '3', {'name': 'Jack'})
+        self.assertEqual(self.connection.requests[0][2]['X-Trace-Id'], 'trace')
+        requests = self.metrics.snapshot()['requests']
+        self.assertEqual(sorted(requests), ['GET /users/*/name', 'PUT /users/*'])
+        get = requests['GET /users/*/name']
+        self.assertEqual((get['count'], get['errors'], get['statuses']), (2, 0, {200: 2}))
+        self.assertEqual(get['bytes_in'], 12)
+        put = requests['PUT /users/*']
+        self.assertEqual((put['count'], put['retries'], put['statuses']), (1, 1, {200: 1}))
+        self.assertEqual(put['bytes_out'], len(firebase._encode_data({'name': 'Jack'})))
+        json.dumps(self.metrics.snapshot())
+
+    def test_failed_request(self):
+        firebase = self.application([MockResponse(500, '')])
+        self.assertRaises(Exception, firebase.delete, '/users', '1')
+        delete = self.metrics.snapshot()['requests']['DELETE /users/*']
+        self.assertEqual((delete['errors'], delete['statuses']), (1, {500: 1}))
+
+    def test_pool_wait(self):
+        pool = ConnectionPool(pool_maxsize=1, pool_block=True)
+        firebase = FirebaseApplication(self.DSN, None, pool, hooks=self.metrics)
+        self.addCleanup(firebase.close)
+        adapter = firebase._get_connection().get_adapter(self.DSN)
+        url_pool = adapter.poolmanager.connection_from_url(self.DSN)
+        url_pool._put_conn(url_pool._get_conn())
+        self.assertEqual(self.metrics.snapshot()['pool_wait']['count'], 1)
+
+    def test_streamed_bytes_in(self):
+        firebase = self.application([MockStreamedResponse(200, b'{"a": 1, "b": 2}')])
+        self.assertEqual(list(firebase.get_iter('/users', None)), [('a', 1), ('b', 2)])
+        get = self.metrics.snapshot()['requests']['GET /users']
+        self.assertEqual((get['count'], get['bytes_in']), (1, 16))
+
+    def test_token_mint_and_cache(self):
+        authentication = FirebaseAuthentication('FAKE_FIREBASE_SECRET',
+                                                'python-firebase@firebase.com')
+        firebase = self.application([MockResponse(200, '1')],
+                                    authentication=authentication,
+                                    cache=ResponseCache())
+        firebase.get('/config', None)
+        firebase.get('/config', None)
+        snapshot = self.metrics.snapshot()
+        self.assertEqual(snapshot['token_mint']['count'], 1)
+        self.assertEqual(snapshot['cache'], {'hits': 1, 'misses': 1, 'hit_ratio': 0.5})
+        self.metrics.reset()
+        self.assertEqual(self.metrics.snapshot()['requests'], {})
+
+    def test_async_request_metrics(self):
+        firebase = AsyncFirebaseApplication(self.DSN, hooks=self.metrics)
+        connection = MockAsyncConnection(MockAsyncResponse(200, b'{"a": 1}'))
+        result = asyncio.run(firebase.get('/users', '1', connection=connection))
+        self.assertEqual(result, {'a': 1})
+        get = self.metrics.snapshot()['requests']['GET /users/*']
+        self.assertEqual((get['count'], get['bytes_in']), (1, 8))
@@ -0,0 +1,80 @@
+import unittest
+
+from firebase.mirror import LocalMirror
+from firebase.stream import StreamEvent
+
+
+class LocalMirrorTestCase(unittest.TestCase):
+    def setUp(self):
+        self.mirror = LocalMirror(None, '/config')
+        self.mirror.apply(StreamEvent('put', '/', {'users': {'1': {'name': 'John'},
+                                                             '2': {'name': 'Jane'}},
+                                                   'version': 3}))
+
+    def test_get(self):
+        self.assertTrue(self.mirror.ready)
+        self.assertEqual(self.mirror.get('/users/1/name'), 'John')
+        self.assertEqual(self.mirror.get('version'), 3)
+        self.assertEqual(self.mirror.get('/users/3', 'missing'), 'missing')
+        value = self.mirror.get('/users/1')
+        value['name'] = 'Changed'
+        self.assertEqual(self.mirror.get('/users/1/name'), 'John')
+
+    def test_put_and_patch(self):
+        self.mirror.apply(StreamEvent('put', '/users/2/name', 'Janet'))
+        self.assertEqual(self.mirror.get('/users/2'), {'name': 'Janet'})
+        self.mirror.apply(StreamEvent('patch', '/users', {'1/age': 30, '3': {'name': 'Joe'}}))
+        self.assertEqual(self.mirror.get('/users/1'), {'name': 'John', 'age': 30})
+        self.assertEqual(self.mirror.get('/users/3/name'), 'Joe')
+
+    def test_delete_prunes_empty_nodes(self):
+        self.mirror.apply(StreamEvent('put', '/users/1/name', None))
+        self.assertEqual(self.mirror.get('/users/1'), None)
+        self.assertEqual(sorted(self.mirror.get('/users')), ['2'])
+        self.mirror.apply(StreamEvent('patch', '/', {'users': None, 'version': None}))
+        self.assertEqual(self.mirror.get('/'), None)
+
+    def test_subscribe(self):
+        changes = []
+        callback = lambda path, data: changes.append(path)
+        self.mirror.subscribe('/users/1', callback)
+        self.mirror.apply(StreamEvent('put', '/users/1/name', 'Johnny'))
+        self.mirror.apply(StreamEvent('put', '/users', {}))
+        self.mirror.apply(StreamEvent('put', '/version', 4))
+        self.mirror.unsubscribe('/users/1', callback)
+        self.mirror.apply(StreamEvent('put', '/users/1', 'x'))
+        self.assertEqual(changes, ['/users/1/name', '/users'])
+
+    def test_stats(self):
+        stats = self.mirror.stats()
+        self.assertEqual(stats['nodes'], 4)
+        self.assertEqual(stats['leaves'], 3)
+        self.assertEqual(stats['depth'], 3)
+        self.assertEqual(stats['events_applied'], 1)
+        self.assertTrue(stats['bytes'] > 0)
+
+    def test_arrays(self):
+        self.mirror.apply(StreamEvent('put', '/tags', ['a', 'b', None, 'd']))
+        self.assertEqual(self.mirror.get('/tags'), ['a', 'b', None, 'd'])
+        self.assertEqual(self.mirror.get('/tags/1'), 'b')
+        self.mirror.apply(StreamEvent('put', '/tags', {'0': 'a', '7': 'h'}))
+        self.assertEqual(self.mirror.get('/tags'), {'0': 'a', '7': 'h'})
+
+    def test_errors(self):
+        errors = []
+        mirror = LocalMirror(None, '/config', error_callback=errors.append)
+
+        def callback(path, data):
+            raise ValueError(path)
+
+        mirror.subscribe('/', callback)
+        mirror.apply(StreamEvent('put', '/', {'version': 3}))
+        mirror.apply(StreamEvent('put', '/version', 4))
+        self.assertEqual(mirror.get('/version'), 4)
+        self.assertEqual(len(errors), 2)
+        self.assertTrue(mirror.ready)
+        mirror._stream_failed(IOError('Connection reset'))
+        self.assertFalse(mirror.ready)
+        self.assertFalse(mirror.wait())
+        self.assertTrue(isinstance(mirror.error, IOError))
+        self.assertEqual(errors[-1], mirror.error)
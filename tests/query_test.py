@@ -0,0 +1,152 @@
+import json
+import threading
+import unittest
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+from firebase.firebase import FirebaseApplication, WriteRejected
+from firebase.query import key_order
+
+from .firebase_test import MockConnectionPool, MockResponse
+
+
+class MockQueryConnection(object):
+    """
+    Answers the key ordered queries from an in-memory collection.
+    """
+    def __init__(self, collection):
+        self.collection = collection
+        self.requests = []
+        self.headers = {}
+        self.lock = threading.Lock()
+        self.denied = False
+
+    def get(self, url, params, headers, *args, **kwargs):
+        with self.lock:
+            self.requests.append(dict(params))
+        if self.denied:
+            return MockResponse(403, json.dumps({'error': 'Permission denied'}))
+        if not url.endswith('/.json'):
+            key = url.rsplit('/', 1)[1][:-len('.json')]
+            if key == 'fail':
+                return MockResponse(500, '')
+            return MockResponse(200, json.dumps(self.collection.get(key)))
+        if params.get('shallow') == 'true':
+            return MockResponse(200, json.dumps(dict.fromkeys(self.collection, True)))
+        keys = sorted(self.collection, key=key_order)
+        if 'startAt' in params:
+            start = key_order(json.loads(params['startAt']))
+            keys = [key for key in keys if key_order(key) >= start]
+        if 'endAt' in params:
+            end = key_order(json.loads(params['endAt']))
+            keys = [key for key in keys if key_order(key) <= end]
+        if 'limitToFirst' in params:
+            keys = keys[:json.loads(params['limitToFirst'])]
+        return MockResponse(200, json.dumps(dict((key, self.collection[key])
+                                                 for key in keys)))
+
+
+class QueryTestCase(unittest.TestCase):
+    def setUp(self):
+        self.DSN = 'https://firebase.localhost'
+        self.collection = dict(('user%03d' % index, {'index': index})
+                               for index in range(25))
+        self.collection.update({'7': {'index': -2}, '10': {'index': -1}})
+        self.connection = MockQueryConnection(self.collection)
+        self.firebase = FirebaseApplication(self.DSN, None,
+                                            MockConnectionPool(self.connection))
+
+    def tearDown(self):
+        self.firebase.close()
+
+    def test_build_params(self):
+        query = self.firebase.query('/users', params={'print': 'pretty'})
+        adults = query.order_by_child('age').start_at(18).limit_to_first(10)
+        self.assertEqual(adults.build_params(),
+                         {'print': 'pretty', 'orderBy': '"age"', 'startAt': '18',
+                          'limitToFirst': '10'})
+        self.assertEqual(query.build_params(), {'print': 'pretty'})
+        self.assertEqual(query.order_by_key().equal_to('a').build_params()['equalTo'],
+                         '"a"')
+        self.assertRaises(ValueError, query.start_at(1).build_params)
+        self.assertRaises(ValueError, query.order_by_value().limit_to_first(1)
+                          .limit_to_last(1).build_params)
+
+    def test_get(self):
+        result = self.firebase.query('/users').order_by_key().start_at('user020').get()
+        self.assertEqual(sorted(result), ['user%03d' % index for index in range(20, 25)])
+
+    def test_key_order(self):
+        self.assertEqual(sorted(['b', '10', 'a', '9', '-1', '01', '4294967296'],
+                                key=key_order),
+                         ['-1', '9', '10', '01', '4294967296', 'a', 'b'])
+
+    def test_scan(self):
+        expected = sorted(self.collection.items(), key=lambda item: key_order(item[0]))
+        for prefetch in (False, True):
+            del self.connection.requests[:]
+            self.assertEqual(list(self.firebase.scan('/users', 5, prefetch)), expected)
+            self.assertEqual(len(self.connection.requests), 6)
+            self.assertEqual(self.connection.requests[0]['limitToFirst'], '5')
+            self.assertEqual(self.connection.requests[1],
+                             {'orderBy': '"$key"', 'limitToFirst': '6',
+                              'startAt': '"user002"'})
+
+    def test_scan_bounds(self):
+        query = self.firebase.query('/users').start_at('user010').end_at('user019')
+        keys = [key for key, value in query.scan(page_size=4)]
+        self.assertEqual(keys, ['user%03d' % index for index in range(10, 20)])
+        self.assertRaises(ValueError, list, query.order_by_child('index').scan())
+        self.assertRaises(ValueError, list, query.limit_to_first(1).scan())
+
+    def test_scan_denied(self):
+        self.connection.denied = True
+        for prefetch in (False, True):
+            with self.assertRaises(WriteRejected) as context:
+                list(self.firebase.scan('/users', 5, prefetch))
+            self.assertEqual(context.exception.error, {'error': 'Permission denied'})
+
+    def test_keys(self):
+        self.assertEqual(self.firebase.keys('/users'),
+                         sorted(self.collection, key=key_order))
+        self.assertEqual(self.connection.requests, [{'shallow': 'true'}])
+
+    def test_keys_denied(self):
+        self.connection.denied = True
+        self.assertRaises(WriteRejected, self.firebase.keys, '/users')
+
+    def test_get_many(self):
+        keys = ['user%03d' % index for index in range(20)] + ['missing']
+        expected = [(key, self.collection.get(key)) for key in keys]
+        self.assertEqual(list(self.firebase.get_many('/users', iter(keys), 3)), expected)
+        results = list(self.firebase.get_many('/users', keys, ordered=False))
+        self.assertEqual(sorted(results, key=lambda item: item[0]), sorted(expected))
+
+    def test_get_many_concurrency_cap(self):
+        keys = ['user%03d' % index for index in range(10)]
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            results = list(self.firebase.get_many('/users', keys, concurrency=100))
+        self.assertEqual([key for key, _ in results], keys)
+        self.assertEqual(len(caught), 1)
+        self.assertTrue('at most 5 requests' in str(caught[0].message))
+
+    def test_get_many_given_executor(self):
+        executor = ThreadPoolExecutor(8)
+        firebase = FirebaseApplication(self.DSN, None, MockConnectionPool(self.connection),
+                                       executor=executor)
+        keys = ['user%03d' % index for index in range(10)]
+        try:
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter('always')
+                results = list(firebase.get_many('/users', keys, concurrency=8))
+        finally:
+            executor.shutdown()
+        self.assertEqual([key for key, _ in results], keys)
+        self.assertEqual(caught, [])
+
+    def test_get_many_error(self):
+        results = self.firebase.get_many('/users', ['user001', 'fail', 'user002'],
+                                         concurrency=1)
+        self.assertEqual(next(results), ('user001', {'index': 1}))
+        self.assertRaises(Exception, next, results)
@@ -0,0 +1,152 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from firebase.aio import AsyncFirebaseApplication
+from firebase.firebase import FirebaseApplication
+from firebase.metrics import MetricsCollector
+from firebase.ratelimit import ConcurrencyLimit, RateLimiter, TokenBucket
+
+from .aio_test import MockAsyncConnection, MockAsyncResponse
+from .firebase_test import (MockConnection, MockConnectionPool, MockResponse,
+                            MockStreamedResponse)
+
+
+class MockSlowConnection(object):
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.timeout = 60
+        self.headers = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def _respond(self):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.delay)
+        with self.lock:
+            self.in_flight -= 1
+        return MockResponse(200, '{}')
+
+    def get(self, url, *args, **kwargs):
+        return self._respond()
+
+    def put(self, url, *args, **kwargs):
+        return self._respond()
+
+
+class RateLimiterTestCase(unittest.TestCase):
+    def setUp(self):
+        self.DSN = 'https://firebase.localhost'
+
+    def test_token_bucket(self):
+        bucket = TokenBucket(10, capacity=2)
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertAlmostEqual(bucket.reserve(), 0.1, places=2)
+        self.assertAlmostEqual(bucket.reserve(), 0.2, places=2)
+
+    def test_requests_per_second(self):
+        limiter = RateLimiter(requests_per_second=50, burst=0.02)
+        start = time.monotonic()
+        for _ in range(10):
+            limiter.acquire(self.DSN + '/users.json').release()
+        self.assertGreater(time.monotonic() - start, 0.15)
+        stats = limiter.stats()
+        self.assertEqual(stats['acquired'], 10)
+        self.assertGreater(stats['delayed'], 5)
+
+    def test_bytes_per_second(self):
+        limiter = RateLimiter(bytes_per_second=1000)
+        self.assertLess(limiter.acquire(self.DSN + '/logs.json', 1000).waited, 0.05)
+        self.assertGreater(limiter.acquire(self.DSN + '/logs.json', 200).waited, 0.15)
+
+    def test_prefixes(self):
+        logs = RateLimiter(max_in_flight=1)
+        limiter = RateLimiter(max_in_flight=5, prefixes={'/logs': logs})
+        permit = limiter.acquire(self.DSN + '/logs/1.json')
+        self.assertEqual((logs.concurrency.in_flight, limiter.concurrency.in_flight), (1, 1))
+        limiter.acquire(self.DSN + '/users/1.json').release()
+        permit.release()
+        permit.release()
+        self.assertEqual((logs.concurrency.in_flight, limiter.concurrency.in_flight), (0, 0))
+        self.assertEqual(limiter.stats()['prefixes']['/logs']['acquired'], 1)
+        self.assertEqual(limiter.stats()['acquired'], 2)
+
+    def test_concurrency_limit_handover(self):
+        limit = ConcurrencyLimit(1)
+        limit.acquire()
+        acquired = threading.Event()
+
+        def wait():
+            limit.acquire()
+            acquired.set()
+        thread = threading.Thread(target=wait)
+        thread.start()
+        time.sleep(0.05)
+        self.assertEqual(limit.queued, 1)
+        self.assertFalse(acquired.is_set())
+        limit.release()
+        thread.join(1)
+        self.assertTrue(acquired.is_set())
+        self.assertEqual((limit.in_flight, limit.queued), (1, 0))
+
+    def test_async_cancellation(self):
+        limit = ConcurrencyLimit(1)
+
+        async def run():
+            limit.acquire()
+            task = asyncio.ensure_future(limit.acquire_async())
+            await asyncio.sleep(0.01)
+            task.cancel()
+            await asyncio.sleep(0.01)
+            self.assertEqual(limit.queued, 0)
+            limit.release()
+        asyncio.run(run())
+        self.assertEqual(limit.in_flight, 0)
+
+    def test_application_max_in_flight(self):
+        connection = MockSlowConnection()
+        metrics = MetricsCollector()
+        firebase = FirebaseApplication(self.DSN, None, MockConnectionPool(connection),
+                                       max_workers=8, hooks=metrics,
+                                       rate_limiter=RateLimiter(max_in_flight=2))
+        futures = [firebase.get_async('/users', str(index)) for index in range(6)]
+        futures += [firebase.put_async('/users', str(index), {}) for index in range(2)]
+        for future in futures:
+            future.result()
+        firebase.close()
+        self.assertEqual(connection.max_in_flight, 2)
+        wait = metrics.snapshot()['rate_limit_wait']
+        self.assertEqual(wait['count'], 8)
+        self.assertGreater(wait['max'], 0.05)
+
+    def test_streamed_response_holds_permit(self):
+        limiter = RateLimiter(max_in_flight=1)
+        response = MockStreamedResponse(200, b'{"a": 1, "b": 2}')
+        connection = MockConnection(response)
+        firebase = FirebaseApplication(self.DSN, None, MockConnectionPool(connection),
+                                       rate_limiter=limiter)
+        items = firebase.get_iter('/users', None, chunk_size=4)
+        self.assertEqual(next(items), ('a', 1))
+        self.assertEqual(limiter.concurrency.in_flight, 1)
+        self.assertEqual(list(items), [('b', 2)])
+        self.assertTrue(response.closed)
+        self.assertEqual(limiter.concurrency.in_flight, 0)
+
+    def test_async_application(self):
+        limiter = RateLimiter(requests_per_second=100, burst=0.01, max_in_flight=1)
+        firebase = AsyncFirebaseApplication(self.DSN, rate_limiter=limiter)
+        connection = MockAsyncConnection(MockAsyncResponse(200, b'1'))
+
+        async def run():
+            return await asyncio.gather(*[firebase.get('/users', str(index),
+                                                       connection=connection)
+                                          for index in range(5)])
+        start = time.monotonic()
+        self.assertEqual(asyncio.run(run()), [1] * 5)
+        self.assertGreater(time.monotonic() - start, 0.03)
+        self.assertEqual(limiter.stats()['in_flight'], 0)
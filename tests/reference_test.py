@@ -0,0 +1,116 @@
+import json
+import unittest
+
+from firebase.cache import ResponseCache
+from firebase.firebase import FirebaseApplication, FirebaseAuthentication, Reference
+from firebase.metrics import RequestHook
+
+from .firebase_test import MockConnectionPool, MockResponse
+
+
+class RecordingConnection(object):
+    def __init__(self, content='null'):
+        self.content = content
+        self.requests = []
+        self.timeout = 60
+        self.headers = {}
+
+    def _record(self, method, url, params, headers, data=None):
+        self.requests.append((method, url, params, headers, data))
+        return MockResponse(200, self.content)
+
+    def get(self, url, params, headers, *args, **kwargs):
+        return self._record('get', url, params, headers)
+
+    def put(self, url, data, params, headers, *args, **kwargs):
+        return self._record('put', url, params, headers, data)
+
+    def patch(self, url, data, params, headers, *args, **kwargs):
+        return self._record('patch', url, params, headers, data)
+
+    def delete(self, url, params, headers, *args, **kwargs):
+        return self._record('delete', url, params, headers)
+
+
+class CountingHook(RequestHook):
+    def __init__(self):
+        self.count = 0
+
+    def before_request(self, info):
+        self.count += 1
+        info.headers['X-Request-Id'] = str(self.count)
+
+
+class ReferenceTestCase(unittest.TestCase):
+    def setUp(self):
+        self.DSN = 'https://firebase.localhost'
+        self.connection = RecordingConnection('{"name": "John"}')
+        self.authentication = FirebaseAuthentication('FAKE_FIREBASE_SECRET',
+                                                     'python-firebase@firebase.com')
+        self.firebase = FirebaseApplication(self.DSN, self.authentication,
+                                            MockConnectionPool(self.connection))
+
+    def test_paths(self):
+        root = self.firebase.ref('/')
+        self.assertEqual(root.endpoint, 'https://firebase.localhost/.json')
+        self.assertEqual((root.key, root.parent), (None, None))
+        users = root.child('users')
+        self.assertEqual(users.endpoint, 'https://firebase.localhost/users.json')
+        name = users.child('1/', 'name')
+        self.assertEqual(name.endpoint, 'https://firebase.localhost/users/1/name.json')
+        self.assertEqual((name.path, name.key), ('/users/1/name', 'name'))
+        self.assertEqual(name.parent, self.firebase.ref('users/1'))
+        self.assertEqual(name.parent.parent.parent, root)
+        self.assertTrue(users.child('') is users)
+        self.assertEqual(Reference(self.firebase, '/users/1').endpoint,
+                         users.child('1').endpoint)
+
+    def test_requests(self):
+        user = self.firebase.ref('/users', {'print': 'pretty'}).child('1')
+        self.assertEqual(user.get(), {'name': 'John'})
+        user.set({'name': 'John'})
+        user.update({'age': 30})
+        user.remove()
+        child = user.parent.push({'name': 'Jane'})
+        self.assertEqual(child.parent, user.parent)
+        self.assertEqual(len(child.key), 20)
+        methods = [request[0] for request in self.connection.requests]
+        self.assertEqual(methods, ['get', 'put', 'patch', 'delete', 'put'])
+        # The pushed value is not echoed back.
+        self.assertEqual(self.connection.requests.pop()[2]['print'], 'silent')
+        self.assertEqual(self.connection.requests[1][1],
+                         'https://firebase.localhost/users/1.json')
+        self.assertEqual(json.loads(self.connection.requests[2][4]), {'age': 30})
+        params = self.connection.requests[0][2]
+        self.assertEqual(params['print'], 'pretty')
+        self.assertTrue('auth_token' in params)
+        # The authenticated params are built once per token.
+        self.assertTrue(all(request[2] is params for request in self.connection.requests))
+        self.assertEqual(user.params, {'print': 'pretty'})
+        self.authentication.invalidate()
+        user.get()
+        self.assertFalse(self.connection.requests[-1][2] is params)
+
+    def test_cache_is_used(self):
+        firebase = FirebaseApplication(self.DSN, None, MockConnectionPool(self.connection),
+                                       cache=ResponseCache(default_ttl=60))
+        user = firebase.ref('/users/1')
+        self.assertEqual(user.get(), {'name': 'John'})
+        self.assertEqual(user.get(), {'name': 'John'})
+        self.assertEqual(len(self.connection.requests), 1)
+        user.child('name').set('Jane')
+        user.get()
+        self.assertEqual(len(self.connection.requests), 3)
+
+    def test_hook_headers_do_not_leak(self):
+        firebase = FirebaseApplication(self.DSN, self.authentication,
+                                       MockConnectionPool(self.connection),
+                                       hooks=CountingHook())
+        user = firebase.ref('/users/1')
+        user.get()
+        user.child('name').set('John')
+        self.assertEqual([request[3]['X-Request-Id'] for request in self.connection.requests],
+                         ['1', '2'])
+        params, headers = user._authenticate()
+        self.assertFalse('X-Request-Id' in headers)
+        self.assertFalse(self.connection.requests[0][3] is headers)
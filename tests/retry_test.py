@@ -0,0 +1,100 @@
+import asyncio
+import time
+import unittest
+
+import requests
+
+from firebase.aio import AsyncFirebaseApplication
+from firebase.firebase import FirebaseApplication
+from firebase.retry import (CircuitBreaker, CircuitOpenError, RetryPolicy,
+                            parse_retry_after)
+
+from .aio_test import MockAsyncConnection, MockAsyncResponse
+from .cache_test import MockSequenceConnection
+from .firebase_test import MockConnectionPool, MockResponse
+
+
+class FailingConnection(MockSequenceConnection):
+    def post(self, url, data, params, headers, *args, **kwargs):
+        response = self._respond('post', url, headers)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+class RetryPolicyTestCase(unittest.TestCase):
+    def setUp(self):
+        self.DSN = 'https://firebase.localhost'
+        self.policy = RetryPolicy(max_retries=2, backoff=0.001)
+
+    def application(self, connection, policy=None):
+        return FirebaseApplication(self.DSN, None, MockConnectionPool(connection),
+                                   retry_policy=policy or self.policy)
+
+    def test_retry_on_status(self):
+        connection = MockSequenceConnection([MockResponse(503, ''),
+                                             MockResponse(500, ''),
+                                             MockResponse(200, '1')])
+        self.assertEqual(self.application(connection).get('/users', None), 1)
+        self.assertEqual(len(connection.requests), 3)
+
+    def test_gives_up_after_max_retries(self):
+        connection = MockSequenceConnection([MockResponse(503, '')] * 3)
+        self.assertRaises(Exception, self.application(connection).get, '/users', None)
+        self.assertEqual(len(connection.requests), 3)
+
+    def test_post_is_not_retried_blindly(self):
+        connection = FailingConnection([MockResponse(500, ''),
+                                        MockResponse(200, '1')])
+        self.assertRaises(Exception, self.application(connection).post, '/users', {})
+        self.assertEqual(len(connection.requests), 1)
+        connection = FailingConnection([MockResponse(429, '', {'Retry-After': '0'}),
+                                        requests.ConnectTimeout(),
+                                        MockResponse(200, '1')])
+        self.assertEqual(self.application(connection).post('/users', {}), 1)
+        connection = FailingConnection([requests.ReadTimeout(),
+                                        MockResponse(200, '1')])
+        self.assertRaises(requests.ReadTimeout,
+                          self.application(connection).post, '/users', {})
+
+    def test_retry_after(self):
+        self.assertEqual(parse_retry_after('2'), 2.0)
+        self.assertEqual(parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT'), 0.0)
+        self.assertEqual(parse_retry_after('soon'), None)
+        self.assertEqual(self.policy.get_delay(0, 1.5), 1.5)
+
+    def test_deadline(self):
+        policy = RetryPolicy(max_retries=5, deadline=0.05)
+        connection = MockSequenceConnection([MockResponse(503, '', {'Retry-After': '1'}),
+                                             MockResponse(200, '1')])
+        started = time.time()
+        self.assertRaises(Exception, self.application(connection, policy).get,
+                          '/users', None)
+        self.assertTrue(time.time() - started < 0.5)
+
+    def test_circuit_breaker(self):
+        breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=60)
+        policy = RetryPolicy(max_retries=0, circuit_breaker=breaker)
+        connection = MockSequenceConnection([MockResponse(503, '')] * 2)
+        firebase = self.application(connection, policy)
+        for _ in range(2):
+            self.assertRaises(Exception, firebase.get, '/users', None)
+        self.assertEqual(breaker.state('firebase.localhost'), CircuitBreaker.OPEN)
+        self.assertRaises(CircuitOpenError, firebase.get, '/users', None)
+        self.assertEqual(len(connection.requests), 2)
+        breaker.recovery_timeout = 0
+        connection.responses.append(MockResponse(200, '1'))
+        self.assertEqual(firebase.get('/users', None), 1)
+        self.assertEqual(breaker.state('firebase.localhost'), CircuitBreaker.CLOSED)
+
+    def test_async_retry(self):
+        class SequenceAsyncConnection(MockAsyncConnection):
+            def request(self, method, url, **kwargs):
+                self.requests.append((method, url, kwargs))
+                return self.response.pop(0)
+        connection = SequenceAsyncConnection([MockAsyncResponse(502, b''),
+                                              MockAsyncResponse(200, b'1')])
+        firebase = AsyncFirebaseApplication(self.DSN, retry_policy=self.policy)
+        result = asyncio.run(firebase.get('/users', None, connection=connection))
+        self.assertEqual(result, 1)
+        self.assertEqual(len(connection.requests), 2)
@@ -0,0 +1,218 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import requests
+
+from firebase.firebase import FirebaseApplication
+from firebase.jsonutil import JSONCodec
+from firebase.spool import SpoolRecord, compact_records
+
+from .batch_test import MockPatchConnection
+from .firebase_test import MockResponse
+
+
+class MockErrorResponse(MockResponse):
+    def raise_for_status(self):
+        raise requests.HTTPError('%d Client Error' % self.status_code, response=self)
+
+
+class FailingPatchConnection(MockPatchConnection):
+    def __init__(self, failure):
+        super(FailingPatchConnection, self).__init__()
+        self.failure = failure
+
+    def patch(self, url, data, params, headers, *args, **kwargs):
+        response = self.failure(json.loads(data))
+        if response is not None:
+            return response
+        return super(FailingPatchConnection, self).patch(url, data, params, headers)
+
+
+class IndentingCodec(JSONCodec):
+    def dumps(self, value):
+        return json.dumps(value, indent=2)
+
+
+def record(seq, operation, path, data):
+    line = json.dumps([seq, operation, path, data]).encode('utf-8') + b'\n'
+    return SpoolRecord(seq, operation, path, line)
+
+
+class WriteSpoolTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def application(self, connection):
+        firebase = FirebaseApplication('https://firebase.localhost')
+        firebase._get_connection = lambda connection_=None: connection
+        return firebase
+
+    def test_replay(self):
+        connection = MockPatchConnection()
+        spool = self.application(connection).spool(self.directory, fsync='always')
+        spool.put('/users', '1', {'name': 'John'})
+        key = spool.post('/events', {'type': 'login'})
+        spool.delete('/users', '2')
+        self.assertTrue(spool.flush(5))
+        spool.close()
+        written = {}
+        for _, update in connection.patches:
+            written.update(update)
+        self.assertEqual(written, {'users/1': {'name': 'John'},
+                                   'events/%s' % key: {'type': 'login'},
+                                   'users/2': None})
+        self.assertEqual(spool.replayed, 3)
+        with open(os.path.join(self.directory, 'checkpoint')) as checkpoint:
+            self.assertEqual(checkpoint.read().strip(), '3')
+        self.assertRaises(ValueError, spool.put, '/users', '3', {})
+
+    def test_crash_recovery(self):
+        def unreachable(data):
+            raise requests.ConnectionError('Backend is down')
+        errors = []
+        spool = self.application(FailingPatchConnection(unreachable)).spool(
+            self.directory, retry_interval=60, error_callback=errors.append)
+        spool.put('/users', '1', {'name': 'John'})
+        spool.patch('/users/1', {'age': 30})
+        spool.put('/users', '2', 'Jane')
+        self.assertFalse(spool.flush(0.2))
+        spool.close()
+        self.assertTrue(isinstance(errors[0], requests.ConnectionError))
+        with open(os.path.join(self.directory, 'journal'), 'ab') as journal:
+            journal.write(b'[4,"put","/users/3",{"na')
+
+        connection = MockPatchConnection()
+        spool = self.application(connection).spool(self.directory)
+        self.assertTrue(spool.flush(5))
+        spool.put('/users', '4', 'Jack')
+        spool.close(timeout=5)
+        self.assertEqual(connection.patches[0][1], {'users/1': {'name': 'John', 'age': 30},
+                                                    'users/2': 'Jane'})
+        self.assertEqual(connection.patches[1][1], {'users/4': 'Jack'})
+        self.assertEqual(spool._seq, 4)
+
+    def test_client_errors_are_dropped(self):
+        def reject(data):
+            if 'bad' in data:
+                return MockErrorResponse(400, '{"error": "Invalid data"}')
+        errors = []
+        connection = FailingPatchConnection(reject)
+        spool = self.application(connection).spool(self.directory,
+                                                   error_callback=errors.append)
+        spool.put('/', 'good', 1)
+        spool.put('/', 'bad', 2)
+        spool.put('/', 'fine', 3)
+        self.assertTrue(spool.flush(5))
+        spool.close()
+        self.assertEqual(len(errors), 1)
+        self.assertEqual((spool.replayed, spool.dropped), (2, 1))
+        written = {}
+        for _, update in connection.patches:
+            written.update(update)
+        self.assertEqual(written, {'good': 1, 'fine': 3})
+
+    def test_permission_denied_is_dropped(self):
+        def deny(data):
+            if 'secret' in data:
+                return MockErrorResponse(403, '{"error": "Permission denied"}')
+        errors = []
+        connection = FailingPatchConnection(deny)
+        spool = self.application(connection).spool(self.directory,
+                                                   error_callback=errors.append)
+        spool.put('/', 'public', 1)
+        spool.put('/', 'secret', 2)
+        self.assertTrue(spool.flush(5))
+        spool.close()
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(errors[0].error, {'error': 'Permission denied'})
+        self.assertEqual((spool.replayed, spool.dropped), (1, 1))
+
+    def test_other_errors_are_dropped(self):
+        def fail(data):
+            if 'bad' in data:
+                raise KeyError('bad')
+        errors = []
+        spool = self.application(FailingPatchConnection(fail)).spool(
+            self.directory, retry_interval=60, error_callback=errors.append)
+        spool.put('/', 'good', 1)
+        spool.put('/', 'bad', 2)
+        spool.put('/', 'fine', 3)
+        self.assertTrue(spool.flush(5))
+        spool.close()
+        self.assertEqual(len(errors), 1)
+        self.assertTrue(isinstance(errors[0], KeyError))
+        self.assertEqual((spool.replayed, spool.dropped), (2, 1))
+
+    def test_invalid_writes_are_rejected(self):
+        spool = self.application(MockPatchConnection()).spool(self.directory)
+        self.addCleanup(spool.close)
+        self.assertRaises(ValueError, spool.patch, '/counters', 5)
+        self.assertRaises(AssertionError, spool.patch, '/', {'': 1})
+        self.assertEqual((len(spool), spool._seq), (0, 0))
+
+    def test_invalid_journal_records_are_dropped(self):
+        with open(os.path.join(self.directory, 'journal'), 'wb') as journal:
+            journal.write(b'[1,"patch","/counters",5]\n[2,"put","/users/1","John"]\n')
+        errors = []
+        connection = MockPatchConnection()
+        spool = self.application(connection).spool(self.directory,
+                                                   error_callback=errors.append)
+        self.assertTrue(spool.flush(5))
+        spool.close()
+        self.assertEqual(len(errors), 1)
+        self.assertEqual((spool.replayed, spool.dropped), (1, 1))
+        self.assertEqual(connection.patches[-1][1], {'users/1': 'John'})
+
+    def test_interval_sync(self):
+        spool = self.application(MockPatchConnection()).spool(self.directory,
+                                                               fsync_interval=0.05)
+        self.addCleanup(spool.close)
+        synced_at = spool._synced_at
+        spool.put('/users', '1', 'John')
+        self.assertTrue(spool._unsynced)
+        for _ in range(100):
+            if not spool._unsynced:
+                break
+            time.sleep(0.01)
+        self.assertFalse(spool._unsynced)
+        self.assertGreater(spool._synced_at, synced_at)
+
+    def test_codec_newlines_are_rejected(self):
+        firebase = self.application(MockPatchConnection())
+        firebase.codec = IndentingCodec()
+        spool = firebase.spool(self.directory)
+        self.addCleanup(spool.close)
+        self.assertRaises(ValueError, spool.put, '/users', '1', {'name': 'John'})
+        self.assertEqual(len(spool), 0)
+
+    def test_compaction(self):
+        records = [record(1, 'put', '/users/1', {'name': 'John'}),
+                   record(2, 'patch', '/users/2', {'name': 'Jane', 'age': 30}),
+                   record(3, 'put', '/users/1/name', 'Johnny'),
+                   record(4, 'patch', '/users/2', {'age': 31}),
+                   record(5, 'delete', '/users/1', None),
+                   record(6, 'put', '/users/2/name', 'Janet')]
+        self.assertEqual([item.seq for item in compact_records(records, JSONCodec())],
+                         [4, 5, 6])
+
+    def test_journal_is_compacted(self):
+        connection = MockPatchConnection()
+        spool = self.application(connection).spool(self.directory, compact_bytes=100)
+        for index in range(20):
+            spool.put('/items', str(index), index)
+            spool.flush(5)
+        self.assertLess(os.path.getsize(os.path.join(self.directory, 'journal')), 100)
+        spool.close()
+
+    def test_options(self):
+        firebase = self.application(MockPatchConnection())
+        self.assertRaises(ValueError, firebase.spool, self.directory, fsync='sometimes')
+        spool = firebase.spool(self.directory)
+        self.assertRaises(ValueError, firebase.spool, self.directory)
+        spool.close()
+        firebase.spool(self.directory).close()
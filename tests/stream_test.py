@@ -0,0 +1,143 @@
+import json
+import unittest
+
+from firebase.firebase import FirebaseApplication, FirebaseAuthentication
+from firebase.metrics import MetricsCollector
+from firebase.stream import SSEParser
+
+
+class MockStreamResponse(object):
+    def __init__(self, chunks, status_code=200):
+        self.chunks = chunks
+        self.status_code = status_code
+        self.headers = {}
+        self.closed = False
+
+    @property
+    def ok(self):
+        return str(self.status_code).startswith('2')
+
+    def iter_content(self, chunk_size=None):
+        return iter(self.chunks)
+
+    def close(self):
+        self.closed = True
+
+    def raise_for_status(self):
+        raise Exception('Fake HTTP Error')
+
+
+class MockStreamConnection(object):
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def get(self, url, params, headers, *args, **kwargs):
+        self.requests.append((url, dict(params), dict(headers)))
+        return self.responses.pop(0)
+
+
+def sse(event, data):
+    return ('event: %s\ndata: %s\n\n' % (event, json.dumps(data))).encode('utf-8')
+
+
+class SSEParserTestCase(unittest.TestCase):
+    def test_split_chunks(self):
+        parser = SSEParser()
+        self.assertEqual(parser.feed(b'event: put\r'), [])
+        self.assertEqual(parser.feed(b'\ndata: {"path": "/", '), [])
+        self.assertEqual(parser.feed(b'"data": 1}\r\n\r\n: comment\n'),
+                         [('put', '{"path": "/", "data": 1}')])
+
+    def test_fields(self):
+        parser = SSEParser()
+        events = parser.feed(b'id: 7\nretry: 2500\ndata: a\ndata: b\n\n')
+        self.assertEqual(events, [('message', 'a\nb')])
+        self.assertEqual(parser.last_event_id, '7')
+        self.assertEqual(parser.retry, 2.5)
+
+    def test_multibyte_characters(self):
+        parser = SSEParser()
+        payload = 'data: ç\n\n'.encode('utf-8')
+        self.assertEqual(parser.feed(payload[:7]), [])
+        self.assertEqual(parser.feed(payload[7:]), [('message', 'ç')])
+
+
+class EventStreamTestCase(unittest.TestCase):
+    def setUp(self):
+        self.authentication = FirebaseAuthentication('FAKE_FIREBASE_SECRET',
+                                                     'python-firebase@firebase.com')
+        self.firebase = FirebaseApplication('https://firebase.localhost',
+                                            self.authentication)
+
+    def test_events(self):
+        first = MockStreamResponse([
+            sse('put', {'path': '/', 'data': {'a': 1}}),
+            b'event: keep-alive\ndata: null\n\n',
+            sse('auth_revoked', 'token expired'),
+        ])
+        second = MockStreamResponse([
+            sse('patch', {'path': '/b', 'data': {'c': 2}}),
+            sse('cancel', 'Permission denied'),
+        ])
+        connection = MockStreamConnection([first, second])
+        user = self.authentication.get_user()
+        stream = self.firebase.stream('/users', connection=connection)
+        events = [(e.event, e.path, e.data) for e in stream]
+        self.assertEqual(events, [('put', '/', {'a': 1}),
+                                  ('patch', '/b', {'c': 2})])
+        self.assertTrue(stream.cancelled and stream.closed)
+        self.assertTrue(first.closed and second.closed)
+        url, params, headers = connection.requests[0]
+        self.assertEqual(url, 'https://firebase.localhost/users/.json')
+        self.assertEqual(headers['Accept'], 'text/event-stream')
+        self.assertEqual(params['auth_token'], user.firebase_auth_token)
+        self.assertFalse(self.authentication.get_user() is user)
+
+    def test_reconnect_after_error(self):
+        connection = MockStreamConnection([
+            MockStreamResponse([], status_code=503),
+            MockStreamResponse([sse('put', {'path': '/', 'data': 1})]),
+        ])
+        stream = self.firebase.stream('/users', connection=connection,
+                                      backoff=0.001, reconnect=True)
+        iterator = iter(stream)
+        self.assertEqual(next(iterator).data, 1)
+        stream.close()
+        self.assertEqual(len(connection.requests), 2)
+
+    def test_callback(self):
+        connection = MockStreamConnection([
+            MockStreamResponse([sse('put', {'path': '/', 'data': 1})]),
+        ])
+        events = []
+        stream = self.firebase.stream('/users', callback=events.append,
+                                      connection=connection, reconnect=False)
+        stream._thread.join(1)
+        self.assertEqual([e.data for e in events], [1])
+
+    def test_callback_error(self):
+        connection = MockStreamConnection([
+            MockStreamResponse([sse('put', {'path': '/', 'data': 1})]),
+        ])
+        errors = []
+
+        def callback(event):
+            raise ValueError(event.data)
+
+        stream = self.firebase.stream('/users', callback=callback, error_callback=errors.append,
+                                      connection=connection)
+        stream._thread.join(1)
+        self.assertTrue(stream.closed)
+        self.assertTrue(isinstance(stream.error, ValueError))
+        self.assertEqual(errors, [stream.error])
+
+    def test_hooks(self):
+        metrics = MetricsCollector()
+        firebase = FirebaseApplication('https://firebase.localhost', None, hooks=metrics)
+        connection = MockStreamConnection([
+            MockStreamResponse([sse('put', {'path': '/', 'data': 1})]),
+        ])
+        stream = firebase.stream('/users', connection=connection, reconnect=False)
+        self.assertEqual([event.data for event in stream], [1])
+        self.assertEqual(metrics.snapshot()['requests']['GET /users']['count'], 1)
@@ -0,0 +1,90 @@
+import threading
+import time
+import unittest
+
+from firebase.firebase import FirebaseApplication, WriteRejected
+from firebase.writer import BufferFull, buffered_writers, generate_push_id
+
+from .batch_test import MockPatchConnection
+
+
+class BlockingPatchConnection(MockPatchConnection):
+    def __init__(self):
+        super(BlockingPatchConnection, self).__init__()
+        self.release = threading.Event()
+
+    def patch(self, *args, **kwargs):
+        self.release.wait(5)
+        return super(BlockingPatchConnection, self).patch(*args, **kwargs)
+
+
+class BufferedWriterTestCase(unittest.TestCase):
+    def setUp(self):
+        self.connection = MockPatchConnection()
+        self.firebase = FirebaseApplication('https://firebase.localhost')
+        self.firebase._get_connection = lambda connection=None: self.connection
+
+    def test_push_ids_are_ordered_and_unique(self):
+        keys = [generate_push_id() for _ in range(1000)]
+        self.assertEqual(sorted(keys), keys)
+        self.assertEqual(len(set(keys)), 1000)
+        self.assertTrue(all(len(key) == 20 for key in keys))
+
+    def test_close_flushes_merged_writes(self):
+        writer = self.firebase.buffered_writer(flush_interval=60)
+        self.assertTrue(writer in buffered_writers)
+        writer.patch('/counters', {'a': 1})
+        writer.patch('/counters', {'b': 2, 'a': 3})
+        key = writer.post('/events', {'type': 'click'})
+        writer.delete('/events', 'old')
+        writer.close()
+        self.assertFalse(writer in buffered_writers)
+        self.assertEqual(self.connection.patches, [(
+            'https://firebase.localhost/.json',
+            {'counters/a': 3, 'counters/b': 2,
+             'events/%s' % key: {'type': 'click'}, 'events/old': None})])
+        self.assertRaises(ValueError, writer.post, '/events', {})
+
+    def test_count_threshold(self):
+        writer = self.firebase.buffered_writer(max_count=2, flush_interval=60)
+        writer.put('/a', '1', 1)
+        writer.put('/a', '2', 2)
+        writer.flush()
+        self.assertEqual(len(self.connection.patches), 1)
+        writer.close()
+
+    def test_interval(self):
+        writer = self.firebase.buffered_writer(flush_interval=0.01)
+        writer.put('/a', '1', 1)
+        for _ in range(100):
+            if self.connection.patches:
+                break
+            time.sleep(0.01)
+        self.assertEqual(len(self.connection.patches), 1)
+        writer.close()
+
+    def test_backpressure(self):
+        self.connection = BlockingPatchConnection()
+        writer = self.firebase.buffered_writer(max_count=1, max_pending_bytes=20,
+                                               block_timeout=0.05)
+        writer.put('/a', '1', 'x' * 10)
+        self.assertRaises(BufferFull, writer.put, '/a', '2', 'x' * 10)
+        self.connection.release.set()
+        writer.close()
+
+    def test_error_callback(self):
+        errors = []
+        self.connection.patch = lambda *args, **kwargs: 1 / 0
+        writer = self.firebase.buffered_writer(error_callback=errors.append)
+        writer.put('/a', '1', 1)
+        writer.close()
+        self.assertEqual(len(errors), 1)
+
+    def test_rejected_flush_is_reported(self):
+        self.connection.status_code = 403
+        errors = []
+        writer = self.firebase.buffered_writer(flush_interval=60, error_callback=errors.append)
+        writer.put('/a', '1', 1)
+        writer.close()
+        self.assertEqual(len(errors), 1)
+        self.assertTrue(isinstance(errors[0], WriteRejected))